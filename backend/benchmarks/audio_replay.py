@@ -0,0 +1,88 @@
+# benchmarks/audio_replay.py
+"""Cost of replaying a stored reply: full download, range, and revalidation.
+
+    python benchmarks/audio_replay.py [--requests 500] [--concurrency 50] [--reply-seconds 20]
+
+Stores one reply's worth of audio (16kHz PCM, `--reply-seconds` long) in
+a temporary audio store and requests it through the app in-process via
+GET /api/v1/voice/audio/{id}: a full download, a 64KB seek (Range), and
+a revalidation with If-None-Match (304). For comparison, times the local
+synthesizer producing the same length of audio, which a replay without
+the store would cost. Reports latency percentiles and requests/second.
+"""
+import argparse
+import asyncio
+import shutil
+import tempfile
+import time
+
+import httpx
+
+from common import setup_env, summarize_ms
+
+
+async def timed(client: httpx.AsyncClient, url: str, headers: dict, expect: int) -> float:
+    started = time.perf_counter()
+    response = await client.get(url, headers=headers)
+    if response.status_code != expect:
+        raise RuntimeError(f"{url}: {response.status_code}, expected {expect}")
+    return time.perf_counter() - started
+
+
+async def run_mode(client, url: str, headers: dict, expect: int, requests: int, concurrency: int):
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with slots:
+            return await timed(client, url, headers, expect)
+
+    started = time.perf_counter()
+    samples = await asyncio.gather(*[one() for _ in range(requests)])
+    return samples, requests / (time.perf_counter() - started)
+
+
+async def main_async(requests: int, concurrency: int, reply_seconds: int) -> None:
+    import main
+    from services.audio_store import audio_store
+    from services.speech import PCM_16000, LocalSynthesizer
+
+    synthesizer = LocalSynthesizer(first_byte_latency=0.15)
+    text = "x" * int(reply_seconds * 1000 / synthesizer.ms_per_char)
+    started = time.perf_counter()
+    audio = b"".join([chunk async for chunk in synthesizer.synthesize(text)])
+    synthesis = time.perf_counter() - started
+
+    stored = await audio_store.put(audio, PCM_16000)
+    url = f"/api/v1/voice/audio/{stored.audio_id}"
+    print(f"{len(audio) / 1024:.0f}KB reply, {requests} requests, {concurrency} concurrent")
+    print(f"{'synthesize':>11}: {synthesis * 1000:7.1f}ms (local synthesizer, one reply)")
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        modes = (
+            ("full", {}, 200),
+            ("range", {"Range": "bytes=65536-131071"}, 206),
+            ("304", {"If-None-Match": f'"{stored.audio_id}"'}, 304),
+        )
+        for label, headers, expect in modes:
+            samples, rate = await run_mode(client, url, headers, expect, requests, concurrency)
+            print(f"{label:>11}: {summarize_ms(samples)}  {rate:7.0f} req/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--reply-seconds", type=int, default=20)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="audio-replay-")
+    setup_env(AUDIO_STORE_DIR=root)
+    try:
+        asyncio.run(main_async(args.requests, args.concurrency, args.reply_seconds))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/auth_overhead.py
+"""Per-request auth overhead: remote `get_user` vs local JWT verification.
+
+    python benchmarks/auth_overhead.py [--requests 2000] [--auth-latency-ms 40]
+
+Supabase Auth is simulated in-process with a fixed network latency; the
+local paths do real signature checks (ES256 via JWKS, and HS256).
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from common import setup_env
+
+
+def _make_keys():
+    from cryptography.hazmat.primitives.asymmetric import ec
+    import jwt
+
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    jwk = json.loads(jwt.algorithms.ECAlgorithm.to_jwk(private_key.public_key()))
+    jwk.update({"kid": "bench-key", "alg": "ES256", "use": "sig"})
+    return private_key, {"keys": [jwk]}
+
+
+def _token(private_key, alg: str, secret: str, user_id: str) -> str:
+    import jwt
+
+    claims = {"sub": user_id, "aud": "authenticated", "exp": int(time.time()) + 3600, "jti": uuid.uuid4().hex}
+    if alg == "HS256":
+        return jwt.encode(claims, secret, algorithm="HS256")
+    return jwt.encode(claims, private_key, algorithm="ES256", headers={"kid": "bench-key"})
+
+
+async def run(requests: int, latency: float) -> None:
+    import httpx
+    import jwt
+    from services import db
+    from services.token_verifier import TokenVerifier
+
+    secret = "bench-secret-with-enough-entropy-000000"
+    private_key, jwks = _make_keys()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/jwks.json"):
+            return httpx.Response(200, json=jwks)
+        if request.url.path == "/auth/v1/user":
+            await asyncio.sleep(latency)
+            token = request.headers["authorization"].split(" ", 1)[1]
+            claims = jwt.decode(token, options={"verify_signature": False})
+            return httpx.Response(200, json={"id": claims["sub"]})
+        return httpx.Response(404)
+
+    db.http_client = httpx.AsyncClient(base_url="http://auth.local", transport=httpx.MockTransport(handler))
+
+    user_id = str(uuid.uuid4())
+    fresh_es = [_token(private_key, "ES256", secret, user_id) for _ in range(requests)]
+    fresh_hs = [_token(private_key, "HS256", secret, user_id) for _ in range(requests)]
+
+    async def measure(label, tokens, verify):
+        started = time.perf_counter()
+        for token in tokens:
+            assert await verify(token) == user_id
+        per_request = (time.perf_counter() - started) / len(tokens)
+        print(f"{label:<34} {per_request * 1e6:10.1f} us/request")
+
+    async def remote(token):
+        return (await db.Database().auth.get_user(token))["id"]
+
+    remote_sample = fresh_es[: max(1, min(requests, int(2 / max(latency, 1e-3))))]
+    await measure("remote get_user (before)", remote_sample, remote)
+
+    verifier = TokenVerifier(jwt_secret=secret)
+    await measure("local ES256 via JWKS, cold cache", fresh_es, verifier.verify)
+    await measure("local HS256 secret, cold cache", fresh_hs, verifier.verify)
+    await measure("local, cached token", [fresh_es[0]] * requests, verifier.verify)
+    print(verifier.stats())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--auth-latency-ms", type=float, default=40.0)
+    args = parser.parse_args()
+
+    setup_env()
+    asyncio.run(run(args.requests, args.auth_latency_ms / 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/binary_protocol.py
+"""Bytes per reply and encode cost: `/ws` JSON frames vs `/ws-bin` protobuf.
+
+    python benchmarks/binary_protocol.py [--replies 2000] [--tokens 120]
+
+Encodes the frames of a synthetic streamed reply (one chunk per delta plus
+the completion frame) with both protocols and reports wire bytes (including
+WebSocket headers) and CPU time per frame.
+"""
+import argparse
+import json
+import time
+
+from common import setup_env
+from stream_coalescing import ws_frame_bytes
+
+CONVERSATION_ID = 123456
+STREAM_ID = "9f2c4e1a7b3d4c5e8f9a0b1c2d3e4f50"
+SUGGESTIONS = ["What made today feel that way?", "What would help tomorrow?", "Tell me more"]
+
+
+def json_frames(tokens, full_text):
+    for token in tokens:
+        yield json.dumps({"type": "message_chunk", "chunk": token, "conversation_id": CONVERSATION_ID})
+    yield json.dumps({
+        "type": "message_complete",
+        "full_response": full_text,
+        "conversation_id": CONVERSATION_ID,
+        "suggestions": SUGGESTIONS,
+    })
+
+
+def proto_frames(tokens, full_text):
+    from proto_utils.serialization import encode_chat_chunk, encode_chat_complete
+
+    for seq, token in enumerate(tokens, 1):
+        yield encode_chat_chunk(CONVERSATION_ID, token, stream_id=STREAM_ID, sequence=seq)
+    yield encode_chat_complete(
+        CONVERSATION_ID, full_text, SUGGESTIONS, stream_id=STREAM_ID, sequence=len(tokens) + 1
+    )
+
+
+def run(label, encode, tokens, replies):
+    full_text = "".join(tokens)
+    wire = sum(ws_frame_bytes(len(f if isinstance(f, bytes) else f.encode())) for f in encode(tokens, full_text))
+
+    frames = 0
+    started = time.process_time()
+    for _ in range(replies):
+        for frame in encode(tokens, full_text):
+            if isinstance(frame, str):
+                frame = frame.encode()
+            frames += 1
+    cpu = time.process_time() - started
+    print(
+        f"{label:<18} bytes/reply={wire:6d}  bytes/frame={wire / (len(tokens) + 1):6.1f}  "
+        f"cpu/frame={cpu / frames * 1e6:5.2f}us"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--replies", type=int, default=2000)
+    parser.add_argument("--tokens", type=int, default=120)
+    args = parser.parse_args()
+
+    setup_env()
+    words = "I hear you. It sounds like today asked a lot of you, and you still showed up. ".split(" ")
+    tokens = [(words[i % len(words)] + " ") for i in range(args.tokens)]
+    run("json (/ws)", json_frames, tokens, args.replies)
+    run("protobuf (/ws-bin)", proto_frames, tokens, args.replies)
+
+
+if __name__ == "__main__":
+    main()
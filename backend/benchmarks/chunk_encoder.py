@@ -0,0 +1,60 @@
+# benchmarks/chunk_encoder.py
+"""Chunk frames encoded per second: `encode_chat_chunk` vs `ChunkFrameEncoder`.
+
+    python benchmarks/chunk_encoder.py [--frames 200000]
+
+Encodes the same sequence of token deltas with both encoders (after checking
+that their bytes match) and reports throughput.
+"""
+import argparse
+import time
+
+from common import setup_env
+
+CONVERSATION_ID = 123456
+STREAM_ID = "9f2c4e1a7b3d4c5e8f9a0b1c2d3e4f50"
+
+
+def run_functions(tokens):
+    from proto_utils.serialization import encode_chat_chunk
+
+    for seq, token in enumerate(tokens, 1):
+        encode_chat_chunk(CONVERSATION_ID, token, stream_id=STREAM_ID, sequence=seq)
+
+
+def run_encoder(tokens):
+    from proto_utils.serialization import ChunkFrameEncoder
+
+    encoder = ChunkFrameEncoder(CONVERSATION_ID, STREAM_ID)
+    for seq, token in enumerate(tokens, 1):
+        encoder.chunk(token, seq)
+
+
+def measure(label, fn, tokens):
+    started = time.perf_counter()
+    fn(tokens)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<20} {len(tokens) / elapsed:>10,.0f} frames/s  {elapsed / len(tokens) * 1e6:5.2f}us/frame")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=200000)
+    args = parser.parse_args()
+
+    setup_env()
+    from proto_utils.serialization import ChunkFrameEncoder, encode_chat_chunk
+
+    words = "I hear you. It sounds like today asked a lot of you, and you still showed up. ".split(" ")
+    tokens = [(words[i % len(words)] + " ") for i in range(args.frames)]
+
+    encoder = ChunkFrameEncoder(CONVERSATION_ID, STREAM_ID)
+    for seq, token in enumerate(tokens[:1000], 1):
+        assert encoder.chunk(token, seq) == encode_chat_chunk(CONVERSATION_ID, token, STREAM_ID, seq)
+
+    measure("encode_chat_chunk", run_functions, tokens)
+    measure("ChunkFrameEncoder", run_encoder, tokens)
+
+
+if __name__ == "__main__":
+    main()
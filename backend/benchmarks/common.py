@@ -0,0 +1,37 @@
+# benchmarks/common.py
+"""Shared helpers for the benchmark scripts (run them from backend/)."""
+import os
+import statistics
+import sys
+from typing import List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_env(**overrides: str) -> None:
+    """Make backend modules importable with placeholder settings"""
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+    os.environ.setdefault("SUPABASE_KEY", "benchmark-key")
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark-key")
+    for key, value in overrides.items():
+        os.environ[key] = value
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize_ms(samples: List[float]) -> str:
+    if not samples:
+        return "n/a"
+    return (
+        f"p50={percentile(samples, 50) * 1000:7.1f}ms "
+        f"p95={percentile(samples, 95) * 1000:7.1f}ms "
+        f"mean={statistics.mean(samples) * 1000:7.1f}ms"
+    )
@@ -0,0 +1,68 @@
+-- benchmarks/conversation_list.sql
+-- Conversation list: denormalized columns vs aggregating over messages.
+--
+--   psql "$DATABASE_URL" -f benchmarks/conversation_list.sql
+--
+-- Seeds one user with 5,000 conversations x 20 messages (through the
+-- messages trigger), compares the two list queries with EXPLAIN ANALYZE,
+-- then rolls everything back. Point it at a local `supabase start` database.
+
+begin;
+
+insert into auth.users (id, email)
+values ('00000000-0000-0000-0000-00000000b001', 'bench@example.com');
+
+insert into public.conversations (user_id, created_at)
+select '00000000-0000-0000-0000-00000000b001', now() - (g || ' minutes')::interval
+from generate_series(1, 5000) g;
+
+insert into public.messages (conversation_id, role, content, created_at)
+select c.id,
+       (case when m % 2 = 0 then 'user' else 'ai' end)::role,
+       repeat('How did today go? ', 10),
+       c.created_at + (m || ' seconds')::interval
+from public.conversations c
+cross join generate_series(1, 20) m
+where c.user_id = '00000000-0000-0000-0000-00000000b001';
+
+analyze public.conversations;
+analyze public.messages;
+
+\echo '--- First page, denormalized (GET /api/v1/chat/conversations)'
+explain (analyze, buffers)
+select id, title, last_message_preview, message_count, last_activity
+from public.conversations
+where user_id = '00000000-0000-0000-0000-00000000b001'
+order by last_activity desc, id desc
+limit 21;
+
+\echo '--- Deep page (keyset cursor ~4,000 rows in, filter shape sent by the API)'
+select last_activity as cursor_at, id as cursor_id
+from public.conversations
+where user_id = '00000000-0000-0000-0000-00000000b001'
+order by last_activity desc, id desc
+offset 4000 limit 1 \gset
+
+explain (analyze, buffers)
+select id, title, last_message_preview, message_count, last_activity
+from public.conversations
+where user_id = '00000000-0000-0000-0000-00000000b001'
+  and last_activity <= :'cursor_at'
+  and (last_activity < :'cursor_at' or (last_activity = :'cursor_at' and id < :cursor_id))
+order by last_activity desc, id desc
+limit 21;
+
+\echo '--- First page, aggregating over messages at read time (before)'
+explain (analyze, buffers)
+select c.id, c.title,
+       (array_agg(m.content order by m.created_at desc))[1] as last_message_preview,
+       count(m.id) as message_count,
+       coalesce(max(m.created_at), c.created_at) as last_activity
+from public.conversations c
+left join public.messages m on m.conversation_id = c.id
+where c.user_id = '00000000-0000-0000-0000-00000000b001'
+group by c.id
+order by last_activity desc, c.id desc
+limit 21;
+
+rollback;
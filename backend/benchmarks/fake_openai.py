@@ -0,0 +1,125 @@
+# benchmarks/fake_openai.py
+"""Minimal local stand-in for the OpenAI chat completions API.
+
+Streams a fixed reply token by token with configurable latency so the
+benchmarks can exercise the real client code without network access.
+Run standalone with `python benchmarks/fake_openai.py --port 8765`.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import socket
+import time
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+REPLY_TOKENS = [
+    "It ", "sounds ", "like ", "today ", "was ", "a ", "full ", "day. ",
+    "What ", "felt ", "most ", "meaningful ", "to ", "you, ", "and ", "what ",
+    "would ", "you ", "like ", "to ", "carry ", "into ", "tomorrow?",
+]
+
+
+def build_app(first_token_delay: float = 0.2, token_delay: float = 0.02, num_tokens: int = 50) -> Starlette:
+    stats = {"requests": 0, "tokens_sent": 0}
+
+    def _chunk(content: str, finish_reason=None) -> str:
+        delta = {"content": content} if content else {}
+        return "data: " + json.dumps({
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": "gpt-4",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }) + "\n\n"
+
+    chunks = {token: _chunk(token) for token in REPLY_TOKENS}
+
+    async def completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        tokens = [REPLY_TOKENS[i % len(REPLY_TOKENS)] for i in range(num_tokens)]
+
+        if not body.get("stream"):
+            await asyncio.sleep(first_token_delay + token_delay * num_tokens)
+            stats["tokens_sent"] += num_tokens
+            return JSONResponse({
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": "gpt-4",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": num_tokens, "total_tokens": num_tokens},
+            })
+
+        async def events():
+            await asyncio.sleep(first_token_delay)
+            for token in tokens:
+                stats["tokens_sent"] += 1
+                yield chunks[token]
+                await asyncio.sleep(token_delay)
+            yield _chunk("", finish_reason="stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def get_stats(request: Request):
+        return JSONResponse(stats)
+
+    return Starlette(routes=[
+        Route("/v1/chat/completions", completions, methods=["POST"]),
+        Route("/stats", get_stats, methods=["GET"]),
+    ])
+
+
+def _serve(port: int, first_token_delay: float, token_delay: float, num_tokens: int) -> None:
+    import uvicorn
+    uvicorn.run(
+        build_app(first_token_delay, token_delay, num_tokens),
+        host="127.0.0.1",
+        port=port,
+        log_level="warning",
+        backlog=4096,
+    )
+
+
+def start_in_background(
+    port: int = 8765,
+    first_token_delay: float = 0.2,
+    token_delay: float = 0.02,
+    num_tokens: int = 50,
+) -> multiprocessing.Process:
+    """Start the fake server in a child process and wait until it accepts connections"""
+    proc = multiprocessing.Process(
+        target=_serve,
+        args=(port, first_token_delay, token_delay, num_tokens),
+        daemon=True,
+    )
+    proc.start()
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.terminate()
+    raise RuntimeError("Fake OpenAI server did not start")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--num-tokens", type=int, default=50)
+    args = parser.parse_args()
+    _serve(args.port, args.first_token_delay, args.token_delay, args.num_tokens)
@@ -0,0 +1,114 @@
+# benchmarks/idempotent_retries.py
+"""Upstream completions and retry latency when clients resend a message.
+
+    python benchmarks/idempotent_retries.py [--clients 50] [--retries 2] [--retry-after-ms 300]
+
+Each client starts a streamed reply (the same coalesce-and-publish loop the
+chat endpoints use) against a local fake OpenAI, then resends the same
+request `--retries` times, `--retry-after-ms` apart, as a client does after
+a timeout. Every send reads its stream to the end. Runs once without keys
+(every retry is a new generation) and once through the idempotency store,
+and reports the upstream requests made (from the fake server's /stats) and
+the time from each retry to its final frame.
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+
+from common import setup_env, summarize_ms
+import fake_openai
+
+PORT = 8768
+
+
+async def upstream_requests(http: httpx.AsyncClient) -> int:
+    return (await http.get(f"http://127.0.0.1:{PORT}/stats")).json()["requests"]
+
+
+async def start_stream(user_id: str):
+    from services import llm
+    from services.stream_coalescer import CoalesceConfig, coalesce
+    from services.stream_registry import stream_registry
+
+    stream = stream_registry.create(user_id, 1)
+
+    async def generate():
+        text = ""
+        async for part in coalesce(llm.stream_chat([{"role": "user", "content": "hi"}]), CoalesceConfig.from_params()):
+            text += part
+            stream.publish(part)
+        stream.complete(text)
+
+    stream_registry.run(stream, generate())
+    return stream
+
+
+async def send(user_id: str, key):
+    from services.idempotency import idempotency_store, request_fingerprint
+
+    started = time.perf_counter()
+    if key is None:
+        stream = await start_stream(user_id)
+    else:
+        stream = await idempotency_store.run(
+            "stream", user_id, key, request_fingerprint("hi", None, "check_in"),
+            lambda: start_stream(user_id),
+            reusable=lambda stream: not stream.failed
+        )
+    async for _ in stream.follow():
+        pass
+    return time.perf_counter() - started
+
+
+async def run_client(user_id: str, retries: int, retry_after: float, keyed: bool):
+    key = uuid.uuid4().hex if keyed else None
+    sends = [asyncio.create_task(send(user_id, key))]
+    for _ in range(retries):
+        await asyncio.sleep(retry_after)
+        sends.append(asyncio.create_task(send(user_id, key)))
+    durations = await asyncio.gather(*sends)
+    return durations[1:]
+
+
+async def run_mode(http, clients: int, retries: int, retry_after: float, keyed: bool):
+    before = await upstream_requests(http)
+    results = await asyncio.gather(*[
+        run_client(f"user-{i}", retries, retry_after, keyed) for i in range(clients)
+    ])
+    retry_times = [t for client in results for t in client]
+    return await upstream_requests(http) - before, retry_times
+
+
+async def main_async(clients: int, retries: int, retry_after: float) -> None:
+    async with httpx.AsyncClient() as http:
+        print(f"{clients} clients, {retries} retries each, {retry_after * 1000:.0f}ms apart")
+        for keyed in (False, True):
+            requests, retry_times = await run_mode(http, clients, retries, retry_after, keyed)
+            label = "idempotency key" if keyed else "no key"
+            print(f"{label:>16}: upstream requests={requests:4d}  retry -> complete {summarize_ms(retry_times)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--retry-after-ms", type=float, default=300)
+    parser.add_argument("--tokens", type=int, default=100)
+    parser.add_argument("--token-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    setup_env(OPENAI_BASE_URL=f"http://127.0.0.1:{PORT}/v1")
+    server = fake_openai.start_in_background(
+        PORT, first_token_delay=0.3, token_delay=args.token_ms / 1000, num_tokens=args.tokens
+    )
+    try:
+        asyncio.run(main_async(args.clients, args.retries, args.retry_after_ms / 1000))
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
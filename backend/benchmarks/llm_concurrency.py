@@ -0,0 +1,91 @@
+# benchmarks/llm_concurrency.py
+"""Time-to-first-token under concurrent streams against a local fake OpenAI.
+
+    python benchmarks/llm_concurrency.py [--levels 1,10,100,300] [--blocking]
+
+`--blocking` replays the old behaviour (sync `openai.OpenAI` stream iterated
+inside the event loop) for comparison; TTFT then grows with concurrency
+because every stream waits for the ones ahead of it.
+"""
+import argparse
+import asyncio
+import time
+
+from common import setup_env, summarize_ms
+import fake_openai
+
+PORT = 8765
+
+
+async def _one_async_stream(llm, llm_client, started, results):
+    ttft = None
+    async for _ in llm.stream_chat([{"role": "user", "content": "hi"}], llm_client=llm_client):
+        if ttft is None:
+            ttft = time.perf_counter() - started
+    results.append((ttft, time.perf_counter() - started))
+
+
+async def _one_blocking_stream(sync_client, started, results):
+    ttft = None
+    stream = sync_client.chat.completions.create(
+        model="gpt-4",
+        messages=[{"role": "user", "content": "hi"}],
+        stream=True,
+    )
+    for chunk in stream:
+        if ttft is None and chunk.choices and chunk.choices[0].delta.content:
+            ttft = time.perf_counter() - started
+        await asyncio.sleep(0)  # the old handler awaited send_json per chunk
+    results.append((ttft, time.perf_counter() - started))
+
+
+async def run_level(concurrency: int, blocking: bool) -> None:
+    from services import llm
+
+    base_url = f"http://127.0.0.1:{PORT}/v1"
+    results = []
+    # All streams are "requested" at the same instant, so TTFT includes any
+    # time spent waiting for the event loop to get around to them.
+    started = time.perf_counter()
+    if blocking:
+        import openai
+        sync_client = openai.OpenAI(api_key="benchmark-key", base_url=base_url)
+        await asyncio.gather(*[_one_blocking_stream(sync_client, started, results) for _ in range(concurrency)])
+        sync_client.close()
+    else:
+        llm_client = llm.create_client(base_url=base_url, api_key="benchmark-key")
+        await asyncio.gather(*[_one_async_stream(llm, llm_client, started, results) for _ in range(concurrency)])
+        await llm_client.close()
+    wall = time.perf_counter() - started
+
+    ttfts = [r[0] for r in results if r[0] is not None]
+    totals = [r[1] for r in results]
+    print(
+        f"streams={concurrency:4d}  ttft {summarize_ms(ttfts)}  "
+        f"total {summarize_ms(totals)}  wall={wall:6.2f}s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--levels", default="1,10,50,100,200,300")
+    parser.add_argument("--blocking", action="store_true")
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--num-tokens", type=int, default=50)
+    args = parser.parse_args()
+
+    setup_env()
+    server = fake_openai.start_in_background(
+        PORT, args.first_token_delay, args.token_delay, args.num_tokens
+    )
+    try:
+        print(f"mode={'blocking sync client' if args.blocking else 'async client'}")
+        for level in [int(x) for x in args.levels.split(",")]:
+            asyncio.run(run_level(level, args.blocking))
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# benchmarks/replay_long_conversations.py
+"""Replay long synthetic conversations through context assembly.
+
+    python benchmarks/replay_long_conversations.py [--turns 300] [--budget 6000]
+
+Reports prompt tokens per turn with the token budget and rolling summary
+against the old "send everything" behaviour. The summarizer is a local
+stand-in that truncates, so no API calls are made.
+"""
+import argparse
+import asyncio
+import random
+
+from common import setup_env
+
+WORDS = (
+    "today felt long but I managed to finish the report and go for a run "
+    "my sister called and we talked about the move next month I am nervous "
+    "about the interview tomorrow and slept badly again although the morning "
+    "walk helped and I want to keep journaling every evening this week"
+).split()
+
+
+def synthetic_turn(rng: random.Random, role: str) -> dict:
+    length = rng.randint(15, 90) if role == "user" else rng.randint(60, 220)
+    return {"role": role, "content": " ".join(rng.choice(WORDS) for _ in range(length))}
+
+
+async def replay(turns: int, budget: int, seed: int) -> None:
+    from services.context_window import assemble_context, count_tokens, fold_history
+
+    async def summarize(previous, messages):
+        # Stand-in: keep the tail of the transcript, capped like a real summary
+        text = " ".join(m["content"] for m in messages)
+        return ((previous or "") + " " + text)[-1200:].strip()
+
+    rng = random.Random(seed)
+    system_prompt = "You are an AI assistant that represents the user's best self. " * 8
+    history = []
+    summary, summary_count = None, 0
+    summary_calls = 0
+
+    print(f"{'turn':>5} {'history':>8} {'unbounded':>10} {'budgeted':>9} {'verbatim':>9} {'summarized':>11}")
+    for turn in range(1, turns + 1):
+        user = synthetic_turn(rng, "user")
+        window = assemble_context(system_prompt, history, user["content"], summary, summary_count, budget=budget)
+        unbounded = count_tokens(system_prompt) + sum(count_tokens(m["content"]) + 4 for m in history + [user]) + 4
+
+        if turn == 1 or turn % 25 == 0 or turn == turns:
+            print(
+                f"{turn:5d} {len(history):8d} {unbounded:10d} {window.prompt_tokens:9d} "
+                f"{len(history) - window.first_kept:9d} {summary_count:11d}"
+            )
+        assert window.prompt_tokens <= budget
+
+        history += [user, synthetic_turn(rng, "ai")]
+        if window.first_kept > summary_count:
+            new_summary, new_count = await fold_history(history[:-2], summary, summary_count, budget, summarize)
+            if new_count != summary_count:
+                summary_calls += 1
+            summary, summary_count = new_summary, new_count
+
+    print(f"summary updates: {summary_calls} over {turns} turns")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=300)
+    parser.add_argument("--budget", type=int, default=6000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    setup_env()
+    asyncio.run(replay(args.turns, args.budget, args.seed))
+
+
+if __name__ == "__main__":
+    main()
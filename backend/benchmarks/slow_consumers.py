@@ -0,0 +1,113 @@
+# benchmarks/slow_consumers.py
+"""Send-queue behaviour with stalled and slow clients.
+
+    python benchmarks/slow_consumers.py [--stalled 20] [--slow 20] [--healthy 20]
+
+Streams the same fast reply to many in-process chat connections whose
+sockets are healthy, slow (each send takes `--slow-ms`) or stalled (sends
+never complete), and reports frames delivered, queued bytes and what the
+slow-consumer policy did. The sockets are stand-ins; everything between
+the replay stream and `send_bytes` is the production code.
+"""
+import argparse
+import asyncio
+import time
+
+from common import setup_env
+
+
+class FakeSocket:
+    def __init__(self, send_delay):
+        # None = stalled: sends never complete
+        self.send_delay = send_delay
+        self.frames = 0
+        self.bytes = 0
+        self.closed_with = None
+
+    @property
+    def client_state(self):
+        from starlette.websockets import WebSocketState
+        return WebSocketState.CONNECTED
+
+    async def send_bytes(self, data):
+        if self.send_delay is None:
+            await asyncio.Event().wait()
+        if self.send_delay:
+            await asyncio.sleep(self.send_delay)
+        self.frames += 1
+        self.bytes += len(data)
+
+    async def send_text(self, data):
+        await self.send_bytes(data.encode())
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+async def main_async(args) -> None:
+    from proto_utils.serialization import ChunkFrameEncoder
+    from services.chat_connection import ChatConnection, connection_metrics
+    from services.stream_registry import stream_registry
+
+    kinds = ["stalled"] * args.stalled + ["slow"] * args.slow + ["healthy"] * args.healthy
+    delays = {"stalled": None, "slow": args.slow_ms / 1000, "healthy": 0}
+    sockets = [FakeSocket(delays[kind]) for kind in kinds]
+    connections = [
+        ChatConnection(ws, max_queue_bytes=args.queue_kib * 1024, send_timeout=args.timeout)
+        for ws in sockets
+    ]
+
+    async def deliver(connection, stream):
+        frames = ChunkFrameEncoder(stream.conversation_id, stream.stream_id)
+        async for event in stream.follow():
+            await connection.send_chunk(stream.stream_id, event.sequence, event.text, frames.chunk)
+
+    streams = [stream_registry.create("benchmark-user", i + 1) for i in range(len(connections))]
+    for connection, stream in zip(connections, streams):
+        connection.spawn(deliver(connection, stream))
+
+    token = "x" * args.token_bytes
+    started = time.perf_counter()
+    for _ in range(args.tokens):
+        for stream in streams:
+            stream.publish(token)
+        await asyncio.sleep(args.token_ms / 1000)
+    for stream in streams:
+        stream.complete("")
+    await asyncio.sleep(args.timeout + 0.5)
+    elapsed = time.perf_counter() - started
+
+    print(f"{args.tokens} tokens x {args.token_bytes}B per stream, queue cap {args.queue_kib}KiB, deadline {args.timeout}s")
+    for kind in ("healthy", "slow", "stalled"):
+        group = [(ws, c) for ws, c, k in zip(sockets, connections, kinds) if k == kind]
+        if not group:
+            continue
+        print(
+            f"{kind:<8} n={len(group):3d}  frames/conn={sum(ws.frames for ws, _ in group) / len(group):7.1f}  "
+            f"delivered/conn={sum(ws.bytes for ws, _ in group) / len(group) / 1024:7.1f}KiB  "
+            f"closed(1013)={sum(ws.closed_with == 1013 for ws, _ in group):3d}"
+        )
+    print(f"elapsed={elapsed:.1f}s  {connection_metrics.stats()}")
+    for connection in connections:
+        await connection.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--stalled", type=int, default=20)
+    parser.add_argument("--slow", type=int, default=20)
+    parser.add_argument("--healthy", type=int, default=20)
+    parser.add_argument("--slow-ms", type=float, default=50.0)
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--token-bytes", type=int, default=16)
+    parser.add_argument("--token-ms", type=float, default=1.0)
+    parser.add_argument("--queue-kib", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=2.0)
+    args = parser.parse_args()
+
+    setup_env()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
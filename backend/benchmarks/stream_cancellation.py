@@ -0,0 +1,94 @@
+# benchmarks/stream_cancellation.py
+"""Upstream tokens consumed after a client cancels a stream.
+
+    python benchmarks/stream_cancellation.py [--trials 20] [--cancel-after 20]
+
+Runs replies through the stream registry (the same coalesce-and-publish
+loop the chat endpoints use) against a local fake OpenAI, cancels each one
+via `stream_registry.cancel` after `--cancel-after` frames, and reports how
+long the generation task takes to stop (which includes closing the
+upstream HTTP response) and how many tokens the fake upstream sent after
+the cancel, read from its /stats endpoint. Coalescing uses the configured
+defaults.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from common import setup_env, summarize_ms
+import fake_openai
+
+PORT = 8767
+
+
+async def upstream_tokens(http: httpx.AsyncClient) -> int:
+    return (await http.get(f"http://127.0.0.1:{PORT}/stats")).json()["tokens_sent"]
+
+
+async def run_trial(http, cancel_after: int):
+    from services import llm
+    from services.stream_coalescer import CoalesceConfig, coalesce
+    from services.stream_registry import stream_registry
+
+    stream = stream_registry.create("benchmark-user", 1)
+
+    async def generate():
+        async for part in coalesce(llm.stream_chat([{"role": "user", "content": "hi"}]), CoalesceConfig.from_params()):
+            stream.publish(part)
+        stream.complete("")
+
+    task = stream_registry.run(stream, generate())
+    async for event in stream.follow():
+        if event.sequence >= cancel_after:
+            break
+
+    sent_at_cancel = await upstream_tokens(http)
+    started = time.perf_counter()
+    stream_registry.cancel(stream.stream_id, "benchmark-user")
+    await asyncio.gather(task, return_exceptions=True)
+    stopped = time.perf_counter() - started
+
+    # Give the fake server time to notice the closed connection
+    await asyncio.sleep(0.3)
+    return stopped, await upstream_tokens(http) - sent_at_cancel
+
+
+async def main_async(trials: int, cancel_after: int, num_tokens: int) -> None:
+    async with httpx.AsyncClient() as http:
+        stop_times, extra_tokens = [], []
+        for _ in range(trials):
+            stopped, extra = await run_trial(http, cancel_after)
+            stop_times.append(stopped)
+            extra_tokens.append(extra)
+
+    print(f"reply length: {num_tokens} tokens, cancelled after {cancel_after} frames, {trials} trials")
+    print(f"cancel -> generation stopped: {summarize_ms(stop_times)}")
+    print(
+        f"upstream tokens after cancel: max={max(extra_tokens)} "
+        f"mean={sum(extra_tokens) / len(extra_tokens):.1f} "
+        f"(uncancelled would be {num_tokens - cancel_after})"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--trials", type=int, default=20)
+    parser.add_argument("--cancel-after", type=int, default=20)
+    parser.add_argument("--tokens", type=int, default=400)
+    parser.add_argument("--token-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    setup_env(OPENAI_BASE_URL=f"http://127.0.0.1:{PORT}/v1")
+    server = fake_openai.start_in_background(
+        PORT, first_token_delay=0.05, token_delay=args.token_ms / 1000, num_tokens=args.tokens
+    )
+    try:
+        asyncio.run(main_async(args.trials, args.cancel_after, args.tokens))
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/stream_coalescing.py
+"""Frames per reply and bytes on the wire with and without coalescing.
+
+    python benchmarks/stream_coalescing.py [--tokens 300] [--token-ms 15]
+
+Replays a synthetic token stream (with bursty arrival, like a real
+upstream) through `coalesce` and counts the `/ws` JSON frames it produces.
+Wire bytes include a 2-byte WebSocket header per frame (server frames are
+unmasked; payloads up to 125 bytes use 2 bytes, up to 64KiB use 4).
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from common import setup_env
+
+
+def ws_frame_bytes(payload_len: int) -> int:
+    header = 2 if payload_len <= 125 else 4 if payload_len < 65536 else 10
+    return header + payload_len
+
+
+async def token_stream(tokens, token_delay: float, seed: int):
+    rng = random.Random(seed)
+    for token in tokens:
+        # Upstream deltas often arrive in small bursts
+        if rng.random() < 0.7:
+            await asyncio.sleep(token_delay * rng.uniform(0.5, 2.0))
+        yield token
+
+
+async def run_config(label, config, tokens, token_delay):
+    from services.stream_coalescer import coalesce
+
+    started = time.perf_counter()
+    ttft = None
+    frames = 0
+    wire = 0
+    async for text in coalesce(token_stream(tokens, token_delay, 1), config):
+        if ttft is None:
+            ttft = time.perf_counter() - started
+        frames += 1
+        payload = json.dumps({"type": "message_chunk", "chunk": text, "conversation_id": 123456})
+        wire += ws_frame_bytes(len(payload.encode()))
+    total = time.perf_counter() - started
+    print(
+        f"{label:<22} frames={frames:4d}  wire={wire:6d}B  "
+        f"bytes/frame={wire / frames:6.1f}  ttft={ttft * 1000:5.1f}ms  total={total:5.2f}s"
+    )
+
+
+async def main_async(num_tokens: int, token_delay: float) -> None:
+    from services.stream_coalescer import CoalesceConfig
+
+    words = "I hear you. It sounds like today asked a lot of you, and you still showed up. ".split(" ")
+    tokens = [(words[i % len(words)] + " ") for i in range(num_tokens)]
+    for label, config in [
+        ("off (one per delta)", CoalesceConfig(0, 0)),
+        ("32B / 20ms", CoalesceConfig(32, 20)),
+        ("48B / 30ms (default)", CoalesceConfig(48, 30)),
+        ("128B / 60ms", CoalesceConfig(128, 60)),
+        ("512B / 150ms", CoalesceConfig(512, 150)),
+    ]:
+        await run_config(label, config, tokens, token_delay)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tokens", type=int, default=300)
+    parser.add_argument("--token-ms", type=float, default=15.0)
+    args = parser.parse_args()
+
+    setup_env()
+    asyncio.run(main_async(args.tokens, args.token_ms / 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# benchmarks/tts_cache.py
+"""Synthesis latency and provider calls with and without the TTS cache.
+
+    python benchmarks/tts_cache.py [--requests 400] [--concurrency 20] [--repeat-share 0.7]
+
+Replays a stream of synthesis requests like /voice/synthesize gets: a
+`--repeat-share` of them are the follow-up suggestions (in random
+spacing and whitespace), the rest unique sentences. "uncached" calls the
+local synthesizer for each; "cached" goes through `services.tts_cache`
+starting cold; "warmed" warms the cache from the suggestion phrases
+first, as startup does. Reports latency percentiles, provider calls
+and the cache's hit ratio and bytes saved.
+"""
+import argparse
+import asyncio
+import random
+import shutil
+import tempfile
+import time
+
+from common import setup_env, summarize_ms
+
+
+def workload(requests: int, repeat_share: float, phrases, seed: int = 7):
+    rng = random.Random(seed)
+    texts = []
+    for index in range(requests):
+        if rng.random() < repeat_share:
+            words = rng.choice(phrases).split()
+            # Same phrase, different spacing: normalized to one key
+            texts.append(" ".join(words) + " " * rng.randint(0, 2))
+        else:
+            texts.append(f"Here is a thought about day {index} and how it went.")
+    return texts
+
+
+async def run_mode(texts, concurrency: int, synthesize):
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(text):
+        async with slots:
+            started = time.perf_counter()
+            await synthesize(text)
+            return time.perf_counter() - started
+
+    return await asyncio.gather(*[one(text) for text in texts])
+
+
+async def main_async(requests: int, concurrency: int, repeat_share: float) -> None:
+    from routers.chat import suggestion_phrases
+    from services.speech import LocalSynthesizer
+    from services.tts_cache import TTSCache
+    from services.audio_store import AudioStore
+
+    class CountingSynthesizer(LocalSynthesizer):
+        calls = 0
+
+        def synthesize(self, text, voice_id=None, audio_format=None):
+            self.calls += 1
+            return super().synthesize(text, voice_id, audio_format)
+
+    phrases = suggestion_phrases()
+    texts = workload(requests, repeat_share, phrases)
+    print(f"{requests} requests, {concurrency} concurrent, {repeat_share:.0%} repeated phrases")
+
+    synthesizer = CountingSynthesizer(first_byte_latency=0.15)
+
+    async def uncached(text):
+        async for _ in synthesizer.synthesize(text):
+            pass
+
+    samples = await run_mode(texts, concurrency, uncached)
+    print(f"{'uncached':>9}: {summarize_ms(samples)}  {synthesizer.calls:4d} provider calls")
+
+    for label, warm in (("cached", False), ("warmed", True)):
+        root = tempfile.mkdtemp(prefix="tts-cache-")
+        try:
+            cache = TTSCache(AudioStore(f"{root}/audio", 1 << 30), f"{root}/keys", 64 << 20, 1 << 20)
+            synthesizer = CountingSynthesizer(first_byte_latency=0.15)
+            if warm:
+                await cache.warm(phrases, synthesizer, "benchmark-voice")
+            samples = await run_mode(
+                texts, concurrency, lambda text: cache.synthesize(text, synthesizer, "benchmark-voice")
+            )
+            stats = cache.stats()
+            print(
+                f"{label:>9}: {summarize_ms(samples)}  {synthesizer.calls:4d} provider calls"
+                f"  hit ratio {stats['hit_ratio']:.2f}  {stats['bytes_saved'] / 1e6:.1f}MB saved"
+            )
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--repeat-share", type=float, default=0.7)
+    args = parser.parse_args()
+
+    setup_env()
+    asyncio.run(main_async(args.requests, args.concurrency, args.repeat_share))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# benchmarks/upload_memory.py
+"""Peak memory per concurrent voice-clone upload, Starlette forms vs spooling.
+
+    python benchmarks/upload_memory.py [--uploads 20] [--samples 3] [--sample-seconds 10]
+
+Builds a multipart body like a voice clone upload (`--samples` WAV files of
+`--sample-seconds` each, 44.1kHz mono) and feeds it to `--uploads`
+concurrent requests in 64KB ASGI messages, interleaved as they would be
+from the network. "starlette" parses with `request.form()`, as
+`File(...)` parameters do; "spooled" goes through
+`services.uploads.spool_form`. Each upload holds its parsed form until
+all of them are parsed, as an endpoint does while it works. Reports the
+tracemalloc peak above the baseline, per upload, and the elapsed time.
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+import uuid
+
+from common import setup_env
+
+CHUNK = 64 * 1024
+
+
+def clone_body(samples: int, seconds: int):
+    from services.speech import wav
+
+    boundary = uuid.uuid4().hex
+    parts = [
+        f'--{boundary}\r\nContent-Disposition: form-data; name="voice_name"\r\n\r\nme\r\n'.encode(),
+        f'--{boundary}\r\nContent-Disposition: form-data; name="user_id"\r\n\r\nbenchmark-user\r\n'.encode(),
+    ]
+    for index in range(samples):
+        audio = wav(bytes([index]) * (44100 * 2 * seconds), 44100)
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="voice_samples"; '
+            f'filename="sample{index}.wav"\r\nContent-Type: audio/wav\r\n\r\n'.encode()
+            + audio + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def make_request(chunks, content_type: str, size: int):
+    from starlette.requests import Request
+
+    messages = iter(chunks)
+
+    async def receive():
+        # Let the other uploads run, as network reads would
+        await asyncio.sleep(0)
+        chunk = next(messages, None)
+        if chunk is None:
+            return {"type": "http.request", "body": b"", "more_body": False}
+        return {"type": "http.request", "body": chunk, "more_body": True}
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/api/v1/voice/clone",
+        "headers": [(b"content-type", content_type.encode()), (b"content-length", str(size).encode())],
+    }
+    return Request(scope, receive)
+
+
+async def starlette_upload(request, parsed: asyncio.Barrier):
+    form = await request.form()
+    await parsed.wait()
+    await form.close()
+
+
+async def spooled_upload(request, parsed: asyncio.Barrier):
+    from services.uploads import spool_form
+
+    form = await spool_form(request, max_bytes=1 << 30, max_files=25)
+    await parsed.wait()
+    await form.aclose()
+
+
+async def run_mode(upload, chunks, content_type: str, size: int, uploads: int):
+    requests = [make_request(chunks, content_type, size) for _ in range(uploads)]
+    parsed = asyncio.Barrier(uploads)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    await asyncio.gather(*[upload(request, parsed) for request in requests])
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return (peak - baseline) / uploads, elapsed
+
+
+async def main_async(uploads: int, samples: int, seconds: int) -> None:
+    # Imported up front so module setup isn't counted
+    import services.uploads  # noqa: F401
+
+    body, content_type = clone_body(samples, seconds)
+    chunks = [body[i:i + CHUNK] for i in range(0, len(body), CHUNK)]
+    print(f"{uploads} concurrent uploads of {samples} x {seconds}s samples ({len(body) / 1e6:.1f}MB each)")
+    for label, upload in (("starlette", starlette_upload), ("spooled", spooled_upload)):
+        per_upload, elapsed = await run_mode(upload, chunks, content_type, len(body), uploads)
+        print(f"{label:>10}: peak {per_upload / 1024:8.1f}KB per upload, {elapsed * 1000:7.1f}ms total")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--uploads", type=int, default=20)
+    parser.add_argument("--samples", type=int, default=3)
+    parser.add_argument("--sample-seconds", type=int, default=10)
+    args = parser.parse_args()
+
+    setup_env()
+    asyncio.run(main_async(args.uploads, args.samples, args.sample_seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# benchmarks/voice_end_of_speech.py
+"""End of speech to first reply audio for streamed microphone input.
+
+    python benchmarks/voice_end_of_speech.py [--fixtures DIR] [--trials 1]
+
+Plays utterances into a `VoiceListener` in real time, 20ms frames at a
+time, as `/ws-bin` does with a client's `audio` frames. `--fixtures` is a
+directory of recordings as raw .pcm files (16kHz signed 16-bit
+little-endian mono, e.g. `ffmpeg -i in.wav -f s16le -ac 1 -ar 16000
+out.pcm`); without it, synthetic utterances (three voiced phrases with
+pauses over a noise floor) are used. When the VAD ends the utterance,
+the reply goes through `speak_reply` with a local fake OpenAI and the
+local synthesizer.
+
+"whole" transcribes each utterance in one piece after it ends, like an
+upload; "incremental" transcribes it phrase by phrase while it is
+spoken. Both count from the last voiced frame, so the VAD's end silence
+is included.
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import struct
+import time
+
+from common import setup_env, summarize_ms
+import fake_openai
+
+PORT = 8770
+SAMPLE_RATE = 16000
+
+
+def synthetic_utterance(seed: int, phrases: int = 3) -> bytes:
+    """Syllable-like tone bursts in phrases, with pauses, over low noise"""
+    rng = random.Random(seed)
+    samples = []
+
+    def silence(ms):
+        samples.extend(rng.randint(-120, 120) for _ in range(SAMPLE_RATE * ms // 1000))
+
+    silence(500)
+    for phrase in range(phrases):
+        for _ in range(rng.randint(6, 10)):
+            frequency = rng.uniform(120, 260)
+            length = SAMPLE_RATE * rng.randint(150, 260) // 1000
+            samples.extend(
+                int(5000 * math.sin(math.pi * i / length) * math.sin(2 * math.pi * frequency * i / SAMPLE_RATE))
+                + rng.randint(-120, 120)
+                for i in range(length)
+            )
+            silence(rng.randint(40, 90))
+        silence(rng.randint(350, 500) if phrase < phrases - 1 else 1500)
+    return struct.pack(f"<{len(samples)}h", *samples)
+
+
+def load_fixtures(directory: str):
+    paths = sorted(p for p in os.listdir(directory) if p.endswith(".pcm"))
+    if not paths:
+        raise SystemExit(f"No .pcm files in {directory}")
+    fixtures = []
+    for name in paths:
+        with open(os.path.join(directory, name), "rb") as f:
+            # Room for the VAD's end silence
+            fixtures.append(f.read() + bytes(SAMPLE_RATE * 2))
+    return fixtures
+
+
+async def run_trial(pcm: bytes, incremental: bool, transcriber, synthesizer):
+    from services import llm
+    from services.vad import FRAME_MS, SPEECH_END
+    from services.voice_pipeline import AUDIO, ERROR, VoiceListener, speak_reply
+
+    listener = VoiceListener(transcriber, min_segment_ms=2000 if incremental else 10 ** 9)
+    frame_bytes = SAMPLE_RATE * FRAME_MS // 1000 * 2
+    started = time.perf_counter()
+    utterance = None
+    for index, offset in enumerate(range(0, len(pcm), frame_bytes)):
+        # Real time: frame `index` arrives FRAME_MS * index after the start
+        delay = started + index * FRAME_MS / 1000 - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        events = listener.feed(pcm[offset:offset + frame_bytes])
+        ended = [u for event, u in events if event == SPEECH_END]
+        if ended:
+            utterance = ended[0]
+            end_of_speech = time.perf_counter() - listener.vad.silent_run * FRAME_MS / 1000
+            break
+    if utterance is None:
+        raise SystemExit("The VAD found no complete utterance; add trailing silence to the fixture")
+
+    transcript = await utterance.transcript()
+    transcribed = time.perf_counter() - end_of_speech
+    first = None
+    async for event in speak_reply(llm.stream_chat([{"role": "user", "content": transcript}]), synthesizer):
+        if event.kind == AUDIO:
+            first = time.perf_counter() - end_of_speech
+            break
+        if event.kind == ERROR:
+            raise RuntimeError(event.text)
+    return transcribed, first
+
+
+async def main_async(fixtures, trials: int) -> None:
+    from services.speech import LocalSynthesizer, LocalTranscriber
+
+    transcriber = LocalTranscriber(latency=0.3, realtime_factor=0.1)
+    synthesizer = LocalSynthesizer(first_byte_latency=0.15)
+    for label, incremental in (("whole", False), ("incremental", True)):
+        results = []
+        for _ in range(trials):
+            for pcm in fixtures:
+                results.append(await run_trial(pcm, incremental, transcriber, synthesizer))
+        print(f"{label:>11}: transcript  {summarize_ms([r[0] for r in results])}")
+        print(f"{'':>11}  first audio {summarize_ms([r[1] for r in results])}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fixtures", help="directory of 16kHz mono PCM16 .pcm recordings")
+    parser.add_argument("--utterances", type=int, default=3, help="synthetic utterances, without --fixtures")
+    parser.add_argument("--trials", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.fixtures:
+        fixtures = load_fixtures(args.fixtures)
+    else:
+        fixtures = [synthetic_utterance(seed) for seed in range(args.utterances)]
+    seconds = sum(len(pcm) for pcm in fixtures) / (SAMPLE_RATE * 2)
+
+    setup_env(OPENAI_BASE_URL=f"http://127.0.0.1:{PORT}/v1")
+    server = fake_openai.start_in_background(PORT, first_token_delay=0.4, token_delay=0.03, num_tokens=60)
+    try:
+        print(f"{len(fixtures)} utterances ({seconds:.1f}s of audio) x {args.trials} trials, played in real time")
+        asyncio.run(main_async(fixtures, args.trials))
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# benchmarks/voice_first_audio.py
+"""Time to first reply audio byte for a voice turn, pipelined vs sequential.
+
+    python benchmarks/voice_first_audio.py [--turns 20] [--tokens 60] [--token-ms 30]
+
+Runs voice turns offline: the local transcriber, a local fake OpenAI for
+the reply, and the local synthesizer. "sequential" transcribes, waits for
+the whole reply, then synthesizes it; "pipelined" goes through
+`speak_reply`, which starts synthesizing each sentence as soon as the
+model finishes it. Reports time to the first audio byte and to the last.
+"""
+import argparse
+import asyncio
+import time
+
+from common import setup_env, summarize_ms
+import fake_openai
+
+PORT = 8769
+
+
+async def sequential_turn(transcriber, synthesizer):
+    from services import llm
+
+    started = time.perf_counter()
+    transcript = await transcriber.transcribe(b"", "wav")
+    reply = "".join([delta async for delta in llm.stream_chat([{"role": "user", "content": transcript}])])
+    first = None
+    async for _ in synthesizer.synthesize(reply):
+        first = first or time.perf_counter() - started
+    return first, time.perf_counter() - started
+
+
+async def pipelined_turn(transcriber, synthesizer):
+    from services import llm
+    from services.voice_pipeline import AUDIO, ERROR, speak_reply
+
+    started = time.perf_counter()
+    transcript = await transcriber.transcribe(b"", "wav")
+    first = None
+    async for event in speak_reply(llm.stream_chat([{"role": "user", "content": transcript}]), synthesizer):
+        if event.kind == AUDIO:
+            first = first or time.perf_counter() - started
+        elif event.kind == ERROR:
+            raise RuntimeError(event.text)
+    return first, time.perf_counter() - started
+
+
+async def main_async(turns: int) -> None:
+    from services.speech import LocalSynthesizer, LocalTranscriber
+
+    transcriber = LocalTranscriber(latency=0.3)
+    synthesizer = LocalSynthesizer(first_byte_latency=0.15)
+    for label, turn in (("sequential", sequential_turn), ("pipelined", pipelined_turn)):
+        results = [await turn(transcriber, synthesizer) for _ in range(turns)]
+        print(f"{label:>10}: first audio {summarize_ms([r[0] for r in results])}")
+        print(f"{'':>10}  last audio  {summarize_ms([r[1] for r in results])}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--tokens", type=int, default=60)
+    parser.add_argument("--token-ms", type=float, default=30.0)
+    args = parser.parse_args()
+
+    setup_env(OPENAI_BASE_URL=f"http://127.0.0.1:{PORT}/v1")
+    server = fake_openai.start_in_background(
+        PORT, first_token_delay=0.4, token_delay=args.token_ms / 1000, num_tokens=args.tokens
+    )
+    try:
+        print(f"{args.turns} turns, {args.tokens}-token replies at {args.token_ms:.0f}ms/token")
+        asyncio.run(main_async(args.turns))
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
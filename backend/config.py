@@ -1,6 +1,6 @@
 # config.py
 import os
-from supabase import create_client
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -8,11 +8,65 @@ load_dotenv()
 class Settings:
     SUPABASE_URL = os.environ.get("SUPABASE_URL")
     SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
+    SUPABASE_TIMEOUT = float(os.environ.get("SUPABASE_TIMEOUT", "10"))
+    SUPABASE_MAX_CONNECTIONS = int(os.environ.get("SUPABASE_MAX_CONNECTIONS", "100"))
+    SUPABASE_JWT_SECRET = os.environ.get("SUPABASE_JWT_SECRET")
+    SUPABASE_SERVICE_ROLE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+    AUTH_TOKEN_CACHE_SIZE = int(os.environ.get("AUTH_TOKEN_CACHE_SIZE", "10000"))
+    AUTH_TOKEN_CACHE_TTL = float(os.environ.get("AUTH_TOKEN_CACHE_TTL", "300"))
+    CONVERSATION_CACHE_MAX_BYTES = int(os.environ.get("CONVERSATION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    CONVERSATION_CACHE_TTL = float(os.environ.get("CONVERSATION_CACHE_TTL", "600"))
+    USER_CONTEXT_CACHE_SIZE = int(os.environ.get("USER_CONTEXT_CACHE_SIZE", "10000"))
+    USER_CONTEXT_CACHE_TTL = float(os.environ.get("USER_CONTEXT_CACHE_TTL", "60"))
+    MESSAGE_WRITE_BATCH_SIZE = int(os.environ.get("MESSAGE_WRITE_BATCH_SIZE", "200"))
+    MESSAGE_WRITE_FLUSH_MS = float(os.environ.get("MESSAGE_WRITE_FLUSH_MS", "50"))
+    MESSAGE_WRITE_MAX_PENDING = int(os.environ.get("MESSAGE_WRITE_MAX_PENDING", "10000"))
+    STREAM_COALESCE_BYTES = int(os.environ.get("STREAM_COALESCE_BYTES", "48"))
+    STREAM_COALESCE_MS = float(os.environ.get("STREAM_COALESCE_MS", "30"))
+    STREAM_REPLAY_MAX_BYTES = int(os.environ.get("STREAM_REPLAY_MAX_BYTES", str(32 * 1024 * 1024)))
+    STREAM_REPLAY_TTL = float(os.environ.get("STREAM_REPLAY_TTL", "120"))
+    IDEMPOTENCY_MAX_KEYS = int(os.environ.get("IDEMPOTENCY_MAX_KEYS", "50000"))
+    IDEMPOTENCY_TTL = float(os.environ.get("IDEMPOTENCY_TTL", "600"))
+    WS_MAX_CONCURRENT_STREAMS = int(os.environ.get("WS_MAX_CONCURRENT_STREAMS", "4"))
+    WS_SEND_QUEUE_MAX_BYTES = int(os.environ.get("WS_SEND_QUEUE_MAX_BYTES", str(256 * 1024)))
+    WS_SEND_TIMEOUT = float(os.environ.get("WS_SEND_TIMEOUT", "10"))
+    WS_WARMUP_TIMEOUT = float(os.environ.get("WS_WARMUP_TIMEOUT", "3"))
+    WS_WARMUP_MAX_CONCURRENT = int(os.environ.get("WS_WARMUP_MAX_CONCURRENT", "200"))
     OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+    OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL")
+    OPENAI_MODEL = os.environ.get("OPENAI_MODEL", "gpt-4")
+    OPENAI_TIMEOUT = float(os.environ.get("OPENAI_TIMEOUT", "60"))
+    OPENAI_CONNECT_TIMEOUT = float(os.environ.get("OPENAI_CONNECT_TIMEOUT", "5"))
+    OPENAI_MAX_CONNECTIONS = int(os.environ.get("OPENAI_MAX_CONNECTIONS", "500"))
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "100"))
+    STT_PROVIDER = os.environ.get("STT_PROVIDER", "openai")
+    STT_MODEL = os.environ.get("STT_MODEL", "whisper-1")
+    TTS_PROVIDER = os.environ.get("TTS_PROVIDER", "openai")
+    TTS_MODEL = os.environ.get("TTS_MODEL", "tts-1")
+    TTS_VOICE = os.environ.get("TTS_VOICE", "alloy")
+    ELEVENLABS_API_KEY = os.environ.get("ELEVENLABS_API_KEY")
+    ELEVENLABS_BASE_URL = os.environ.get("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io")
+    ELEVENLABS_MODEL = os.environ.get("ELEVENLABS_MODEL", "eleven_turbo_v2_5")
+    ELEVENLABS_DEFAULT_VOICE_ID = os.environ.get("ELEVENLABS_DEFAULT_VOICE_ID")
+    VOICE_VAD_MIN_RMS = float(os.environ.get("VOICE_VAD_MIN_RMS", "300"))
+    VOICE_VAD_END_MS = int(os.environ.get("VOICE_VAD_END_MS", "700"))
+    VOICE_MESSAGE_MAX_BYTES = int(os.environ.get("VOICE_MESSAGE_MAX_BYTES", str(25 * 1024 * 1024)))
+    VOICE_CLONE_MAX_BYTES = int(os.environ.get("VOICE_CLONE_MAX_BYTES", str(50 * 1024 * 1024)))
+    VOICE_CLONE_MAX_SAMPLES = int(os.environ.get("VOICE_CLONE_MAX_SAMPLES", "25"))
+    UPLOAD_DIR = os.environ.get("UPLOAD_DIR")  # system temp dir if unset
+    UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", str(64 * 1024)))
+    AUDIO_STORE_DIR = os.environ.get("AUDIO_STORE_DIR", os.path.join(tempfile.gettempdir(), "me-machine-audio"))
+    AUDIO_STORE_MAX_BYTES = int(os.environ.get("AUDIO_STORE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+    TTS_CACHE_DIR = os.environ.get("TTS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "me-machine-tts"))
+    TTS_CACHE_MAX_MEMORY_BYTES = int(os.environ.get("TTS_CACHE_MAX_MEMORY_BYTES", str(64 * 1024 * 1024)))
+    TTS_CACHE_MAX_ITEM_BYTES = int(os.environ.get("TTS_CACHE_MAX_ITEM_BYTES", str(1024 * 1024)))
+    CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "6000"))
+    SUMMARY_MODEL = os.environ.get("SUMMARY_MODEL", OPENAI_MODEL)
+    SUMMARY_MAX_WORDS = int(os.environ.get("SUMMARY_MAX_WORDS", "250"))
+    SUMMARY_FOLD_RATIO = float(os.environ.get("SUMMARY_FOLD_RATIO", "0.6"))
     
     def __post_init__(self):
         if not all([self.SUPABASE_URL, self.SUPABASE_KEY]):
             raise ValueError("Missing required environment variables")
 
-settings = Settings()
-supabase = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
\ No newline at end of file
+settings = Settings()
\ No newline at end of file
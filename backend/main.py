@@ -1,14 +1,34 @@
 # main.py
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from middleware import supabase_auth_middleware
 
 from routers import voice, chat, auth, health
+from services import llm, db, speech
+from services.context_window import preload_encoding
+from services.message_writer import message_writer
+from services.stream_registry import stream_registry
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    message_writer.start()
+    await preload_encoding()
+    voice.warm_default_voice()
+    yield
+    # Let in-flight replies finish and flush queued message writes, then
+    # release pooled upstream connections
+    await stream_registry.drain()
+    await message_writer.drain()
+    await llm.close()
+    await speech.close()
+    await db.close()
 
 app = FastAPI(
     title="Me Machine API", 
     version="1.0.0",
-    description="Daily check-in AI assistant with voice cloning"
+    description="Daily check-in AI assistant with voice cloning",
+    lifespan=lifespan
 )
 
 # CORS middleware for iOS client
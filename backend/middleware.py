@@ -1,12 +1,11 @@
 from fastapi import Request
-from config import supabase
 
 async def supabase_auth_middleware(request: Request, call_next):
-    # Extract token if present
+    # Extract token if present. It is stored on this request's state only;
+    # routers build a request-scoped Database from it (see services.db.get_db).
+    request.state.access_token = None
     if auth_header := request.headers.get("authorization"):
-        token = auth_header.replace("Bearer ", "")
-        # Set auth on your existing global supabase client
-        supabase.postgrest.auth(token)
+        request.state.access_token = auth_header.replace("Bearer ", "")
     
     response = await call_next(request)
     return response
\ No newline at end of file
@@ -2,7 +2,7 @@
 # Generated by the protocol buffer compiler.  DO NOT EDIT!
 # NO CHECKED-IN PROTOBUF GENCODE
 # source: chat_stream.proto
-# Protobuf Python Version: 6.32.0
+# Protobuf Python Version: 5.28.1
 """Generated protocol buffer code."""
 from google.protobuf import descriptor as _descriptor
 from google.protobuf import descriptor_pool as _descriptor_pool
@@ -11,9 +11,9 @@ from google.protobuf import symbol_database as _symbol_database
 from google.protobuf.internal import builder as _builder
 _runtime_version.ValidateProtobufRuntimeVersion(
     _runtime_version.Domain.PUBLIC,
-    6,
-    32,
-    0,
+    5,
+    28,
+    1,
     '',
     'chat_stream.proto'
 )
@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x11\x63hat_stream.proto\x12\x04\x63hat\"\x86\x02\n\x0b\x43hatMessage\x12\x0f\n\x07version\x18\x01 \x01(\r\x12\x12\n\nmessage_id\x18\x02 \x01(\t\x12\x14\n\x0ctimestamp_ms\x18\x03 \x01(\x03\x12\x11\n\tsender_id\x18\x04 \x01(\t\x12\x17\n\x0f\x63onversation_id\x18\x05 \x01(\t\x12\'\n\x0cmessage_type\x18\x06 \x01(\x0e\x32\x11.chat.MessageType\x12)\n\x0ctext_content\x18\x07 \x01(\x0b\x32\x11.chat.TextContentH\x00\x12+\n\raudio_content\x18\x08 \x01(\x0b\x32\x12.chat.AudioContentH\x00\x42\t\n\x07\x63ontentJ\x04\x08\t\x10\x10\"!\n\x0bTextContent\x12\x0c\n\x04text\x18\x01 \x01(\tJ\x04\x08\x02\x10\x06\"`\n\x0c\x41udioContent\x12\x12\n\naudio_data\x18\x01 \x01(\x0c\x12!\n\x06\x66ormat\x18\x02 \x01(\x0e\x32\x11.chat.AudioFormat\x12\x13\n\x0b\x64uration_ms\x18\x03 \x01(\rJ\x04\x08\x04\x10\x0b*Z\n\x0bMessageType\x12\x1c\n\x18MESSAGE_TYPE_UNSPECIFIED\x10\x00\x12\x15\n\x11MESSAGE_TYPE_TEXT\x10\x01\x12\x16\n\x12MESSAGE_TYPE_AUDIO\x10\x02*\x90\x01\n\x0b\x41udioFormat\x12\x1c\n\x18\x41UDIO_FORMAT_UNSPECIFIED\x10\x00\x12\x15\n\x11\x41UDIO_FORMAT_OPUS\x10\x01\x12\x1a\n\x16\x41UDIO_FORMAT_WEBM_OPUS\x10\x02\x12\x14\n\x10\x41UDIO_FORMAT_MP3\x10\x03\x12\x1a\n\x16\x41UDIO_FORMAT_PCM_16KHZ\x10\x04\x42\x37\n\x16\x63om.yourorg.chat.protoZ\x1dgithub.com/yourorg/chat/protob\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x11\x63hat_stream.proto\x12\x04\x63hat\"\x86\x02\n\x0b\x43hatMessage\x12\x0f\n\x07version\x18\x01 \x01(\r\x12\x12\n\nmessage_id\x18\x02 \x01(\t\x12\x14\n\x0ctimestamp_ms\x18\x03 \x01(\x03\x12\x11\n\tsender_id\x18\x04 \x01(\t\x12\x17\n\x0f\x63onversation_id\x18\x05 \x01(\t\x12\'\n\x0cmessage_type\x18\x06 \x01(\x0e\x32\x11.chat.MessageType\x12)\n\x0ctext_content\x18\x07 \x01(\x0b\x32\x11.chat.TextContentH\x00\x12+\n\raudio_content\x18\x08 \x01(\x0b\x32\x12.chat.AudioContentH\x00\x42\t\n\x07\x63ontentJ\x04\x08\t\x10\x10\"!\n\x0bTextContent\x12\x0c\n\x04text\x18\x01 \x01(\tJ\x04\x08\x02\x10\x06\"`\n\x0c\x41udioContent\x12\x12\n\naudio_data\x18\x01 \x01(\x0c\x12!\n\x06\x66ormat\x18\x02 \x01(\x0e\x32\x11.chat.AudioFormat\x12\x13\n\x0b\x64uration_ms\x18\x03 \x01(\rJ\x04\x08\x04\x10\x0b\"\xce\x03\n\x12\x43hatStreamEnvelope\x12\x17\n\x0f\x63onversation_id\x18\x01 \x01(\x03\x12\x11\n\tstream_id\x18\x02 \x01(\t\x12\x10\n\x08sequence\x18\x03 \x01(\r\x12$\n\x07request\x18\x04 \x01(\x0b\x32\x11.chat.ChatRequestH\x00\x12 \n\x05\x63hunk\x18\x05 \x01(\x0b\x32\x0f.chat.ChatChunkH\x00\x12&\n\x08\x63omplete\x18\x06 \x01(\x0b\x32\x12.chat.ChatCompleteH\x00\x12\"\n\x05\x65rror\x18\x07 \x01(\x0b\x32\x11.chat.StreamErrorH\x00\x12$\n\x06\x63\x61ncel\x18\x08 \x01(\x0b\x32\x12.chat.CancelStreamH\x00\x12\x1e\n\x03\x61\x63k\x18\t \x01(\x0b\x32\x0f.chat.StreamAckH\x00\x12\"\n\x04\x61uth\x18\n \x01(\x0b\x32\x12.chat.AuthenticateH\x00\x12$\n\x06resume\x18\x0b \x01(\x0b\x32\x12.chat.ResumeStreamH\x00\x12#\n\x05\x61udio\x18\x0c \x01(\x0b\x32\x12.chat.AudioContentH\x00\x12&\n\ntranscript\x18\r \x01(\x0b\x32\x10.chat.TranscriptH\x00\x42\t\n\x07payload\"M\n\x0b\x43hatRequest\x12\x0f\n\x07message\x18\x01 \x01(\t\x12\x14\n\x0c\x63ontext_type\x18\x02 \x01(\t\x12\x17\n\x0fidempotency_key\x18\x03 \x01(\t\"\x19\n\tChatChunk\x12\x0c\n\x04text\x18\x01 \x01(\t\"6\n\x0c\x43hatComplete\x12\x11\n\tfull_text\x18\x01 \x01(\t\x12\x13\n\x0bsuggestions\x18\x02 \x03(\t\",\n\x0bStreamError\x12\x0c\n\x04\x63ode\x18\x01 \x01(\x05\x12\x0f\n\x07message\x18\x02 \x01(\t\"\x0e\n\x0c\x43\x61ncelStream\"\x1d\n\tStreamAck\x12\x10\n\x08sequence\x18\x01 \x01(\r\"%\n\x0cResumeStream\x12\x15\n\rlast_sequence\x18\x01 \x01(\r\"\x1a\n\nTranscript\x12\x0c\n\x04text\x18\x01 \x01(\t\"\x1d\n\x0c\x41uthenticate\x12\r\n\x05token\x18\x01 \x01(\t*Z\n\x0bMessageType\x12\x1c\n\x18MESSAGE_TYPE_UNSPECIFIED\x10\x00\x12\x15\n\x11MESSAGE_TYPE_TEXT\x10\x01\x12\x16\n\x12MESSAGE_TYPE_AUDIO\x10\x02*\x90\x01\n\x0b\x41udioFormat\x12\x1c\n\x18\x41UDIO_FORMAT_UNSPECIFIED\x10\x00\x12\x15\n\x11\x41UDIO_FORMAT_OPUS\x10\x01\x12\x1a\n\x16\x41UDIO_FORMAT_WEBM_OPUS\x10\x02\x12\x14\n\x10\x41UDIO_FORMAT_MP3\x10\x03\x12\x1a\n\x16\x41UDIO_FORMAT_PCM_16KHZ\x10\x04\x42\x37\n\x16\x63om.yourorg.chat.protoZ\x1dgithub.com/yourorg/chat/protob\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -32,14 +32,34 @@ _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'chat_stream_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   _globals['DESCRIPTOR']._loaded_options = None
   _globals['DESCRIPTOR']._serialized_options = b'\n\026com.yourorg.chat.protoZ\035github.com/yourorg/chat/proto'
-  _globals['_MESSAGETYPE']._serialized_start=425
-  _globals['_MESSAGETYPE']._serialized_end=515
-  _globals['_AUDIOFORMAT']._serialized_start=518
-  _globals['_AUDIOFORMAT']._serialized_end=662
+  _globals['_MESSAGETYPE']._serialized_start=1243
+  _globals['_MESSAGETYPE']._serialized_end=1333
+  _globals['_AUDIOFORMAT']._serialized_start=1336
+  _globals['_AUDIOFORMAT']._serialized_end=1480
   _globals['_CHATMESSAGE']._serialized_start=28
   _globals['_CHATMESSAGE']._serialized_end=290
   _globals['_TEXTCONTENT']._serialized_start=292
   _globals['_TEXTCONTENT']._serialized_end=325
   _globals['_AUDIOCONTENT']._serialized_start=327
   _globals['_AUDIOCONTENT']._serialized_end=423
+  _globals['_CHATSTREAMENVELOPE']._serialized_start=426
+  _globals['_CHATSTREAMENVELOPE']._serialized_end=888
+  _globals['_CHATREQUEST']._serialized_start=890
+  _globals['_CHATREQUEST']._serialized_end=967
+  _globals['_CHATCHUNK']._serialized_start=969
+  _globals['_CHATCHUNK']._serialized_end=994
+  _globals['_CHATCOMPLETE']._serialized_start=996
+  _globals['_CHATCOMPLETE']._serialized_end=1050
+  _globals['_STREAMERROR']._serialized_start=1052
+  _globals['_STREAMERROR']._serialized_end=1096
+  _globals['_CANCELSTREAM']._serialized_start=1098
+  _globals['_CANCELSTREAM']._serialized_end=1112
+  _globals['_STREAMACK']._serialized_start=1114
+  _globals['_STREAMACK']._serialized_end=1143
+  _globals['_RESUMESTREAM']._serialized_start=1145
+  _globals['_RESUMESTREAM']._serialized_end=1182
+  _globals['_TRANSCRIPT']._serialized_start=1184
+  _globals['_TRANSCRIPT']._serialized_end=1210
+  _globals['_AUTHENTICATE']._serialized_start=1212
+  _globals['_AUTHENTICATE']._serialized_end=1241
 # @@protoc_insertion_point(module_scope)
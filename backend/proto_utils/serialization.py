@@ -14,6 +14,24 @@ class ProtobufUnavailable(RuntimeError):
     pass
 
 
+class InvalidFrame(ValueError):
+    pass
+
+
+# AudioFormat values by services/speech.py format name
+AUDIO_FORMATS = {
+    "opus": 1,  # AUDIO_FORMAT_OPUS
+    "webm": 2,  # AUDIO_FORMAT_WEBM_OPUS
+    "mp3": 3,  # AUDIO_FORMAT_MP3
+    "pcm_16000": 4,  # AUDIO_FORMAT_PCM_16KHZ
+}
+AUDIO_FORMAT_NAMES = {value: name for name, value in AUDIO_FORMATS.items()}
+
+
+def is_available() -> bool:
+    return pb is not None
+
+
 def _require_pb() -> None:
     if pb is None:
         raise ProtobufUnavailable(
@@ -39,6 +57,74 @@ def encode_chat_chunk(
     return env.SerializeToString()
 
 
+def _write_varint(buf: bytearray, value: int) -> None:
+    value &= 0xFFFFFFFFFFFFFFFF  # negative int64s are written as 10-byte varints
+    while value > 0x7F:
+        buf.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def _varint_size(value: int) -> int:
+    size = 1
+    while value > 0x7F:
+        value >>= 7
+        size += 1
+    return size
+
+
+class ChunkFrameEncoder:
+    """Encode a stream's chunk frames without building message objects.
+
+    One encoder per stream: the conversation_id and stream_id fields are
+    serialized once, and each frame only appends the sequence and chunk
+    text to a reused buffer. The bytes are identical to
+    `encode_chat_chunk(conversation_id, text, stream_id, sequence)`.
+    """
+
+    # Field keys: (field_number << 3) | wire_type
+    _TAG_CONVERSATION_ID = 0x08
+    _TAG_STREAM_ID = 0x12
+    _TAG_SEQUENCE = 0x18
+    _TAG_CHUNK = 0x2A
+    _TAG_CHUNK_TEXT = 0x0A
+
+    __slots__ = ("_buf", "_prefix_len")
+
+    def __init__(self, conversation_id: int, stream_id: Optional[str] = None):
+        buf = bytearray()
+        # Proto3 omits default-valued scalars, so zero/empty fields are skipped
+        if conversation_id:
+            buf.append(self._TAG_CONVERSATION_ID)
+            _write_varint(buf, conversation_id)
+        if stream_id:
+            encoded = stream_id.encode("utf-8")
+            buf.append(self._TAG_STREAM_ID)
+            _write_varint(buf, len(encoded))
+            buf += encoded
+        self._buf = buf
+        self._prefix_len = len(buf)
+
+    def chunk(self, text: str, sequence: int = 0) -> bytes:
+        buf = self._buf
+        del buf[self._prefix_len:]
+        if sequence:
+            buf.append(self._TAG_SEQUENCE)
+            _write_varint(buf, sequence & 0xFFFFFFFF)
+        encoded = text.encode("utf-8")
+        size = len(encoded)
+        buf.append(self._TAG_CHUNK)
+        if size:
+            # ChatChunk body: tag + length + text
+            _write_varint(buf, 1 + _varint_size(size) + size)
+            buf.append(self._TAG_CHUNK_TEXT)
+            _write_varint(buf, size)
+            buf += encoded
+        else:
+            buf.append(0)
+        return bytes(buf)
+
+
 def encode_chat_complete(
     conversation_id: int,
     full_text: str,
@@ -79,3 +165,97 @@ def encode_error(
         env.sequence = sequence
     return env.SerializeToString()
 
+
+def encode_ack(
+    conversation_id: int,
+    stream_id: Optional[str] = None,
+    sequence: int = 0,
+) -> bytes:
+    _require_pb()
+    env = pb.ChatStreamEnvelope(
+        conversation_id=conversation_id,
+        ack=pb.StreamAck(sequence=sequence),
+    )
+    if stream_id is not None:
+        env.stream_id = stream_id
+    return env.SerializeToString()
+
+
+def encode_transcript(conversation_id: int, text: str, stream_id: str, sequence: int) -> bytes:
+    _require_pb()
+    env = pb.ChatStreamEnvelope(
+        conversation_id=conversation_id,
+        stream_id=stream_id,
+        sequence=sequence,
+        transcript=pb.Transcript(text=text),
+    )
+    return env.SerializeToString()
+
+
+def encode_audio(
+    conversation_id: int,
+    audio: bytes,
+    audio_format: str,
+    stream_id: Optional[str] = None,
+    sequence: int = 0,
+) -> bytes:
+    """AudioContent frame; `audio_format` is a name from AUDIO_FORMATS"""
+    _require_pb()
+    content = pb.AudioContent(audio_data=audio, format=AUDIO_FORMATS[audio_format])
+    if audio_format == "pcm_16000":
+        content.duration_ms = len(audio) // 32
+    env = pb.ChatStreamEnvelope(conversation_id=conversation_id, audio=content)
+    if stream_id is not None:
+        env.stream_id = stream_id
+    if sequence:
+        env.sequence = sequence
+    return env.SerializeToString()
+
+
+def encode_chat_request(
+    message: str,
+    conversation_id: int = 0,
+    context_type: str = "check_in",
+) -> bytes:
+    _require_pb()
+    env = pb.ChatStreamEnvelope(
+        conversation_id=conversation_id,
+        request=pb.ChatRequest(message=message, context_type=context_type),
+    )
+    return env.SerializeToString()
+
+
+def encode_cancel(stream_id: str, conversation_id: int = 0) -> bytes:
+    _require_pb()
+    env = pb.ChatStreamEnvelope(
+        conversation_id=conversation_id,
+        stream_id=stream_id,
+        cancel=pb.CancelStream(),
+    )
+    return env.SerializeToString()
+
+
+def encode_resume(stream_id: str, last_sequence: int = 0, conversation_id: int = 0) -> bytes:
+    _require_pb()
+    env = pb.ChatStreamEnvelope(
+        conversation_id=conversation_id,
+        stream_id=stream_id,
+        resume=pb.ResumeStream(last_sequence=last_sequence),
+    )
+    return env.SerializeToString()
+
+
+def encode_auth(token: str) -> bytes:
+    _require_pb()
+    return pb.ChatStreamEnvelope(auth=pb.Authenticate(token=token)).SerializeToString()
+
+
+def decode_envelope(data: bytes):
+    """Parse one binary frame into a ChatStreamEnvelope"""
+    _require_pb()
+    env = pb.ChatStreamEnvelope()
+    try:
+        env.ParseFromString(data)
+    except Exception as e:
+        raise InvalidFrame(f"Invalid protobuf frame: {e}")
+    return env
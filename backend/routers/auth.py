@@ -4,7 +4,8 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
-from config import supabase
+from services.db import Database, get_db
+from services.token_verifier import verifier, InvalidToken
 
 router = APIRouter()
 security = HTTPBearer()
@@ -29,28 +30,28 @@ class SignInRequest(BaseModel):
     password: str
 
 @router.post("/signup", response_model=AuthResponse)
-async def signup(request: SignUpRequest):
+async def signup(request: SignUpRequest, db: Database = Depends(get_db)):
     """Sign up new user"""
     try:
         # Use Supabase auth
-        auth_response = supabase.auth.sign_up({
-            "email": request.email,
-            "password": request.password
-        })
+        auth_response = await db.auth.sign_up(request.email, request.password)
         
-        if auth_response.user:
+        user = auth_response.get("user")
+        if user and auth_response.get("access_token"):
             # Create user profile (id will be set to auth user id via foreign key)
             profile_data = {
-                "id": auth_response.user.id,
-                "email": request.email
+                "id": user["id"],
+                "email": request.email,
+                "created_at": user.get("created_at")
             }
             
-            supabase.table("profiles").insert(profile_data).execute()
+            # Insert as the new user so RLS applies to their own row
+            await Database(auth_response["access_token"]).table("profiles").insert(profile_data).execute()
             
             return AuthResponse(
                 user=UserProfile(**profile_data),
-                access_token=auth_response.session.access_token,
-                refresh_token=auth_response.session.refresh_token
+                access_token=auth_response["access_token"],
+                refresh_token=auth_response["refresh_token"]
             )
         else:
             raise HTTPException(status_code=400, detail="Failed to create user")
@@ -59,39 +60,38 @@ async def signup(request: SignUpRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/login", response_model=AuthResponse)
-async def login(request: SignInRequest):
+async def login(request: SignInRequest, db: Database = Depends(get_db)):
     """Login user"""
     try:
-        auth_response = supabase.auth.sign_in_with_password({
-            "email": request.email,
-            "password": request.password
-        })
+        auth_response = await db.auth.sign_in_with_password(request.email, request.password)
         
-        if auth_response.user:
+        user = auth_response.get("user")
+        if user:
+            user_db = Database(auth_response["access_token"])
+            
             # Get user profile
-            profile = supabase.table("profiles").select("*").eq(
-                "id", auth_response.user.id
+            profile = await user_db.table("profiles").select("*").eq(
+                "id", user["id"]
             ).execute()
             
             if profile.data:
                 return AuthResponse(
                     user=UserProfile(**profile.data[0]),
-                    access_token=auth_response.session.access_token,
-                    refresh_token=auth_response.session.refresh_token
+                    access_token=auth_response["access_token"],
+                    refresh_token=auth_response["refresh_token"]
                 )
             else:
                 # Create profile if it doesn't exist
                 profile_data = {
-                    "id": auth_response.user.id,
-                    "email": request.email,
-                    "preferences": {}
+                    "id": user["id"],
+                    "email": request.email
                 }
-                supabase.table("profiles").insert(profile_data).execute()
+                result = await user_db.table("profiles").insert(profile_data).execute()
                 
                 return AuthResponse(
-                    user=UserProfile(**profile_data),
-                    access_token=auth_response.session.access_token,
-                    refresh_token=auth_response.session.refresh_token
+                    user=UserProfile(**result.data[0]),
+                    access_token=auth_response["access_token"],
+                    refresh_token=auth_response["refresh_token"]
                 )
         else:
             raise HTTPException(status_code=401, detail="Invalid credentials")
@@ -100,39 +100,47 @@ async def login(request: SignInRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/refresh")
-async def refresh_token(refresh_token: str):
+async def refresh_token(refresh_token: str, db: Database = Depends(get_db)):
     """Refresh access token"""
     try:
-        auth_response = supabase.auth.refresh_session(refresh_token)
+        auth_response = await db.auth.refresh_session(refresh_token)
         
         return {
-            "access_token": auth_response.session.access_token,
-            "refresh_token": auth_response.session.refresh_token
+            "access_token": auth_response["access_token"],
+            "refresh_token": auth_response["refresh_token"]
         }
     
     except Exception as e:
         raise HTTPException(status_code=401, detail="Invalid refresh token")
 
 @router.post("/logout")
-async def logout(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def logout(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Database = Depends(get_db)
+):
     """Logout user"""
     try:
-        supabase.auth.sign_out()
+        # Revokes the caller's session only
+        await db.auth.sign_out(credentials.credentials)
+        verifier.forget(credentials.credentials)
         return {"message": "Logged out successfully"}
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/me", response_model=UserProfile)
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Database = Depends(get_db)
+):
     """Get current user profile"""
     try:
         # Verify token and get user
-        user = supabase.auth.get_user(credentials.credentials)
+        user = await db.auth.get_user(credentials.credentials)
         
-        if user:
-            profile = supabase.table("profiles").select("*").eq(
-                "id", user.user.id
+        if user and user.get("id"):
+            profile = await db.table("profiles").select("*").eq(
+                "id", user["id"]
             ).execute()
             
             if profile.data:
@@ -149,11 +157,10 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
 async def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
     """Dependency to extract user ID from token"""
     try:
-        user = supabase.auth.get_user(credentials.credentials)
-        if user and user.user:
-            return user.user.id
-        else:
-            raise HTTPException(status_code=401, detail="Invalid token")
+        # Verified locally against cached signing keys; see services/token_verifier.py
+        return await verifier.verify(credentials.credentials)
+    except InvalidToken:
+        raise HTTPException(status_code=401, detail="Invalid token")
     except Exception as e:
         raise HTTPException(status_code=401, detail="Authentication failed")
 
@@ -161,11 +168,9 @@ async def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depend
 async def get_current_user_id_ws(token: str) -> str:
     """Extract user ID from token for WebSocket connections"""
     try:
-        user = supabase.auth.get_user(token)
-        if user and user.user:
-            return user.user.id
-        else:
-            raise Exception("Invalid token")
+        return await verifier.verify(token)
+    except InvalidToken:
+        raise Exception("Invalid token")
     except Exception as e:
         raise Exception("Authentication failed")
 
@@ -176,7 +181,7 @@ async def get_current_user_id_ws(token: str) -> str:
 # ):
 #     """Update user preferences"""
 #     try:
-#         result = supabase.table("profiles").update({
+#         result = await db.table("profiles").update({
 #             "preferences": preferences
 #         }).eq("id", user_id).execute()
         
@@ -1,39 +1,87 @@
 # routers/chat.py
-from fastapi import APIRouter, HTTPException, Depends, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List
-from datetime import datetime
-from config import supabase, settings
+from typing import AsyncIterator, Awaitable, Optional, List, Dict, Set
+from dataclasses import dataclass
+from datetime import date, datetime
+from config import settings
 from .auth import get_current_user_id, get_current_user_id_ws
-import openai
+from services import llm, speech, voice_pipeline
+from services.speech import SpeechError
+from services.vad import SPEECH_START, EnergyVAD
+from services.voice_pipeline import Utterance, UtteranceTooLong, VoiceEvent, VoiceListener, speak_reply
+from services.db import Database, get_db
+from services.conversation_cache import conversation_cache
+from services.user_context_cache import user_context_cache
+from services.context_window import ContextWindow, assemble_context, schedule_summary_update
+from services.pagination import encode_cursor, decode_cursor, apply_keyset
+from services.message_writer import message_writer
+from services.stream_coalescer import CoalesceConfig, coalesce
+from services.stream_registry import ReplayGap, ReplayStream, StreamEvent, stream_registry, CHUNK, COMPLETE
+from services.chat_connection import ChatConnection
+from services.context_warmup import ContextWarmup, WarmContext, warmup_metrics
+from services.idempotency import IdempotencyConflict, InvalidIdempotencyKey, idempotency_store, request_fingerprint
+import asyncio
 import json
+import time
+import uuid
 from typing import cast
 
 try:
     # Optional import; endpoint will error with guidance if not generated
     from proto_utils.serialization import (
+        encode_ack,
+        encode_audio,
+        encode_transcript,
         encode_chat_chunk,
         encode_chat_complete,
+        ChunkFrameEncoder,
         encode_error,
+        decode_envelope,
+        is_available as protobuf_available,
+        InvalidFrame,
         ProtobufUnavailable,
+        AUDIO_FORMAT_NAMES,
     )
 except Exception:
     encode_chat_chunk = None  # type: ignore
     encode_chat_complete = None  # type: ignore
     encode_error = None  # type: ignore
+    protobuf_available = lambda: False  # type: ignore
+    AUDIO_FORMAT_NAMES = {}  # type: ignore
     class ProtobufUnavailable(RuntimeError):
         ...
 
 router = APIRouter()
 
-# Initialize OpenAI client
-client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+# Conversation columns needed to assemble a turn's context
+CONVERSATION_COLUMNS = "id,summary,summary_message_count"
+
+# Per-user aggregates maintained by the daily_check_ins trigger
+CHECK_IN_STATS_COLUMNS = "last_check_in_date,current_streak,mood_7d_mean,mood_30d_mean"
+
+# Weekly vs monthly mean mood difference worth mentioning in the prompt
+MOOD_TREND_THRESHOLD = 0.5
+
+# Denormalized columns maintained by the messages trigger
+CONVERSATION_LIST_COLUMNS = "id,title,last_message_preview,message_count,last_activity,created_at"
+
+# Keep proxies (e.g. nginx) from buffering or caching event streams
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+# Microphone audio `/ws-bin` accepts; only PCM is split up by voice activity detection
+VOICE_INPUT_FORMATS = (speech.PCM_16000, speech.WEBM, speech.MP3)
+
+# Reply audio formats `/ws-bin` can label, preferred first
+VOICE_REPLY_FORMATS = (speech.PCM_16000, speech.OPUS, speech.MP3)
 
 class ChatRequest(BaseModel):
     message: str
     conversation_id: Optional[int] = None
     return_audio: bool = False
     context_type: Optional[str] = "check_in"  # "check_in", "general", "reflection"
+    idempotency_key: Optional[str] = None  # Or the Idempotency-Key header
 
 class ChatResponse(BaseModel):
     message: str
@@ -44,72 +92,185 @@ class ChatResponse(BaseModel):
 @router.post("/message", response_model=ChatResponse)
 async def send_text_message(
     request: ChatRequest,
-    user_id: str = Depends(get_current_user_id)
+    idempotency_key: Optional[str] = Header(None),
+    user_id: str = Depends(get_current_user_id),
+    db: Database = Depends(get_db)
 ):
-    """Send text message and get AI response"""
+    """Send text message and get AI response.
+
+    With an `Idempotency-Key` header (or `idempotency_key` field), a retry
+    of the same request gets the first attempt's response instead of a new
+    generation, waiting for it if it is still running.
+    """
+    key = idempotency_key or request.idempotency_key
     try:
-        conversation_id = request.conversation_id
-        
-        # Create new conversation if none provided
-        if not conversation_id:
-            conv_result = supabase.table("conversations").insert({
-                "user_id": user_id
-            }).execute()
-            conversation_id = conv_result.data[0]["id"]
-        else:
-            # Verify user owns this conversation
-            conv_check = supabase.table("conversations").select("id").eq(
-                "id", conversation_id
-            ).eq("user_id", user_id).execute()
-            
-            if not conv_check.data:
-                raise HTTPException(status_code=404, detail="Conversation not found")
-        
-        # Get conversation context
-        context_messages = await get_conversation_messages(conversation_id)
-        
-        # Get user's recent check-ins for context
-        user_context = await get_user_context(user_id)
-        
-        # Build system prompt based on context type
-        system_prompt = build_system_prompt(request.context_type, user_context)
-        
-        # Prepare messages for OpenAI
-        messages = [{"role": "system", "content": system_prompt}]
-        
-        # Add conversation history
-        for msg in context_messages:
-            role = "assistant" if msg["role"] == "ai" else "user"
-            messages.append({"role": role, "content": msg["content"]})
-        
-        # Add current user message
-        messages.append({"role": "user", "content": request.message})
-        
-        # Get AI response
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=messages,
-            max_tokens=500,
-            temperature=0.7
+        if not key:
+            return await reply_to_message(db, user_id, request)
+        return await idempotency_store.run(
+            "message", user_id, key,
+            request_fingerprint(request.message, request.conversation_id, request.context_type),
+            lambda: reply_to_message(db, user_id, request)
         )
+    
+    except HTTPException:
+        raise
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except InvalidIdempotencyKey as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def reply_to_message(db: Database, user_id: str, request: ChatRequest) -> ChatResponse:
+    """Generate and save the reply to one REST chat message"""
+    # Ownership check (or creation), history and user context, concurrently
+    context = await load_chat_context(db, user_id, request.conversation_id)
+    if context is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    conversation_id = context.conversation_id
+    
+    # Build system prompt based on context type
+    system_prompt = build_system_prompt(request.context_type, context.user_context)
+    
+    # Prepare messages for OpenAI: recent turns within the token budget,
+    # older ones via the conversation summary
+    window = assemble_context(
+        system_prompt,
+        context.history,
+        request.message,
+        context.summary,
+        context.summary_message_count
+    )
+    
+    # Get AI response
+    ai_message = await llm.complete_chat(window.messages)
+    
+    # Save both messages to database
+    await save_messages(db, conversation_id, [
+        {"role": "user", "content": request.message},
+        {"role": "ai", "content": ai_message}
+    ], wait=True)
+    
+    # Fold turns that fell out of the window into the summary
+    schedule_summary_update(
+        db, conversation_id, context.history, window,
+        context.summary, context.summary_message_count
+    )
+    
+    # Generate suggestions for follow-up
+    suggestions = generate_suggestions(request.context_type, ai_message)
+    
+    return ChatResponse(
+        message=ai_message,
+        conversation_id=conversation_id,
+        audio_url=None,  # TODO: Implement TTS if return_audio=True
+        suggestions=suggestions
+    )
+
+@router.post("/message/stream")
+async def stream_text_message(
+    request: ChatRequest,
+    idempotency_key: Optional[str] = Header(None),
+    user_id: str = Depends(get_current_user_id),
+    db: Database = Depends(get_db)
+):
+    """Send text message and stream the AI response as Server-Sent Events.
+
+    Emits `chunk`, `complete` and `error` events whose ids are the stream's
+    sequence numbers. The stream and conversation ids are also returned in
+    the `X-Stream-Id` / `X-Conversation-Id` headers. A client that drops can
+    reconnect with `GET /message/stream/{stream_id}` and `Last-Event-ID`.
+    A retry with the same idempotency key streams the first attempt's reply.
+    """
+    try:
+        stream = await start_chat_stream(
+            db, user_id, request.message, request.conversation_id, request.context_type or "check_in",
+            idempotency_key=idempotency_key or request.idempotency_key
+        )
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except InvalidIdempotencyKey as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if stream is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return sse_response(stream)
+
+@router.get("/message/stream/{stream_id}")
+async def resume_text_message_stream(
+    stream_id: str,
+    last_event_id: Optional[int] = Header(None),
+    user_id: str = Depends(get_current_user_id)
+):
+    """Resume an SSE reply after the event id in `Last-Event-ID`"""
+    stream = stream_registry.get(stream_id, user_id)
+    if stream is None:
+        raise HTTPException(status_code=404, detail="Stream not found or expired")
+    return sse_response(stream, after=last_event_id or 0)
+
+def sse_response(stream: ReplayStream, after: int = 0) -> StreamingResponse:
+    return StreamingResponse(
+        sse_events(stream, after),
+        media_type="text/event-stream",
+        headers={
+            **SSE_HEADERS,
+            "X-Stream-Id": stream.stream_id,
+            "X-Conversation-Id": str(stream.conversation_id)
+        }
+    )
+
+async def sse_events(stream: ReplayStream, after: int = 0):
+    """Format a stream's frames after `after` as SSE events"""
+    try:
+        async for event in stream.follow(after):
+            yield format_sse_event(stream, event)
+    except ReplayGap as e:
+        yield format_sse_event(stream, StreamEvent(after, "error", str(e), code=410))
+
+def format_sse_event(stream: ReplayStream, event: StreamEvent) -> str:
+    if event.kind == CHUNK:
+        data = {"chunk": event.text}
+    elif event.kind == COMPLETE:
+        data = {"message": event.text, "suggestions": event.suggestions or []}
+    else:
+        data = {"error": event.text, "code": event.code}
+    data.update(conversation_id=stream.conversation_id, stream_id=stream.stream_id)
+    return f"id: {event.sequence}\nevent: {event.kind}\ndata: {json.dumps(data)}\n\n"
+
+@router.get("/conversations")
+async def list_conversations(
+    limit: int = Query(20, ge=1, le=100),
+    before: Optional[str] = Query(None, description="Cursor from the previous page's next_cursor"),
+    user_id: str = Depends(get_current_user_id),
+    db: Database = Depends(get_db)
+):
+    """List the user's conversations, most recently active first"""
+    try:
+        cursor = decode_cursor(before) if before else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        query = db.table("conversations").select(CONVERSATION_LIST_COLUMNS).eq("user_id", user_id)
+        if cursor:
+            query = apply_keyset(query, "last_activity", *cursor, "lt")
+        result = await query.order("last_activity", desc=True).order(
+            "id", desc=True
+        ).limit(limit + 1).execute()
         
-        ai_message = response.choices[0].message.content
-        
-        # Save both messages to database
-        await save_messages(conversation_id, [
-            {"role": "user", "content": request.message},
-            {"role": "ai", "content": ai_message}
-        ])
-        
-        # Generate suggestions for follow-up
-        suggestions = generate_suggestions(request.context_type, ai_message)
+        conversations = result.data[:limit]
+        has_more = len(result.data) > limit
+        last = conversations[-1] if conversations else None
         
-        return ChatResponse(
-            message=ai_message,
-            conversation_id=conversation_id,
-            audio_url=None,  # TODO: Implement TTS if return_audio=True
-            suggestions=suggestions
-        )
+        return {
+            "conversations": conversations,
+            "page": {
+                "limit": limit,
+                "has_more": has_more,
+                "next_cursor": encode_cursor(last["last_activity"], last["id"]) if has_more else None
+            }
+        }
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -117,61 +278,273 @@ async def send_text_message(
 @router.get("/conversation/{conversation_id}")
 async def get_conversation(
     conversation_id: int,
-    user_id: str = Depends(get_current_user_id)
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = Query(None, description="Cursor: return messages older than this"),
+    after: Optional[str] = Query(None, description="Cursor: return messages newer than this"),
+    user_id: str = Depends(get_current_user_id),
+    db: Database = Depends(get_db)
 ):
-    """Get conversation history"""
+    """Get a page of conversation history.
+
+    Without a cursor this returns the newest `limit` messages. Messages are
+    always in chronological order; use `page.before_cursor` to load older
+    pages and `page.after_cursor` to poll for newer ones.
+    """
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either 'before' or 'after', not both")
+    try:
+        cursor = decode_cursor(before or after) if (before or after) else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     try:
         # Verify user owns this conversation
-        conv_result = supabase.table("conversations").select("*").eq(
+        conv_query = db.table("conversations").select("*").eq(
             "id", conversation_id
         ).eq("user_id", user_id).execute()
         
+        # Keyset page over (created_at, id); one extra row tells us if there's more
+        newest_first = after is None
+        page_query = db.table("messages").select("*").eq("conversation_id", conversation_id)
+        if cursor:
+            page_query = apply_keyset(page_query, "created_at", *cursor, "gt" if after else "lt")
+        page_query = page_query.order("created_at", desc=newest_first).order(
+            "id", desc=newest_first
+        ).limit(limit + 1).execute()
+        
+        conv_result, page_result = await asyncio.gather(conv_query, page_query)
         if not conv_result.data:
             raise HTTPException(status_code=404, detail="Conversation not found")
         
-        # Get messages
-        messages = await get_conversation_messages(conversation_id)
+        rows = page_result.data
+        has_more = len(rows) > limit
+        messages = rows[:limit]
+        if newest_first:
+            messages.reverse()
         
         return {
             "conversation": conv_result.data[0],
-            "messages": messages
+            "messages": messages,
+            "page": {
+                "limit": limit,
+                "has_more_before": has_more if newest_first else True,
+                "has_more_after": has_more if after else before is not None,
+                "before_cursor": encode_cursor(messages[0]["created_at"], messages[0]["id"]) if messages else before,
+                "after_cursor": encode_cursor(messages[-1]["created_at"], messages[-1]["id"]) if messages else after
+            }
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-async def get_conversation_messages(conversation_id: int) -> List[dict]:
-    """Get messages for a conversation"""
+async def get_conversation_messages(db: Database, conversation_id: int) -> List[dict]:
+    """Get messages for a conversation (served from the history cache when warm)"""
+    cached = conversation_cache.get(conversation_id)
+    if cached is not None:
+        return cached
+    
+    messages = await fetch_conversation_messages(db, conversation_id)
+    if messages is None:
+        return []
+    conversation_cache.put(conversation_id, messages)
+    return messages
+
+async def fetch_conversation_messages(db: Database, conversation_id: int) -> Optional[List[dict]]:
+    """Read a conversation's messages from the database (None on failure)"""
     try:
-        result = supabase.table("messages").select("*").eq(
+        result = await db.table("messages").select("*").eq(
             "conversation_id", conversation_id
-        ).order("created_at", desc=False).execute()
+        ).order("created_at", desc=False).order("id", desc=False).execute()
         
         return result.data
-    except Exception:
-        return []
+    except Exception as e:
+        print(f"Error loading messages: {e}")
+        return None
+
+@dataclass
+class ChatContext:
+    """Everything a chat turn needs before the LLM call"""
+    conversation: dict
+    history: List[dict]
+    user_context: dict
+    timings: Dict[str, float]
+    
+    @property
+    def conversation_id(self) -> int:
+        return self.conversation["id"]
+    
+    @property
+    def summary(self) -> Optional[str]:
+        return self.conversation.get("summary")
+    
+    @property
+    def summary_message_count(self) -> int:
+        return self.conversation.get("summary_message_count") or 0
 
-async def get_user_context(user_id: str) -> dict:
-    """Get user context for personalized responses"""
+async def _timed(timings: Dict[str, float], stage: str, awaitable):
+    started = time.perf_counter()
     try:
-        # Get recent check-ins
-        recent_check_ins = supabase.table("daily_check_ins").select("*").eq(
-            "user_id", user_id
-        ).order("date", desc=True).limit(7).execute()
+        return await awaitable
+    finally:
+        timings[stage] = (time.perf_counter() - started) * 1000
+
+async def _cached(value):
+    return value
+
+async def load_chat_context(
+    db: Database,
+    user_id: str,
+    conversation_id: Optional[int] = None,
+    warmup: Optional[ContextWarmup] = None
+) -> Optional[ChatContext]:
+    """Load conversation, history and user context in one concurrent round.
+
+    The reads are independent, so they go out together over the pooled
+    HTTP/2 connection instead of one after another. Parts already loaded
+    by the socket's warm-up aren't fetched again. Returns None if the
+    conversation doesn't exist or isn't the user's.
+    """
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    
+    warm = await warmup.take(conversation_id) if warmup is not None else None
+    warm_stages = ["user_context"] if warm is not None else []
+    # Through the cache even when warmed (the warm-up filled it), so
+    # invalidations since the warm-up are seen
+    user_context_query = _timed(timings, "user_context", get_user_context(db, user_id))
+    
+    if not conversation_id:
+        # New conversation: nothing to fetch for history
+        conv_result, user_context = await asyncio.gather(
+            _timed(timings, "create", db.table("conversations").insert({
+                "user_id": user_id
+            }).execute()),
+            user_context_query,
+        )
+        conversation = conv_result.data[0]
+        history: List[dict] = []
+        conversation_cache.put(conversation["id"], history)
+    elif warm is not None and warm.conversation is not None and warm.conversation["id"] == conversation_id:
+        # Ownership was checked and history loaded while the socket was idle
+        conversation = warm.conversation
+        warm_stages.append("ownership")
+        cached = conversation_cache.get(conversation_id)
+        if cached is not None:
+            history, user_context = cached, await user_context_query
+            warm_stages.append("history")
+        else:
+            # Dropped from the cache since the warm-up (e.g. a failed write); the warmed copy may be wrong
+            history, user_context = await asyncio.gather(
+                _timed(timings, "history", fetch_conversation_messages(db, conversation_id)),
+                user_context_query,
+            )
+            if history is None:
+                history = []
+            else:
+                conversation_cache.put(conversation_id, history)
+    else:
+        cached = conversation_cache.get(conversation_id)
+        conv_check, history, user_context = await asyncio.gather(
+            _timed(timings, "ownership", db.table("conversations").select(CONVERSATION_COLUMNS).eq(
+                "id", conversation_id
+            ).eq("user_id", user_id).execute()),
+            _timed(timings, "history", fetch_conversation_messages(db, conversation_id))
+                if cached is None else _cached(cached),
+            user_context_query,
+        )
+        if not conv_check.data:
+            return None
+        conversation = conv_check.data[0]
         
-        # Get user's voice clone info
-        voice_clones = supabase.table("voice_clones").select("*").eq(
-            "user_id", user_id
-        ).eq("is_active", True).execute()
+        # Only cache history once ownership is confirmed (RLS returns no rows
+        # for someone else's conversation, which must not be cached as empty)
+        if history is None:
+            history = []
+        elif cached is None:
+            conversation_cache.put(conversation_id, history)
+    
+    timings["total"] = (time.perf_counter() - started) * 1000
+    if warm is not None:
+        # Without the warm-up the turn would have waited for the slowest of
+        # the warmed reads as well as its own
+        cold_ms = max(
+            [warm.timings.get(stage, 0.0) for stage in warm_stages]
+            + [ms for stage, ms in timings.items() if stage != "total"]
+        )
+        warmup_metrics.record_turn(cold_ms - timings["total"])
+    stages = " ".join(f"{stage}={ms:.1f}ms" for stage, ms in timings.items())
+    print(f"Chat context loaded for conversation {conversation['id']}: {stages}"
+          f"{' (history cached)' if 'history' not in timings and conversation_id else ''}"
+          f"{' (warm: ' + ','.join(warm_stages) + ')' if warm_stages else ''}")
+    
+    return ChatContext(
+        conversation=conversation,
+        history=history,
+        user_context=user_context,
+        timings=timings
+    )
+
+async def warm_chat_context(db: Database, user_id: str, conversation_id: Optional[int] = None) -> WarmContext:
+    """Load a socket's likely first-turn context: its user context and the
+    history of `conversation_id` (or the user's most recently active one)"""
+    timings: Dict[str, float] = {}
+    conv_query = db.table("conversations").select(CONVERSATION_COLUMNS).eq("user_id", user_id)
+    if conversation_id:
+        conv_query = conv_query.eq("id", conversation_id)
+    else:
+        conv_query = conv_query.order("last_activity", desc=True).order("id", desc=True).limit(1)
+    
+    conv_result, user_context = await asyncio.gather(
+        _timed(timings, "ownership", conv_query.execute()),
+        _timed(timings, "user_context", get_user_context(db, user_id)),
+    )
+    if not conv_result.data:
+        return WarmContext(None, [], user_context, timings)
+    conversation = conv_result.data[0]
+    
+    history = conversation_cache.get(conversation["id"])
+    if history is None:
+        history = await _timed(timings, "history", fetch_conversation_messages(db, conversation["id"]))
+        if history is None:
+            return WarmContext(None, [], user_context, timings)
+        conversation_cache.put(conversation["id"], history)
+    return WarmContext(conversation, history, user_context, timings)
+
+def start_warmup(db: Database, user_id: str, conversation_id: Optional[int] = None) -> Optional[ContextWarmup]:
+    return ContextWarmup.start(lambda: warm_chat_context(db, user_id, conversation_id), conversation_id)
+
+async def get_user_context(db: Database, user_id: str) -> dict:
+    """Get user context for personalized responses (cached per user)"""
+    cached = user_context_cache.get(user_id)
+    if cached is not None:
+        return cached
+    
+    loaded_at = time.monotonic()
+    try:
+        # Trigger-maintained check-in aggregates (one primary key lookup)
+        # and voice clone info, fetched concurrently
+        check_in_stats, voice_clones = await asyncio.gather(
+            db.table("user_check_in_stats").select(CHECK_IN_STATS_COLUMNS).eq(
+                "user_id", user_id
+            ).limit(1).execute(),
+            db.table("voice_clones").select("id,elevenlabs_voice_id").eq(
+                "user_id", user_id
+            ).eq("is_active", True).limit(1).execute()
+        )
         
-        return {
-            "recent_check_ins": recent_check_ins.data,
+        context = {
+            "check_in_stats": check_in_stats.data[0] if check_in_stats.data else None,
             "has_voice_clone": len(voice_clones.data) > 0,
-            "check_in_streak": len(recent_check_ins.data)
+            "voice_clone": voice_clones.data[0] if voice_clones.data else None
         }
     
     except Exception as e:
         return {}
+    
+    user_context_cache.put(user_id, context, loaded_at)
+    return context
 
 def build_system_prompt(context_type: str, user_context: dict) -> str:
     """Build system prompt based on context"""
@@ -204,50 +577,98 @@ def build_system_prompt(context_type: str, user_context: dict) -> str:
         """
     
     # Add user context
-    if user_context.get("recent_check_ins"):
-        recent_moods = [ci.get("mood_score") for ci in user_context["recent_check_ins"][:3]]
-        base_prompt += f"\n\nRecent mood pattern: {', '.join(recent_moods)}"
+    stats = user_context.get("check_in_stats")
+    if stats and stats.get("mood_7d_mean") is not None:
+        mood_7d = float(stats["mood_7d_mean"])
+        base_prompt += f"\n\nRecent mood: {mood_7d:.1f} on average over their last week of check-ins"
+        if stats.get("mood_30d_mean") is not None:
+            mood_30d = float(stats["mood_30d_mean"])
+            if mood_7d - mood_30d >= MOOD_TREND_THRESHOLD:
+                trend = "up from"
+            elif mood_30d - mood_7d >= MOOD_TREND_THRESHOLD:
+                trend = "down from"
+            else:
+                trend = "in line with"
+            base_prompt += f", {trend} their 30-day average of {mood_30d:.1f}"
+        base_prompt += "."
     
-    if user_context.get("check_in_streak", 0) > 1:
-        base_prompt += f"\n\nThe user has been consistent with check-ins ({user_context['check_in_streak']} recent entries). Acknowledge this positively."
+    streak = check_in_streak(stats) if stats else 0
+    if streak > 1:
+        base_prompt += f"\n\nThe user has checked in {streak} days in a row. Acknowledge this positively."
     
     return base_prompt
 
-async def save_messages(conversation_id: int, messages: List[dict]):
-    """Save messages to database"""
+def check_in_streak(stats: dict, today: Optional[date] = None) -> int:
+    """Consecutive check-in days, or 0 once the user has missed a day"""
+    last_check_in = date.fromisoformat(stats["last_check_in_date"])
+    if ((today or date.today()) - last_check_in).days > 1:
+        return 0
+    return stats.get("current_streak") or 0
+
+async def save_messages(db: Database, conversation_id: int, messages: List[dict], wait: bool = False):
+    """Save messages to database (write-behind; returns once queued, or once written with `wait`)
+
+    Pass `wait` before telling the client the reply is complete: clients
+    refetch the conversation as soon as they hear so.
+    """
     try:
-        message_data = []
-        for msg in messages:
-            message_data.append({
-                "conversation_id": conversation_id,
-                "role": msg["role"],
-                "content": msg["content"]
-            })
+        rows = await message_writer.enqueue(db, conversation_id, messages)
         
-        supabase.table("messages").insert(message_data).execute()
+        # Write-through: keep a cached history in step with what will be stored
+        conversation_cache.append(conversation_id, rows)
+        if wait:
+            await message_writer.wait_written(conversation_id)
     except Exception as e:
+        # The cached history may now be missing rows; reload it next turn
+        conversation_cache.invalidate(conversation_id)
         print(f"Error saving messages: {e}")
 
-def generate_suggestions(context_type: str, ai_message: str) -> List[str]:
-    """Generate follow-up suggestions based on context"""
-    if context_type == "check_in":
-        return [
-            "Tell me more about that",
-            "How can I support you with this?",
-            "What's one small step you could take?",
-            "How does this compare to yesterday?"
-        ]
-    
-    return [
+# Follow-up suggestions by context type ("default" for the others)
+SUGGESTIONS = {
+    "check_in": [
+        "Tell me more about that",
+        "How can I support you with this?",
+        "What's one small step you could take?",
+        "How does this compare to yesterday?"
+    ],
+    "default": [
         "Can you elaborate on that?",
         "What would you like to explore next?",
         "How are you feeling about this?"
     ]
+}
+
+def generate_suggestions(context_type: str, ai_message: str) -> List[str]:
+    """Generate follow-up suggestions based on context"""
+    return list(SUGGESTIONS.get(context_type, SUGGESTIONS["default"]))
+
+def suggestion_phrases() -> List[str]:
+    """Every suggestion `generate_suggestions` can return (for warming the TTS cache)"""
+    return list(dict.fromkeys(phrase for phrases in SUGGESTIONS.values() for phrase in phrases))
 
 @router.websocket("/ws")
-async def websocket_chat_endpoint(websocket: WebSocket, token: str = None):
-    """WebSocket endpoint for streaming chat responses"""
+async def websocket_chat_endpoint(
+    websocket: WebSocket,
+    token: str = None,
+    coalesce_bytes: Optional[int] = None,
+    coalesce_ms: Optional[float] = None,
+    conversation_id: Optional[int] = None
+):
+    """WebSocket endpoint for streaming chat responses.
+
+    `coalesce_bytes` / `coalesce_ms` tune how token deltas are batched into
+    frames for this connection (0 disables coalescing). Up to
+    `WS_MAX_CONCURRENT_STREAMS` replies can stream at once; frames carry
+    their `stream_id`, which `{"type": "cancel", "stream_id": ...}` aborts.
+    A message resent with the same `idempotency_key` follows the first
+    send's stream from the beginning instead of generating a new reply.
+    After authentication the context of `conversation_id` (default: the
+    most recently active conversation) is loaded ahead of the first message.
+    """
     await websocket.accept()
+    coalescing = CoalesceConfig.from_params(coalesce_bytes, coalesce_ms)
+    connection = None
+    warmup = None
     
     try:
         # Get auth token from query parameter or headers
@@ -287,33 +708,65 @@ async def websocket_chat_endpoint(websocket: WebSocket, token: str = None):
             await websocket.close()
             return
         
+        # Queries run with this socket's credentials only
+        db = Database(auth_token)
+        connection = open_connection(websocket)
+        warmup = start_warmup(db, user_id, conversation_id)
+        
         while True:
-            # Receive message from client
+            # Receive message from client; replies stream from their own tasks
             data = await websocket.receive_text()
             try:
                 message_data = json.loads(data)
-                print(f"Received WebSocket data. Message text: {message_data["message"]}")
             except json.JSONDecodeError as e:
                 print(f"JSON decode error: {e}")
-                await websocket.send_json({
+                await connection.send_json({
                     "type": "error",
                     "error": f"Invalid JSON format: {str(e)}"
-                })
+                }, control=True)
+                continue
+            
+            if message_data.get("type") == "cancel":
+                stream_registry.cancel(message_data.get("stream_id") or "", user_id)
+                continue
+            
+            if connection.at_capacity:
+                await connection.send_json({
+                    "type": "error",
+                    "error": "Too many concurrent streams",
+                    "code": 429
+                }, control=True)
+                continue
+            
+            if message_data.get("type") == "resume":
+                connection.spawn(resume_streaming_chat(
+                    connection=connection,
+                    user_id=user_id,
+                    stream_id=message_data.get("stream_id") or "",
+                    last_sequence=int(message_data.get("last_sequence") or 0)
+                ))
                 continue
             
             # Process streaming chat
-            await handle_streaming_chat(
-                websocket=websocket,
+            connection.spawn(handle_streaming_chat(
+                connection=connection,
+                db=db,
                 user_id=user_id,
+                coalescing=coalescing,
                 message=message_data.get("message"),
                 conversation_id=message_data.get("conversation_id"),
-                context_type=message_data.get("context_type", "check_in")
-            )
+                context_type=message_data.get("context_type", "check_in"),
+                idempotency_key=message_data.get("idempotency_key"),
+                warmup=warmup
+            ))
             
     except WebSocketDisconnect:
         print("WebSocket client disconnected")
     except Exception as e:
         print(f"WebSocket error: {e}")
+        # Stop the writer task first so the error frame is the last one sent
+        if connection is not None:
+            await connection.close()
         # Only try to send error if websocket is still open
         if websocket.client_state.name == 'CONNECTED':
             try:
@@ -327,126 +780,387 @@ async def websocket_chat_endpoint(websocket: WebSocket, token: str = None):
             await websocket.close()
         except:
             pass
+    finally:
+        if warmup is not None:
+            warmup.cancel()
+        if connection is not None:
+            await connection.close()
 
-async def handle_streaming_chat(
-    websocket: WebSocket,
+def open_connection(websocket: WebSocket) -> ChatConnection:
+    return ChatConnection(
+        websocket,
+        max_streams=settings.WS_MAX_CONCURRENT_STREAMS,
+        max_queue_bytes=settings.WS_SEND_QUEUE_MAX_BYTES,
+        send_timeout=settings.WS_SEND_TIMEOUT
+    )
+
+async def start_chat_stream(
+    db: Database,
     user_id: str,
     message: str,
     conversation_id: Optional[int] = None,
-    context_type: str = "check_in"
+    context_type: str = "check_in",
+    coalescing: Optional[CoalesceConfig] = None,
+    idempotency_key: Optional[str] = None,
+    warmup: Optional[ContextWarmup] = None
+) -> Optional[ReplayStream]:
+    """Load the turn's context and start generating the reply in the background.
+
+    The reply is published to a replay stream, so it keeps generating (and is
+    saved) if the client disconnects. Returns None if the conversation
+    doesn't exist or isn't the user's. A request that repeats an earlier
+    request's idempotency key gets that request's stream, unless it failed
+    or the registry no longer holds it.
+    """
+    if idempotency_key:
+        async def start() -> Optional[str]:
+            stream = await start_chat_stream(
+                db, user_id, message, conversation_id, context_type, coalescing, warmup=warmup
+            )
+            return stream.stream_id if stream is not None else None
+
+        def reusable(stream_id: Optional[str]) -> bool:
+            stream = stream_registry.find(stream_id, user_id) if stream_id else None
+            return stream is not None and not stream.failed
+
+        # Only the stream id is kept with the key, so the registry's own
+        # size and age limits still apply to the buffered reply
+        stream_id = await idempotency_store.run(
+            "stream", user_id, idempotency_key,
+            request_fingerprint(message, conversation_id, context_type),
+            start,
+            reusable=reusable
+        )
+        return stream_registry.find(stream_id, user_id) if stream_id else None
+    
+    # Ownership check (or creation), history and user context, concurrently
+    context = await load_chat_context(db, user_id, conversation_id, warmup)
+    if context is None:
+        return None
+    conversation_id = context.conversation_id
+    
+    # Build system prompt based on context type
+    system_prompt = build_system_prompt(context_type, context.user_context)
+    
+    # Prepare messages for OpenAI: recent turns within the token budget,
+    # older ones via the conversation summary
+    window = assemble_context(
+        system_prompt,
+        context.history,
+        message,
+        context.summary,
+        context.summary_message_count
+    )
+    
+    # Queue the user message (written in the background, in order)
+    await save_messages(db, conversation_id, [
+        {"role": "user", "content": message}
+    ])
+    
+    stream = stream_registry.create(user_id, conversation_id)
+    stream_registry.run(stream, generate_reply(
+        stream, db, context, window, context_type,
+        coalescing or CoalesceConfig.from_params()
+    ))
+    return stream
+
+async def generate_reply(
+    stream: ReplayStream,
+    db: Database,
+    context: ChatContext,
+    window: ContextWindow,
+    context_type: str,
+    coalescing: CoalesceConfig
 ):
-    """Handle streaming chat conversation"""
+    """Stream the AI response into `stream`, then save it"""
+    full_response = ""
     try:
-        # Create new conversation if none provided
-        if not conversation_id:
-            conv_result = supabase.table("conversations").insert({
-                "user_id": user_id
-            }).execute()
-            conversation_id = conv_result.data[0]["id"]
-        else:
-            # Verify user owns this conversation
-            conv_check = supabase.table("conversations").select("id").eq(
-                "id", conversation_id
-            ).eq("user_id", user_id).execute()
-            
-            if not conv_check.data:
-                await websocket.send_json({
-                    "type": "error",
-                    "error": "Conversation not found"
-                })
-                return
-        
-        # Get conversation context
-        context_messages = await get_conversation_messages(conversation_id)
-        
-        # Get user's recent check-ins for context
-        user_context = await get_user_context(user_id)
+        async for chunk_content in coalesce(llm.stream_chat(window.messages), coalescing):
+            full_response += chunk_content
+            stream.publish(chunk_content)
         
-        # Build system prompt based on context type
-        system_prompt = build_system_prompt(context_type, user_context)
-        
-        # Prepare messages for OpenAI
-        messages = [{"role": "system", "content": system_prompt}]
-        
-        # Add conversation history
-        for msg in context_messages:
-            role = "assistant" if msg["role"] == "ai" else "user"
-            messages.append({"role": role, "content": msg["content"]})
-        
-        # Add current user message
-        messages.append({"role": "user", "content": message})
+        # Save AI response to database
+        await save_messages(db, stream.conversation_id, [
+            {"role": "ai", "content": full_response}
+        ], wait=True)
         
-        # Save user message first
-        await save_messages(conversation_id, [
-            {"role": "user", "content": message}
-        ])
+        stream.complete(full_response, generate_suggestions(context_type, full_response))
         
-        # Stream AI response
-        full_response = ""
-        stream = client.chat.completions.create(
-            model="gpt-4",
-            messages=messages,
-            max_tokens=500,
-            temperature=0.7,
-            stream=True
+        schedule_summary_update(
+            db, stream.conversation_id, context.history, window,
+            context.summary, context.summary_message_count
+        )
+    
+    except asyncio.CancelledError:
+        # Cancelled by the client: keep what was generated so far
+        if full_response:
+            await save_messages(db, stream.conversation_id, [
+                {"role": "ai", "content": full_response}
+            ])
+        raise
+    except Exception as e:
+        print(f"Streaming chat error: {e}")
+        stream.fail(str(e))
+
+@dataclass
+class VoiceTurn:
+    """A voice turn whose transcript and context are ready for the reply"""
+    db: Database
+    context: ChatContext
+    window: ContextWindow
+    transcript: str
+    context_type: str
+    
+    @property
+    def conversation_id(self) -> int:
+        return self.context.conversation_id
+    
+    @property
+    def voice_id(self) -> Optional[str]:
+        """The user's cloned voice, if the synthesizer can speak with it"""
+        return clone_voice_id(self.context.user_context.get("voice_clone"))
+
+def clone_voice_id(clone: Optional[dict]) -> Optional[str]:
+    """The synthesizer's voice id for a voice clone record; None for its default voice"""
+    if clone and speech.get_synthesizer().supports_clones:
+        return clone.get("elevenlabs_voice_id")
+    return None
+
+async def start_voice_turn(
+    db: Database,
+    user_id: str,
+    transcription: Awaitable[str],
+    conversation_id: Optional[int] = None,
+    context_type: str = "check_in",
+    warmup: Optional[ContextWarmup] = None
+) -> Optional[VoiceTurn]:
+    """Wait for the user's words and prepare the reply's context.
+
+    The turn's context loads while the audio is still being transcribed.
+    Returns None if the conversation doesn't exist or isn't the user's.
+    A conversation created for the turn is deleted again if no words come
+    of it.
+    """
+    loading = asyncio.ensure_future(load_chat_context(db, user_id, conversation_id, warmup))
+    try:
+        transcript = await transcription
+        if not transcript:
+            raise SpeechError("No speech recognized")
+    except BaseException:
+        if conversation_id is None:
+            # Finish in the background: this task may be the one being cancelled
+            task = asyncio.create_task(discard_new_conversation(db, loading))
+            _cleanup_tasks.add(task)
+            task.add_done_callback(_cleanup_tasks.discard)
+        else:
+            loading.cancel()
+        raise
+    context = await loading
+    if context is None:
+        return None
+    
+    window = assemble_context(
+        build_system_prompt(context_type, context.user_context),
+        context.history,
+        transcript,
+        context.summary,
+        context.summary_message_count
+    )
+    await save_messages(db, context.conversation_id, [
+        {"role": "user", "content": transcript}
+    ])
+    return VoiceTurn(db, context, window, transcript, context_type)
+
+# Background cleanups, referenced until they finish
+_cleanup_tasks: Set[asyncio.Task] = set()
+
+async def discard_new_conversation(db: Database, loading: Awaitable[Optional[ChatContext]]):
+    """Delete a conversation created for a turn that was abandoned"""
+    try:
+        context = await loading
+        if context is None:
+            return
+        await db.table("conversations").delete().eq("id", context.conversation_id).execute()
+        conversation_cache.invalidate(context.conversation_id)
+    except Exception as e:
+        print(f"Error discarding empty conversation: {e}")
+
+async def speak_voice_turn(turn: VoiceTurn, audio_format: Optional[str] = None) -> AsyncIterator[VoiceEvent]:
+    """Stream the reply's text and audio (see services/voice_pipeline.py), then save it"""
+    yield VoiceEvent(voice_pipeline.TRANSCRIPT, text=turn.transcript)
+    full_response = ""
+    saved = False
+    try:
+        async for event in speak_reply(
+            llm.stream_chat(turn.window.messages),
+            speech.get_synthesizer(),
+            turn.voice_id,
+            audio_format
+        ):
+            if event.kind == voice_pipeline.TEXT:
+                full_response += event.text
+            elif event.kind == voice_pipeline.COMPLETE:
+                await save_messages(turn.db, turn.conversation_id, [
+                    {"role": "ai", "content": event.text}
+                ], wait=True)
+                saved = True
+                schedule_summary_update(
+                    turn.db, turn.conversation_id, turn.context.history, turn.window,
+                    turn.context.summary, turn.context.summary_message_count
+                )
+            yield event
+    finally:
+        # Client went away (or synthesis failed): keep what was generated
+        if not saved and full_response:
+            await save_messages(turn.db, turn.conversation_id, [
+                {"role": "ai", "content": full_response}
+            ])
+
+async def handle_streaming_chat(
+    connection: ChatConnection,
+    db: Database,
+    user_id: str,
+    message: str,
+    conversation_id: Optional[int] = None,
+    context_type: str = "check_in",
+    coalescing: Optional[CoalesceConfig] = None,
+    idempotency_key: Optional[str] = None,
+    warmup: Optional[ContextWarmup] = None
+):
+    """Handle streaming chat conversation"""
+    try:
+        stream = await start_chat_stream(
+            db, user_id, message, conversation_id, context_type, coalescing, idempotency_key, warmup
         )
+        if stream is None:
+            await connection.send_json({
+                "type": "error",
+                "error": "Conversation not found"
+            })
+            return
         
-        for chunk in stream:
-            if chunk.choices[0].delta.content:
-                chunk_content = chunk.choices[0].delta.content
-                full_response += chunk_content
-                
-                # Send chunk to client
-                await websocket.send_json({
-                    "type": "message_chunk",
-                    "chunk": chunk_content,
-                    "conversation_id": conversation_id
+        await send_json_stream(connection, stream)
+    
+    except (IdempotencyConflict, InvalidIdempotencyKey) as e:
+        await connection.send_json({
+            "type": "error",
+            "error": str(e),
+            "code": 422 if isinstance(e, IdempotencyConflict) else 400
+        })
+    except Exception as e:
+        print(f"Streaming chat error: {e}")
+        if connection.client_state.name == 'CONNECTED':
+            try:
+                await connection.send_json({
+                    "type": "error",
+                    "error": str(e)
                 })
-        
-        # Save AI response to database
-        await save_messages(conversation_id, [
-            {"role": "ai", "content": full_response}
-        ])
-        
-        # Send completion message
-        await websocket.send_json({
-            "type": "message_complete",
-            "message": full_response,
-            "conversation_id": conversation_id
+            except Exception as send_error:
+                print(f"Failed to send streaming error: {send_error}")
+
+async def resume_streaming_chat(
+    connection: ChatConnection,
+    user_id: str,
+    stream_id: str,
+    last_sequence: int = 0
+):
+    """Re-attach a reconnected client to a stream, from after `last_sequence`"""
+    stream = stream_registry.get(stream_id, user_id)
+    if stream is None:
+        await connection.send_json({
+            "type": "error",
+            "error": "Stream not found or expired",
+            "code": 404,
+            "stream_id": stream_id
         })
+        return
+    try:
+        await send_json_stream(connection, stream, after=last_sequence)
+    except ReplayGap as e:
+        await connection.send_json({
+            "type": "error",
+            "error": str(e),
+            "code": 410,
+            "stream_id": stream_id,
+            "conversation_id": stream.conversation_id
+        })
+
+async def send_json_stream(connection: ChatConnection, stream: ReplayStream, after: int = 0):
+    """Send a stream's frames after `after` as `/ws` JSON messages"""
+    def encode_chunk(text: str, sequence: int) -> str:
+        return json.dumps({
+            "conversation_id": stream.conversation_id,
+            "stream_id": stream.stream_id,
+            "sequence": sequence,
+            "type": "message_chunk",
+            "chunk": text
+        }, separators=(",", ":"), ensure_ascii=False)
+    
+    async for event in stream.follow(after):
+        if event.kind == CHUNK:
+            await connection.send_chunk(stream.stream_id, event.sequence, event.text, encode_chunk)
+            continue
+        frame = {
+            "conversation_id": stream.conversation_id,
+            "stream_id": stream.stream_id,
+            "sequence": event.sequence
+        }
+        if event.kind == COMPLETE:
+            frame.update(type="message_complete", message=event.text)
+        else:
+            frame.update(type="error", error=event.text, code=event.code)
+        await connection.send_json(frame)
 
 
 @router.websocket("/ws-bin")
-async def websocket_chat_proto_endpoint(websocket: WebSocket, token: str = None):
-    """WebSocket endpoint that streams protobuf binary frames.
+async def websocket_chat_proto_endpoint(
+    websocket: WebSocket,
+    token: str = None,
+    coalesce_bytes: Optional[int] = None,
+    coalesce_ms: Optional[float] = None,
+    conversation_id: Optional[int] = None,
+    context_type: str = "check_in"
+):
+    """WebSocket endpoint speaking protobuf in both directions.
 
+    Every frame is a binary `ChatStreamEnvelope` (see proto/chat_stream.proto).
     Requires generated Python module at `backend/proto_gen/chat_stream_pb2.py`.
-    See proto/README.md for generation instructions.
+    See proto/README.md for generation instructions. Coalescing parameters
+    and the concurrent stream limit are the same as for `/ws`, as is the
+    warm-up of `conversation_id`'s context after authentication.
+
+    Microphone audio sent as `audio` frames is answered by voice: each
+    utterance becomes a stream with its transcript and the reply's text
+    and audio. `context_type` applies to these voice turns (text requests
+    carry their own).
     """
     await websocket.accept()
+    coalescing = CoalesceConfig.from_params(coalesce_bytes, coalesce_ms)
 
     # Quick guard: ensure protobuf helpers are available
-    if encode_chat_chunk is None or encode_chat_complete is None or encode_error is None:
+    if not protobuf_available():
         await websocket.send_bytes(b"")  # trigger client read
         await websocket.close(code=1011)
         return
 
+    connection = None
+    warmup = None
+    listener = None
+    # Running voice turns by stream id, for cancellation
+    voice_turns: Dict[str, asyncio.Task] = {}
     try:
         # Get auth token from query parameter or headers
         auth_token = token
         if not auth_token and "authorization" in websocket.headers:
             auth_token = websocket.headers["authorization"].replace("Bearer ", "")
 
-        # Try to get token from first message if not in headers/query
+        # Otherwise the first frame must carry it
         if not auth_token:
             try:
-                data = await websocket.receive_text()
-                message_data = json.loads(data)
-                auth_token = message_data.get("auth_token")
-                if not auth_token:
-                    await websocket.close(code=1008)
-                    return
-            except Exception:
+                auth_token = _auth_token_from_frame(await _receive_frame(websocket))
+            except (InvalidFrame, ValueError, KeyError):
+                auth_token = None
+            if not auth_token:
                 await websocket.close(code=1008)
                 return
 
@@ -457,115 +1171,80 @@ async def websocket_chat_proto_endpoint(websocket: WebSocket, token: str = None)
             await websocket.close(code=1008)
             return
 
+        db = Database(auth_token)
+        connection = open_connection(websocket)
+        warmup = start_warmup(db, user_id, conversation_id)
+
         while True:
-            # Receive message from client (JSON for request envelope)
-            data = await websocket.receive_text()
-            try:
-                message_data = json.loads(data)
-            except json.JSONDecodeError as e:
-                # Send protobuf error then continue
-                try:
-                    err_bytes = encode_error(
-                        conversation_id=0,
-                        message=f"Invalid JSON: {str(e)}",
-                        code=400,
-                    )
-                    await websocket.send_bytes(err_bytes)
-                except ProtobufUnavailable:
-                    pass
+            frame = await _receive_frame(websocket)
+            if frame.get("bytes") is None:
+                await connection.send_bytes(encode_error(
+                    conversation_id=0,
+                    message="Expected a binary ChatStreamEnvelope frame",
+                    code=415,
+                ), control=True)
                 continue
 
-            # Process streaming chat (same as JSON endpoint but binary out)
-            conversation_id = message_data.get("conversation_id")
-            context_type = message_data.get("context_type", "check_in")
-            message = message_data.get("message")
-
-            # Create or validate conversation
-            if not conversation_id:
-                conv_result = supabase.table("conversations").insert({
-                    "user_id": user_id
-                }).execute()
-                conversation_id = conv_result.data[0]["id"]
-            else:
-                conv_check = supabase.table("conversations").select("id").eq(
-                    "id", conversation_id
-                ).eq("user_id", user_id).execute()
-                if not conv_check.data:
-                    err_bytes = encode_error(
-                        conversation_id=0,
-                        message="Conversation not found",
-                        code=404,
-                    )
-                    await websocket.send_bytes(err_bytes)
-                    continue
-
-            # Context + messages
-            context_messages = await get_conversation_messages(conversation_id)
-            user_context = await get_user_context(user_id)
-            system_prompt = build_system_prompt(context_type, user_context)
-
-            messages = [{"role": "system", "content": system_prompt}]
-            for msg in context_messages:
-                role = "assistant" if msg["role"] == "ai" else "user"
-                messages.append({"role": role, "content": msg["content"]})
-            messages.append({"role": "user", "content": message})
-
-            # Save user message first
-            await save_messages(conversation_id, [
-                {"role": "user", "content": message}
-            ])
-
-            # Stream OpenAI response and send protobuf chunks
-            full_response = ""
-            seq = 0
-            stream = client.chat.completions.create(
-                model="gpt-4",
-                messages=messages,
-                max_tokens=500,
-                temperature=0.7,
-                stream=True,
-            )
-
-            for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    part = chunk.choices[0].delta.content
-                    full_response += part
-                    seq += 1
-                    try:
-                        bytes_msg = encode_chat_chunk(
-                            conversation_id=conversation_id,
-                            text=part,
-                            sequence=seq,
-                        )
-                        await websocket.send_bytes(bytes_msg)
-                    except ProtobufUnavailable:
-                        # If protobuf generation isn't available, abort
-                        await websocket.close(code=1011)
-                        return
-
-            # Save AI response
-            await save_messages(conversation_id, [
-                {"role": "ai", "content": full_response}
-            ])
-
-            # Send completion message
             try:
-                done_bytes = encode_chat_complete(
-                    conversation_id=conversation_id,
-                    full_text=full_response,
-                    suggestions=generate_suggestions(context_type, full_response),
-                    sequence=seq + 1,
+                envelope = decode_envelope(frame["bytes"])
+            except InvalidFrame as e:
+                await connection.send_bytes(encode_error(conversation_id=0, message=str(e), code=400), control=True)
+                continue
+
+            payload = envelope.WhichOneof("payload")
+            if payload == "cancel":
+                voice_turn = voice_turns.get(envelope.stream_id)
+                if voice_turn is not None:
+                    voice_turn.cancel()
+                else:
+                    stream_registry.cancel(envelope.stream_id, user_id)
+            elif payload == "ack":
+                continue
+            elif payload == "audio":
+                listener = await receive_binary_audio(
+                    connection, db, user_id, listener, envelope, context_type, warmup, voice_turns
                 )
-                await websocket.send_bytes(done_bytes)
-            except ProtobufUnavailable:
-                await websocket.close(code=1011)
-                return
+            elif payload in ("request", "resume") and connection.at_capacity:
+                await connection.send_bytes(encode_error(
+                    conversation_id=envelope.conversation_id,
+                    message="Too many concurrent streams",
+                    code=429,
+                    stream_id=envelope.stream_id or None,
+                ), control=True)
+            elif payload == "request":
+                connection.spawn(handle_binary_chat(
+                    connection=connection,
+                    db=db,
+                    user_id=user_id,
+                    message=envelope.request.message,
+                    conversation_id=envelope.conversation_id or None,
+                    context_type=envelope.request.context_type or "check_in",
+                    coalescing=coalescing,
+                    idempotency_key=envelope.request.idempotency_key or None,
+                    warmup=warmup,
+                ))
+            elif payload == "resume":
+                connection.spawn(resume_binary_chat(
+                    connection=connection,
+                    user_id=user_id,
+                    stream_id=envelope.stream_id,
+                    last_sequence=envelope.resume.last_sequence,
+                ))
+            else:
+                await connection.send_bytes(encode_error(
+                    conversation_id=envelope.conversation_id,
+                    message=f"Unexpected payload: {payload}",
+                    code=400,
+                ), control=True)
 
     except WebSocketDisconnect:
         pass
     except Exception as e:
         try:
-            if encode_error:
+            # Stop the writer task first so the error frame is the last one sent
+            if connection is not None:
+                await connection.close()
+            if protobuf_available():
                 err = encode_error(conversation_id=0, message=str(e), code=500)
                 await websocket.send_bytes(err)
         finally:
@@ -573,14 +1252,287 @@ async def websocket_chat_proto_endpoint(websocket: WebSocket, token: str = None)
                 await websocket.close(code=1011)
             except Exception:
                 pass
-        
+    finally:
+        if warmup is not None:
+            warmup.cancel()
+        if listener is not None:
+            listener.close()
+        if connection is not None:
+            await connection.close()
+
+
+async def _receive_frame(websocket: WebSocket) -> dict:
+    """Receive one text or binary frame (raw ASGI message)"""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    return message
+
+
+def _auth_token_from_frame(frame: dict) -> Optional[str]:
+    if frame.get("bytes") is not None:
+        envelope = decode_envelope(frame["bytes"])
+        return envelope.auth.token if envelope.WhichOneof("payload") == "auth" else None
+    # Legacy: JSON text frame with an auth_token field
+    return json.loads(frame.get("text") or "{}").get("auth_token")
+
+
+async def handle_binary_chat(
+    connection: ChatConnection,
+    db: Database,
+    user_id: str,
+    message: str,
+    conversation_id: Optional[int] = None,
+    context_type: str = "check_in",
+    coalescing: Optional[CoalesceConfig] = None,
+    idempotency_key: Optional[str] = None,
+    warmup: Optional[ContextWarmup] = None
+):
+    """Handle one streamed generation over the protobuf protocol"""
+    try:
+        if not message:
+            await connection.send_bytes(encode_error(
+                conversation_id=conversation_id or 0,
+                message="Empty message",
+                code=400,
+            ))
+            return
+
+        stream = await start_chat_stream(
+            db, user_id, message, conversation_id, context_type, coalescing, idempotency_key, warmup
+        )
+        if stream is None:
+            await connection.send_bytes(encode_error(
+                conversation_id=conversation_id or 0,
+                message="Conversation not found",
+                code=404,
+            ))
+            return
+
+        # Accept: tells the client the stream id (and new conversation id)
+        await connection.send_bytes(encode_ack(stream.conversation_id, stream.stream_id, sequence=0))
+        await send_binary_stream(connection, stream)
+
+    except WebSocketDisconnect:
+        return
+    except (IdempotencyConflict, InvalidIdempotencyKey) as e:
+        await connection.send_bytes(encode_error(
+            conversation_id=conversation_id or 0,
+            message=str(e),
+            code=422 if isinstance(e, IdempotencyConflict) else 400,
+        ))
     except Exception as e:
-        print(f"Streaming chat error: {e}")
-        if websocket.client_state.name == 'CONNECTED':
-            try:
-                await websocket.send_json({
-                    "type": "error",
-                    "error": str(e)
-                })
-            except Exception as send_error:
-                print(f"Failed to send streaming error: {send_error}")
+        print(f"Binary streaming chat error: {e}")
+        if connection.client_state.name == 'CONNECTED':
+            await connection.send_bytes(encode_error(
+                conversation_id=conversation_id or 0,
+                message=str(e),
+                code=500,
+            ))
+
+
+async def resume_binary_chat(
+    connection: ChatConnection,
+    user_id: str,
+    stream_id: str,
+    last_sequence: int = 0
+):
+    """Re-attach a reconnected client to a stream, from after `last_sequence`"""
+    stream = stream_registry.get(stream_id, user_id)
+    if stream is None:
+        await connection.send_bytes(encode_error(
+            conversation_id=0,
+            message="Stream not found or expired",
+            code=404,
+            stream_id=stream_id,
+        ))
+        return
+
+    await connection.send_bytes(encode_ack(stream.conversation_id, stream.stream_id, sequence=last_sequence))
+    try:
+        await send_binary_stream(connection, stream, after=last_sequence)
+    except ReplayGap as e:
+        await connection.send_bytes(encode_error(
+            conversation_id=stream.conversation_id,
+            message=str(e),
+            code=410,
+            stream_id=stream_id,
+        ))
+
+
+async def receive_binary_audio(
+    connection: ChatConnection,
+    db: Database,
+    user_id: str,
+    listener: Optional[VoiceListener],
+    envelope,
+    context_type: str = "check_in",
+    warmup: Optional[ContextWarmup] = None,
+    voice_turns: Optional[Dict[str, asyncio.Task]] = None
+) -> Optional[VoiceListener]:
+    """Feed one microphone frame to the socket's listener.
+
+    A voice turn starts as soon as the user starts speaking, so its context
+    loads while they talk. Returns the listener to use for the next frame.
+    """
+    audio = envelope.audio
+    audio_format = AUDIO_FORMAT_NAMES.get(audio.format)
+    if audio_format not in VOICE_INPUT_FORMATS:
+        await connection.send_bytes(encode_error(
+            conversation_id=envelope.conversation_id,
+            message="Unsupported audio format",
+            code=415,
+        ), control=True)
+        return listener
+
+    if listener is None or listener.audio_format != audio_format:
+        if listener is not None:
+            listener.close()
+        vad = None
+        if audio_format == speech.PCM_16000:
+            vad = EnergyVAD(min_rms=settings.VOICE_VAD_MIN_RMS, end_ms=settings.VOICE_VAD_END_MS)
+        listener = VoiceListener(
+            speech.get_transcriber(), audio_format, vad, max_utterance_bytes=settings.VOICE_MESSAGE_MAX_BYTES
+        )
+
+    # An empty frame ends the utterance
+    try:
+        events = listener.feed(audio.audio_data) if audio.audio_data else listener.end()
+    except UtteranceTooLong as e:
+        await connection.send_bytes(encode_error(
+            conversation_id=envelope.conversation_id,
+            message=str(e),
+            code=413,
+        ), control=True)
+        return listener
+    for event, utterance in events:
+        if event != SPEECH_START:
+            continue
+        if connection.at_capacity:
+            listener.cancel_utterance(utterance)
+            await connection.send_bytes(encode_error(
+                conversation_id=envelope.conversation_id,
+                message="Too many concurrent streams",
+                code=429,
+            ), control=True)
+            continue
+        connection.spawn(handle_binary_voice(
+            connection=connection,
+            db=db,
+            user_id=user_id,
+            utterance=utterance,
+            conversation_id=envelope.conversation_id or None,
+            context_type=context_type,
+            warmup=warmup,
+            voice_turns=voice_turns,
+        ))
+    return listener
+
+
+async def handle_binary_voice(
+    connection: ChatConnection,
+    db: Database,
+    user_id: str,
+    utterance: Utterance,
+    conversation_id: Optional[int] = None,
+    context_type: str = "check_in",
+    warmup: Optional[ContextWarmup] = None,
+    voice_turns: Optional[Dict[str, asyncio.Task]] = None
+):
+    """Answer one spoken utterance over the protobuf protocol.
+
+    The reply starts once the utterance's transcript is in, which is
+    shortly after the user stops talking. Its audio is sent as `audio`
+    frames alongside the text.
+    """
+    stream_id = uuid.uuid4().hex
+    if voice_turns is not None:
+        voice_turns[stream_id] = asyncio.current_task()
+    try:
+        synthesizer = speech.get_synthesizer()
+        reply_format = next((f for f in VOICE_REPLY_FORMATS if f in synthesizer.formats), None)
+        if reply_format is None:
+            raise SpeechError(f"{synthesizer.name} can't produce any of {', '.join(VOICE_REPLY_FORMATS)}")
+        turn = await start_voice_turn(db, user_id, utterance.transcript(), conversation_id, context_type, warmup)
+        if turn is None:
+            await connection.send_bytes(encode_error(
+                conversation_id=conversation_id or 0,
+                message="Conversation not found",
+                code=404,
+            ))
+            return
+
+        await connection.send_bytes(encode_ack(turn.conversation_id, stream_id, sequence=0))
+        frames = ChunkFrameEncoder(turn.conversation_id, stream_id)
+        sequence = 0
+        async for event in speak_voice_turn(turn, reply_format):
+            if event.kind == voice_pipeline.SEGMENT:
+                continue
+            sequence += 1
+            if event.kind == voice_pipeline.TRANSCRIPT:
+                frame = encode_transcript(turn.conversation_id, event.text, stream_id, sequence)
+            elif event.kind == voice_pipeline.TEXT:
+                frame = frames.chunk(event.text, sequence)
+            elif event.kind == voice_pipeline.AUDIO:
+                frame = encode_audio(turn.conversation_id, event.audio, reply_format, stream_id, sequence)
+            elif event.kind == voice_pipeline.COMPLETE:
+                frame = encode_chat_complete(
+                    conversation_id=turn.conversation_id,
+                    full_text=event.text,
+                    suggestions=generate_suggestions(context_type, event.text),
+                    stream_id=stream_id,
+                    sequence=sequence,
+                )
+            else:
+                frame = encode_error(
+                    conversation_id=turn.conversation_id,
+                    message=event.text,
+                    code=500,
+                    stream_id=stream_id,
+                    sequence=sequence,
+                )
+            await connection.send_bytes(frame)
+
+    except WebSocketDisconnect:
+        return
+    except SpeechError as e:
+        await connection.send_bytes(encode_error(
+            conversation_id=conversation_id or 0,
+            message=str(e),
+            code=422,
+        ))
+    except Exception as e:
+        print(f"Binary voice chat error: {e}")
+        if connection.client_state.name == 'CONNECTED':
+            await connection.send_bytes(encode_error(
+                conversation_id=conversation_id or 0,
+                message=str(e),
+                code=500,
+            ))
+    finally:
+        if voice_turns is not None:
+            voice_turns.pop(stream_id, None)
+
+
+async def send_binary_stream(connection: ChatConnection, stream: ReplayStream, after: int = 0):
+    """Send a stream's frames after `after` as protobuf envelopes"""
+    frames = ChunkFrameEncoder(stream.conversation_id, stream.stream_id)
+    async for event in stream.follow(after):
+        if event.kind == CHUNK:
+            await connection.send_chunk(stream.stream_id, event.sequence, event.text, frames.chunk)
+        elif event.kind == COMPLETE:
+            await connection.send_bytes(encode_chat_complete(
+                conversation_id=stream.conversation_id,
+                full_text=event.text,
+                suggestions=event.suggestions,
+                stream_id=stream.stream_id,
+                sequence=event.sequence,
+            ))
+        else:
+            await connection.send_bytes(encode_error(
+                conversation_id=stream.conversation_id,
+                message=event.text,
+                code=event.code,
+                stream_id=stream.stream_id,
+                sequence=event.sequence,
+            ))
@@ -1,7 +1,19 @@
 # routers/health.py
 from fastapi import APIRouter, HTTPException
-from config import supabase, settings
+from config import settings
+from services.db import Database
+from services.conversation_cache import conversation_cache
+from services.user_context_cache import user_context_cache
+from services.token_verifier import verifier
+from services.message_writer import message_writer
+from services.stream_registry import stream_registry
+from services.idempotency import idempotency_store
+from services.context_warmup import warmup_metrics
+from services.audio_store import audio_store
+from services.tts_cache import tts_cache
+from services.chat_connection import connection_metrics
 import openai
+import time
 from datetime import datetime
 
 router = APIRouter()
@@ -27,10 +39,11 @@ async def service_status():
     # Check Supabase connection
     try:
         # Simple query to test connection
-        result = supabase.table("profiles").select("count", count="exact").limit(1).execute()
+        started = time.perf_counter()
+        await Database().table("profiles").select("id", count="exact").limit(1).execute()
         status["dependencies"]["supabase"] = {
             "status": "healthy",
-            "response_time": "< 100ms"  # Placeholder
+            "response_time": f"{(time.perf_counter() - started) * 1000:.0f}ms"
         }
     except Exception as e:
         status["dependencies"]["supabase"] = {
@@ -81,6 +94,22 @@ async def service_status():
             "all_required_vars_present": True
         }
     
+    # In-process cache counters
+    status["caches"] = {
+        "conversations": conversation_cache.stats(),
+        "user_contexts": user_context_cache.stats(),
+        "auth_tokens": verifier.stats(),
+        "idempotency_keys": idempotency_store.stats(),
+        "context_warmup": warmup_metrics.stats(),
+        "audio_store": audio_store.stats(),
+        "tts": tts_cache.stats()
+    }
+    status["queues"] = {
+        "message_writer": message_writer.stats(),
+        "ws_send": connection_metrics.stats()
+    }
+    status["streams"] = stream_registry.stats()
+    
     return status
 
 @router.get("/version")
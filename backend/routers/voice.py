@@ -1,15 +1,32 @@
 # routers/voice.py
-from fastapi import APIRouter, File, UploadFile, HTTPException, Form
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
+import base64
+import json
 import uuid
 import os
-from config import supabase, settings
+from config import settings
+from . import chat
+from .auth import get_current_user_id
+from services import speech, voice_pipeline
+from services.audio_store import AUDIO_ID, AudioWriter, StoredAudio, audio_store
+from services.db import Database, get_db
+from services.speech import SpeechError
+from services.tts_cache import schedule_warmup, tts_cache
+from services.uploads import InvalidUpload, SpooledFile, SpooledForm, UploadTooLarge, spool_form
+from services.user_context_cache import user_context_cache
 
 router = APIRouter()
 
+# Stored audio never changes under its id
+AUDIO_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Longest text /synthesize speaks in one request
+SYNTHESIZE_MAX_CHARS = 5000
+
 
 class VoiceMessageRequest(BaseModel):
     text: str
@@ -18,58 +35,179 @@ class VoiceMessageRequest(BaseModel):
 
 @router.post("/message")
 async def send_voice_message(
-    audio: UploadFile = File(...),
-    conversation_id: Optional[int] = Form(None),
-    user_id: str = Form(...)  # TODO: Get from auth dependency
+    request: Request,
+    user_id: str = Depends(get_current_user_id),
+    db: Database = Depends(get_db)
 ):
-    """Process voice message: STT -> LLM -> TTS pipeline"""
-    try:
-        # TODO: Implement STT (Speech-to-Text)
-        # - Save uploaded audio file
-        # - Send to OpenAI Whisper or similar service
-        # - Extract text from audio
-        
-        # TODO: Process through LLM
-        # - Send text to OpenAI GPT with daily check-in context
-        # - Generate appropriate response
-        
-        # TODO: Generate TTS response
-        # - Use user's voice clone if available
-        # - Generate audio response
-        # - Save audio file
-        
-        # Placeholder response
-        return {
-            "message": "Voice processing not yet implemented",
-            "conversation_id": conversation_id or 1,  # Placeholder
-            "audio_url": None
-        }
+    """Process voice message: STT -> LLM -> TTS pipeline, streamed as Server-Sent Events.
+
+    Multipart form: `audio` (the recording), and optionally
+    `conversation_id`, `context_type` (default check_in) and `audio_format`
+    (preferred reply format, e.g. mp3 or pcm_16000). The recording is
+    streamed to a temporary file as it arrives (services/uploads.py), up
+    to VOICE_MESSAGE_MAX_BYTES.
+
+    The reply is spoken sentence by sentence while it is being generated.
+    Events: `transcript` (what the user said), `chunk` (reply text),
+    `segment` (a sentence about to be spoken), `audio` (base64 audio for
+    the current segment, in the format of the `X-Audio-Format` header),
+    then `complete` or `error`. `complete` carries the `audio_id` of the
+    whole reply's audio, for replay from GET /audio/{audio_id}.
+    """
+    async with await receive_form(request, settings.VOICE_MESSAGE_MAX_BYTES) as form:
+        audio = form.file("audio")
+        if audio is None:
+            raise HTTPException(status_code=422, detail="An audio file is required")
+        conversation_id = form_int(form, "conversation_id")
+        context_type = form.fields.get("context_type") or "check_in"
+        reply_format = speech.get_synthesizer().pick_format(form.fields.get("audio_format"))
+        try:
+            turn = await chat.start_voice_turn(
+                db, user_id,
+                speech.get_transcriber().transcribe_file(audio.path, upload_format(audio)),
+                conversation_id, context_type
+            )
+        except SpeechError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    if turn is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
     
+    return StreamingResponse(
+        voice_sse_events(turn, reply_format),
+        media_type="text/event-stream",
+        headers={
+            **chat.SSE_HEADERS,
+            "X-Conversation-Id": str(turn.conversation_id),
+            "X-Audio-Format": reply_format
+        }
+    )
+
+async def receive_form(request: Request, max_bytes: int, max_files: int = 1) -> SpooledForm:
+    try:
+        return await spool_form(request, max_bytes, max_files)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def form_int(form: SpooledForm, name: str) -> Optional[int]:
+    value = form.fields.get(name)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"{name} must be an integer")
+
+def upload_format(upload: SpooledFile) -> str:
+    """Audio format of an upload: sniffed from its contents, else its file extension"""
+    if upload.audio_format:
+        return upload.audio_format
+    _, ext = os.path.splitext(upload.filename or "")
+    return ext.lstrip(".").lower() or speech.WAV
+
+async def voice_sse_events(turn: chat.VoiceTurn, audio_format: str):
+    sequence = 0
+    # The whole reply's audio, kept for replay
+    recording = audio_store.writer(audio_format)
+    try:
+        async for event in chat.speak_voice_turn(turn, audio_format):
+            sequence += 1
+            if event.kind == voice_pipeline.AUDIO:
+                await recording.write(event.audio)
+                data = {"segment": event.segment, "audio": base64.b64encode(event.audio).decode()}
+            elif event.kind == voice_pipeline.SEGMENT:
+                data = {"segment": event.segment, "text": event.text}
+            elif event.kind == voice_pipeline.COMPLETE:
+                data = {"message": event.text, "suggestions": chat.generate_suggestions(turn.context_type, event.text)}
+                stored = await store_recording(recording)
+                if stored is not None:
+                    data["audio_id"] = stored.audio_id
+            elif event.kind == voice_pipeline.ERROR:
+                data = {"error": event.text}
+            else:
+                data = {"text": event.text}
+            data["conversation_id"] = turn.conversation_id
+            yield f"id: {sequence}\nevent: {event.kind}\ndata: {json.dumps(data)}\n\n"
+    finally:
+        await recording.discard()
+
+async def store_recording(recording: AudioWriter) -> Optional[StoredAudio]:
+    try:
+        return await recording.commit()
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        # Replay is optional; the reply itself was delivered
+        print(f"Failed to store reply audio: {e}")
+        return None
 
 @router.get("/audio/{audio_id}")
-async def get_audio_file(audio_id: str):
-    """Download generated audio file"""
-    try:
-        # TODO: Retrieve audio file from storage
-        # For now, return placeholder
+async def get_audio_file(audio_id: str, request: Request):
+    """Download generated audio file
+
+    Audio is stored by content hash (services/audio_store.py), so the id is
+    a strong ETag and responses can be cached indefinitely. A matching
+    If-None-Match gets 304. Range requests are answered with 206 for
+    seeking; the file is sent by the server directly where it supports
+    the ASGI pathsend extension.
+    """
+    stored = await audio_store.get(audio_id) if AUDIO_ID.fullmatch(audio_id) else None
+    if stored is None:
         raise HTTPException(status_code=404, detail="Audio file not found")
     
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    etag = f'"{stored.audio_id}"'
+    headers = {"ETag": etag, "Cache-Control": AUDIO_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(
+        stored.path,
+        media_type=speech.CONTENT_TYPES.get(stored.audio_format, "application/octet-stream"),
+        headers=headers
+    )
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak: W/ prefixes are ignored)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
 
 @router.post("/clone")
 async def create_voice_clone(
-    voice_samples: List[UploadFile] = File(...),
-    voice_name: str = Form(...),
-    user_id: str = Form(...)  # TODO: Get from auth dependency
+    request: Request,
+    user_id: str = Depends(get_current_user_id),
+    db: Database = Depends(get_db)
 ):
-    """Upload voice samples to create voice clone"""
+    """Upload voice samples to create voice clone
+
+    Multipart form: one or more `voice_samples` files and `voice_name`.
+    Samples are streamed to temporary files as they arrive, up to
+    VOICE_CLONE_MAX_SAMPLES files and VOICE_CLONE_MAX_BYTES in total; each
+    must be a recognized audio file, and repeated samples are dropped.
+    """
+    async with await receive_form(request, settings.VOICE_CLONE_MAX_BYTES, settings.VOICE_CLONE_MAX_SAMPLES) as form:
+        voice_name = form.fields.get("voice_name")
+        if not voice_name:
+            raise HTTPException(status_code=422, detail="voice_name is required")
+        samples = {}
+        for sample in form.files_for("voice_samples"):
+            if sample.audio_format is None:
+                raise HTTPException(status_code=415, detail=f"{sample.filename or 'Sample'} is not a supported audio file")
+            samples.setdefault(sample.sha256, sample)
+        if not samples:
+            raise HTTPException(status_code=422, detail="At least one voice sample is required")
+        return await save_voice_clone(db, user_id, voice_name, list(samples.values()))
+
+async def save_voice_clone(db: Database, user_id: str, voice_name: str, samples: List[SpooledFile]):
     try:
         # TODO: Implement ElevenLabs voice cloning
-        # - Save uploaded voice samples
-        # - Send to ElevenLabs API for voice cloning
+        # - Send `samples` to ElevenLabs API for voice cloning (their
+        #   temporary files are deleted after the request)
         # - Store voice clone ID in database
         
         # Create voice clone record
@@ -80,7 +218,10 @@ async def create_voice_clone(
             "is_active": True
         }
         
-        result = supabase.table("voice_clones").insert(voice_clone_data).execute()
+        result = await db.table("voice_clones").insert(voice_clone_data).execute()
+        
+        # has_voice_clone changed; don't serve the cached prompt context
+        user_context_cache.invalidate(user_id)
         
         return result.data[0]
     
@@ -88,22 +229,66 @@ async def create_voice_clone(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def warm_default_voice() -> None:
+    """Synthesize the follow-up suggestions, which are spoken often, in the default voice.
+
+    That is the voice /synthesize speaks in until a clone has its provider
+    voice id. Phrases already in the disk tier aren't synthesized again.
+    """
+    schedule_warmup(chat.suggestion_phrases(), speech.get_synthesizer())
+
 @router.post("/synthesize")
 async def synthesize_speech(
     request: VoiceMessageRequest,
-    user_id: str  # TODO: Get from auth dependency
+    audio_format: Optional[str] = None,
+    user_id: str = Depends(get_current_user_id),
+    db: Database = Depends(get_db)
 ):
-    """Convert text to speech using user's voice clone"""
+    """Convert text to speech using user's voice clone
+
+    Speaks `text` in the user's active voice clone, or in `voice_clone_id`
+    (one of theirs), where the synthesizer supports clones; otherwise in
+    its default voice. The response is the audio, in `audio_format` if the
+    synthesizer can produce it (see X-Audio-Format); X-Audio-Id is its id
+    for GET /audio/{audio_id}. Results are cached by voice, text and
+    format (services/tts_cache.py), so repeated phrases are synthesized
+    once; X-Cache says whether this one was.
+    """
+    text = request.text.strip()
+    if not text:
+        raise HTTPException(status_code=422, detail="text is required")
+    if len(text) > SYNTHESIZE_MAX_CHARS:
+        raise HTTPException(status_code=422, detail=f"text is longer than {SYNTHESIZE_MAX_CHARS} characters")
+    
     try:
-        # TODO: Implement TTS with voice cloning
-        # - Get user's active voice clone
-        # - Send text to ElevenLabs with voice ID
-        # - Return audio file
+        if request.voice_clone_id is not None:
+            clones = await db.table("voice_clones").select("id,elevenlabs_voice_id").eq(
+                "id", request.voice_clone_id
+            ).eq("user_id", user_id).limit(1).execute()
+            if not clones.data:
+                raise HTTPException(status_code=404, detail="Voice clone not found")
+            clone = clones.data[0]
+        else:
+            user_context = await chat.get_user_context(db, user_id)
+            clone = user_context.get("voice_clone")
         
-        return {
-            "message": "Text-to-speech not yet implemented",
-            "audio_url": None
-        }
-    
+        speech_audio = await tts_cache.synthesize(
+            text, speech.get_synthesizer(), chat.clone_voice_id(clone), audio_format
+        )
+    except HTTPException:
+        raise
+    except SpeechError as e:
+        raise HTTPException(status_code=502, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return Response(
+        content=speech_audio.audio,
+        media_type=speech.CONTENT_TYPES.get(speech_audio.audio_format, "application/octet-stream"),
+        headers={
+            "ETag": f'"{speech_audio.audio_id}"',
+            "X-Audio-Id": speech_audio.audio_id,
+            "X-Audio-Format": speech_audio.audio_format,
+            "X-Cache": "hit" if speech_audio.cached else "miss"
+        }
+    )
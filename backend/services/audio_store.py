@@ -0,0 +1,249 @@
+# services/audio_store.py
+"""Content-addressed store for generated audio on local disk.
+
+A file's id is the sha256 of its bytes, so identical audio is stored once
+and the content behind an id never changes; clients and proxies can cache
+it for good. Files live at `root/ab/cd/<id>.<format>`, two directory
+levels from the id's prefix, so no directory grows too large. The total
+size is bounded by `max_bytes`, least recently used files deleted first.
+The index is rebuilt from the directory on first use (oldest files
+counted as least recently used). Workers share the directory but keep
+their own index, so lookups fall back to the disk.
+"""
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import aiofiles
+import aiofiles.os
+
+from config import settings
+
+AUDIO_ID = re.compile(r"[0-9a-f]{64}")
+
+# Buffered bytes per write to disk
+WRITE_CHUNK_SIZE = 64 * 1024
+
+# Partial writes older than this are left over from a crash
+STALE_WRITE_SECONDS = 3600
+
+
+@dataclass
+class StoredAudio:
+    audio_id: str
+    audio_format: str
+    path: str
+    size: int
+
+
+class AudioWriter:
+    """Streams one file into the store; `commit()` names it by its hash"""
+
+    def __init__(self, store: "AudioStore", audio_format: str):
+        self.store = store
+        self.audio_format = audio_format
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._buffer = bytearray()
+        self._handle = None
+        self._path: Optional[str] = None
+
+    async def write(self, chunk: bytes) -> None:
+        self._digest.update(chunk)
+        self.size += len(chunk)
+        self._buffer += chunk
+        if len(self._buffer) >= WRITE_CHUNK_SIZE:
+            await self._flush()
+
+    async def commit(self) -> Optional[StoredAudio]:
+        """Add the file to the store; None if nothing was written"""
+        if not self.size:
+            await self.discard()
+            return None
+        await self._flush()
+        await self._handle.close()
+        self._handle = None
+        path, self._path = self._path, None
+        return await self.store._add(path, self._digest.hexdigest(), self.audio_format, self.size)
+
+    async def discard(self) -> None:
+        if self._handle is not None:
+            await self._handle.close()
+            self._handle = None
+        if self._path is not None:
+            await _remove(self._path)
+            self._path = None
+
+    async def _flush(self) -> None:
+        if self._handle is None:
+            await self.store._ready()
+            fd, self._path = tempfile.mkstemp(prefix="audio-", dir=self.store.tmp_dir)
+            os.close(fd)
+            self._handle = await aiofiles.open(self._path, "wb")
+        if self._buffer:
+            await self._handle.write(self._buffer)
+            self._buffer.clear()
+
+
+class AudioStore:
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.tmp_dir = os.path.join(root, "tmp")
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries: "OrderedDict[str, StoredAudio]" = OrderedDict()
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.deduplicated = 0
+        self.evictions = 0
+
+    def path_for(self, audio_id: str, audio_format: str) -> str:
+        return os.path.join(self.root, audio_id[:2], audio_id[2:4], f"{audio_id}.{audio_format}")
+
+    def writer(self, audio_format: str) -> AudioWriter:
+        return AudioWriter(self, audio_format)
+
+    async def put(self, audio: bytes, audio_format: str) -> Optional[StoredAudio]:
+        writer = self.writer(audio_format)
+        try:
+            await writer.write(audio)
+            return await writer.commit()
+        except BaseException:
+            await writer.discard()
+            raise
+
+    async def get(self, audio_id: str) -> Optional[StoredAudio]:
+        """The stored file, if it is on disk.
+
+        Other workers share the directory, so an id missing from this
+        worker's index is looked up on disk, and an indexed file may have
+        been evicted by another worker.
+        """
+        await self._ready()
+        stored = self._entries.get(audio_id)
+        if stored is not None and not await aiofiles.os.path.isfile(stored.path):
+            self._entries.pop(audio_id)
+            self.bytes -= stored.size
+            stored = None
+        elif stored is None:
+            stored = await asyncio.to_thread(self._find, audio_id)
+            if stored is not None and audio_id not in self._entries:
+                self._entries[audio_id] = stored
+                self.bytes += stored.size
+        if stored is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(audio_id)
+        self.hits += 1
+        return stored
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "files": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "deduplicated": self.deduplicated,
+            "evictions": self.evictions,
+        }
+
+    async def _add(self, tmp_path: str, audio_id: str, audio_format: str, size: int) -> StoredAudio:
+        stored = self._entries.get(audio_id)
+        if stored is not None:
+            await _remove(tmp_path)
+            self._entries.move_to_end(audio_id)
+            self.deduplicated += 1
+            return stored
+
+        path = self.path_for(audio_id, audio_format)
+        await aiofiles.os.makedirs(os.path.dirname(path), exist_ok=True)
+        await aiofiles.os.replace(tmp_path, path)
+        if audio_id in self._entries:
+            # The same audio was committed meanwhile; the rename replaced it with identical bytes
+            self.deduplicated += 1
+            return self._entries[audio_id]
+        stored = self._entries[audio_id] = StoredAudio(audio_id, audio_format, path, size)
+        self.bytes += size
+        self.writes += 1
+
+        # The newest file stays even if it alone is over the limit
+        evicted: List[StoredAudio] = []
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            _, oldest = self._entries.popitem(last=False)
+            self.bytes -= oldest.size
+            self.evictions += 1
+            evicted.append(oldest)
+        for oldest in evicted:
+            await _remove(oldest.path)
+        return stored
+
+    async def _ready(self) -> None:
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if self._loaded:
+                return
+            for stored in await asyncio.to_thread(self._scan):
+                self._entries[stored.audio_id] = stored
+                self.bytes += stored.size
+            self._loaded = True
+
+    def _find(self, audio_id: str) -> Optional[StoredAudio]:
+        """A file written by another worker (any format)"""
+        directory = os.path.dirname(self.path_for(audio_id, ""))
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    name, _, audio_format = entry.name.partition(".")
+                    if name == audio_id and audio_format:
+                        return StoredAudio(audio_id, audio_format, entry.path, entry.stat().st_size)
+        except FileNotFoundError:
+            pass
+        return None
+
+    def _scan(self) -> List[StoredAudio]:
+        """Files already on disk, oldest first; clears out abandoned partial writes"""
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        for name in os.listdir(self.tmp_dir):
+            path = os.path.join(self.tmp_dir, name)
+            # Recent ones may be another worker's writes in progress
+            if time.time() - os.stat(path).st_mtime > STALE_WRITE_SECONDS:
+                os.remove(path)
+        found = []
+        for directory, _, names in os.walk(self.root):
+            if directory == self.tmp_dir:
+                continue
+            for name in names:
+                audio_id, _, audio_format = name.partition(".")
+                if not AUDIO_ID.fullmatch(audio_id) or not audio_format:
+                    continue
+                path = os.path.join(directory, name)
+                stat = os.stat(path)
+                found.append((stat.st_mtime, StoredAudio(audio_id, audio_format, path, stat.st_size)))
+        found.sort(key=lambda item: item[0])
+        return [stored for _, stored in found]
+
+
+async def _remove(path: str) -> None:
+    try:
+        await aiofiles.os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+audio_store = AudioStore(
+    root=settings.AUDIO_STORE_DIR,
+    max_bytes=settings.AUDIO_STORE_MAX_BYTES,
+)
@@ -0,0 +1,276 @@
+# services/chat_connection.py
+"""One chat WebSocket carrying several concurrent streams.
+
+The endpoint's receive loop only reads frames; each request (or resume) is
+handled in its own task, so the socket can accept a cancel or start another
+conversation while a reply is streaming.
+
+Outgoing frames go through a per-connection queue drained by a single
+writer task. The queue is bounded by `max_queue_bytes`. When a client
+reads slowly, chunks still waiting for a stream are merged into one frame,
+and once the queue is full the stream handlers wait for the writer before
+queueing anything else (audio, completions). Only control frames sent
+from the receive loop skip the wait.
+Generation is never slowed down, because handlers read from the replay
+buffer. If the queue stays full (or a single send blocks) for
+`send_timeout` seconds, the socket is closed with 1013 and the client can
+resume from its last sequence.
+"""
+import asyncio
+import json
+import time
+import weakref
+from collections import deque
+from typing import Any, Callable, Coroutine, Deque, Dict, List, Optional, Set, Union
+
+from fastapi import WebSocket
+
+# Rough per-frame overhead of a queued chunk (ids, envelope fields)
+CHUNK_OVERHEAD_BYTES = 64
+
+Frame = Union[bytes, str]
+
+
+class _Outgoing:
+    __slots__ = ("stream_id", "sequence", "parts", "encode", "frame", "size")
+
+    def __init__(
+        self,
+        frame: Optional[Frame] = None,
+        stream_id: Optional[str] = None,
+        sequence: int = 0,
+        parts: Optional[List[str]] = None,
+        encode: Optional[Callable[[str, int], Frame]] = None,
+        size: int = 0,
+    ):
+        self.frame = frame
+        self.stream_id = stream_id
+        self.sequence = sequence
+        self.parts = parts
+        self.encode = encode
+        self.size = size
+
+
+class ConnectionMetrics:
+    """Send-queue counters across this worker's chat sockets"""
+
+    def __init__(self):
+        self._connections: "weakref.WeakSet[ChatConnection]" = weakref.WeakSet()
+        self.frames_sent = 0
+        self.coalesced_chunks = 0
+        self.backpressure_waits = 0
+        self.slow_consumer_disconnects = 0
+        self.peak_queue_depth = 0
+        self.peak_queue_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        connections = list(self._connections)
+        return {
+            "connections": len(connections),
+            "queued_frames": sum(len(c._queue) for c in connections),
+            "queued_bytes": sum(c.queued_bytes for c in connections),
+            "max_queue_depth": max((len(c._queue) for c in connections), default=0),
+            "peak_queue_depth": self.peak_queue_depth,
+            "peak_queue_bytes": self.peak_queue_bytes,
+            "frames_sent": self.frames_sent,
+            "coalesced_chunks": self.coalesced_chunks,
+            "backpressure_waits": self.backpressure_waits,
+            "slow_consumer_disconnects": self.slow_consumer_disconnects,
+        }
+
+
+connection_metrics = ConnectionMetrics()
+
+
+class ChatConnection:
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_streams: int = 4,
+        max_queue_bytes: int = 256 * 1024,
+        send_timeout: float = 10.0,
+    ):
+        self.websocket = websocket
+        self.max_streams = max_streams
+        self.max_queue_bytes = max_queue_bytes
+        self.send_timeout = send_timeout
+        self.closed = False
+        self.queued_bytes = 0
+
+        self._tasks: Set[asyncio.Task] = set()
+        self._queue: Deque[_Outgoing] = deque()
+        # Chunk frame still queued for each stream, which new text merges into
+        self._pending_chunks: Dict[str, _Outgoing] = {}
+        self._ready = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._full_since: Optional[float] = None
+        self._writer: Optional[asyncio.Task] = None
+        connection_metrics._connections.add(self)
+
+    @property
+    def client_state(self):
+        return self.websocket.client_state
+
+    @property
+    def active_streams(self) -> int:
+        return len(self._tasks)
+
+    @property
+    def at_capacity(self) -> bool:
+        return len(self._tasks) >= self.max_streams
+
+    async def send_bytes(self, data: bytes, control: bool = False) -> None:
+        """Queue a frame, waiting while the queue is full.
+
+        `control` frames (small replies sent from the receive loop, which
+        must not block on a slow reader) are queued regardless.
+        """
+        if not control:
+            await self._wait_for_space()
+        self._push(_Outgoing(frame=data, size=len(data)))
+
+    async def send_json(self, data: Any, control: bool = False) -> None:
+        if not control:
+            await self._wait_for_space()
+        # Same encoding as WebSocket.send_json
+        text = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+        self._push(_Outgoing(frame=text, size=len(text)))
+
+    async def send_chunk(self, stream_id: str, sequence: int, text: str, encode: Callable[[str, int], Frame]) -> None:
+        """Queue a stream's text; merges into the stream's queued chunk if there is one.
+
+        `encode(text, sequence)` builds the frame when it is sent, so a merged
+        chunk goes out as one frame carrying the latest sequence.
+        """
+        await self._wait_for_space()
+        if self.closed:
+            return
+
+        pending = self._pending_chunks.get(stream_id)
+        if pending is not None:
+            pending.parts.append(text)
+            pending.sequence = sequence
+            pending.size += len(text)
+            self._grew(len(text))
+            connection_metrics.coalesced_chunks += 1
+            return
+
+        item = _Outgoing(
+            stream_id=stream_id,
+            sequence=sequence,
+            parts=[text],
+            encode=encode,
+            size=CHUNK_OVERHEAD_BYTES + len(text),
+        )
+        self._pending_chunks[stream_id] = item
+        self._push(item)
+
+    def spawn(self, handler: Coroutine) -> asyncio.Task:
+        """Run a request handler alongside the receive loop"""
+        task = asyncio.create_task(handler)
+        self._tasks.add(task)
+        task.add_done_callback(self._finished)
+        return task
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "streams": len(self._tasks),
+            "queued_frames": len(self._queue),
+            "queued_bytes": self.queued_bytes,
+        }
+
+    async def close(self) -> None:
+        """Stop delivering to this socket; generations keep running for resume"""
+        self._shut()
+        tasks = list(self._tasks)
+        if self._writer is not None:
+            tasks.append(self._writer)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _wait_for_space(self) -> None:
+        if self.queued_bytes >= self.max_queue_bytes and not self.closed:
+            connection_metrics.backpressure_waits += 1
+            if self._full_since is None:
+                self._full_since = time.monotonic()
+            while self.queued_bytes >= self.max_queue_bytes and not self.closed:
+                self._drained.clear()
+                await self._drained.wait()
+
+    def _push(self, item: _Outgoing) -> None:
+        if self.closed:
+            return
+        self._queue.append(item)
+        self._grew(item.size)
+        connection_metrics.peak_queue_depth = max(connection_metrics.peak_queue_depth, len(self._queue))
+        self._ready.set()
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write())
+
+    def _grew(self, size: int) -> None:
+        self.queued_bytes += size
+        connection_metrics.peak_queue_bytes = max(connection_metrics.peak_queue_bytes, self.queued_bytes)
+
+    def _shut(self) -> None:
+        self.closed = True
+        self._queue.clear()
+        self._pending_chunks.clear()
+        self.queued_bytes = 0
+        # Release handlers waiting for queue space
+        self._drained.set()
+        connection_metrics._connections.discard(self)
+
+    async def _write(self) -> None:
+        while not self.closed:
+            if not self._queue:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+
+            item = self._queue.popleft()
+            if item.stream_id is not None and self._pending_chunks.get(item.stream_id) is item:
+                del self._pending_chunks[item.stream_id]
+            frame = item.frame if item.frame is not None else item.encode("".join(item.parts), item.sequence)
+
+            try:
+                if isinstance(frame, bytes):
+                    await asyncio.wait_for(self.websocket.send_bytes(frame), self.send_timeout)
+                else:
+                    await asyncio.wait_for(self.websocket.send_text(frame), self.send_timeout)
+            except asyncio.TimeoutError:
+                await self._disconnect_slow_consumer()
+                return
+            except Exception:
+                # Socket already gone; the receive loop will see the disconnect
+                self._shut()
+                return
+            if self.closed:
+                return
+
+            connection_metrics.frames_sent += 1
+            self.queued_bytes -= item.size
+            if self.queued_bytes < self.max_queue_bytes:
+                self._full_since = None
+                self._drained.set()
+            elif self._full_since is not None and time.monotonic() - self._full_since > self.send_timeout:
+                await self._disconnect_slow_consumer()
+                return
+
+    async def _disconnect_slow_consumer(self) -> None:
+        connection_metrics.slow_consumer_disconnects += 1
+        print(f"Closing stalled chat socket with {len(self._queue)} frames ({self.queued_bytes} bytes) queued")
+        self._shut()
+        for task in self._tasks:
+            task.cancel()
+        try:
+            # 1013 (try again later): the client can reconnect and resume its streams
+            await asyncio.wait_for(self.websocket.close(code=1013), 1.0)
+        except Exception:
+            pass
+
+    def _finished(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Chat stream handler error: {task.exception()}")
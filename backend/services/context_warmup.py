@@ -0,0 +1,159 @@
+# services/context_warmup.py
+"""Speculative loading of a chat socket's first-turn context.
+
+Once a socket authenticates, the user's context and the history of the
+conversation they are likely to continue (the one named on connect, or
+their most recent) are loaded in the background while the client is still
+typing. The socket's first turn takes the result instead of querying the
+database, waiting for the load if it hasn't finished. A first turn for a
+different conversation only takes the user context, and doesn't wait for
+a load of the conversation named on connect. Warm-ups time out
+after `timeout` seconds, are skipped once `max_concurrent` are running in
+this worker, and are cancelled when the socket closes. A result older
+than `max_age` seconds (the user context cache TTL) is not used: the
+socket sat idle long enough for it to be out of date.
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from config import settings
+
+
+@dataclass
+class WarmContext:
+    # None if there was no conversation to warm (or it isn't the user's)
+    conversation: Optional[dict]
+    history: List[dict]
+    user_context: dict
+    timings: Dict[str, float]
+    loaded_at: float = field(default_factory=time.monotonic)
+
+
+class WarmupMetrics:
+    """Warm-up counters across this worker's chat sockets"""
+
+    def __init__(self):
+        self.active = 0
+        self.started = 0
+        self.skipped = 0
+        self.timed_out = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.used = 0
+        self.conversation_hits = 0
+        self.unused = 0
+        self.expired = 0
+        self.waited_ms = 0.0
+        self.saved_ms = 0.0
+
+    def record_turn(self, saved_ms: float) -> None:
+        self.saved_ms += max(0.0, saved_ms)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "active": self.active,
+            "started": self.started,
+            "skipped": self.skipped,
+            "timed_out": self.timed_out,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "used": self.used,
+            "conversation_hits": self.conversation_hits,
+            "unused": self.unused,
+            "expired": self.expired,
+            "mean_wait_ms": round(self.waited_ms / self.used, 1) if self.used else 0.0,
+            "mean_saved_ms": round(self.saved_ms / self.used, 1) if self.used else 0.0,
+            "saved_ms": round(self.saved_ms, 1),
+        }
+
+
+warmup_metrics = WarmupMetrics()
+
+
+class ContextWarmup:
+    """One socket's warm-up; its first turn takes the result"""
+
+    def __init__(self, conversation_id: Optional[int] = None, max_age: float = settings.USER_CONTEXT_CACHE_TTL):
+        # Conversation named on connect (None: the user's most recent)
+        self.conversation_id = conversation_id
+        self.max_age = max_age
+        self.task: Optional[asyncio.Task] = None
+        self._taken = False
+
+    @classmethod
+    def start(
+        cls,
+        load: Callable[[], Awaitable[WarmContext]],
+        conversation_id: Optional[int] = None,
+        timeout: float = settings.WS_WARMUP_TIMEOUT,
+        max_concurrent: int = settings.WS_WARMUP_MAX_CONCURRENT,
+        max_age: float = settings.USER_CONTEXT_CACHE_TTL,
+    ) -> Optional["ContextWarmup"]:
+        """Start loading in the background; None if too many warm-ups are running"""
+        if warmup_metrics.active >= max_concurrent:
+            warmup_metrics.skipped += 1
+            return None
+        warmup = cls(conversation_id, max_age)
+        warmup_metrics.active += 1
+        warmup_metrics.started += 1
+        warmup.task = asyncio.create_task(warmup._run(load, timeout))
+        warmup.task.add_done_callback(cls._finished)
+        return warmup
+
+    async def take(self, conversation_id: Optional[int]) -> Optional[WarmContext]:
+        """Hand the warmed context to the socket's first turn (None for later turns)"""
+        if self._taken or self.task is None:
+            return None
+        self._taken = True
+        if not self.task.done() and self.conversation_id and conversation_id != self.conversation_id:
+            # Still loading the wrong conversation; the turn would only wait on it
+            self.cancel()
+            warmup_metrics.unused += 1
+            return None
+
+        started = time.perf_counter()
+        try:
+            warm = await asyncio.shield(self.task)
+        except asyncio.CancelledError:
+            if self.task.cancelled():
+                return None
+            raise
+        if warm is None:
+            return None
+        if time.monotonic() - warm.loaded_at > self.max_age:
+            warmup_metrics.expired += 1
+            return None
+        warmup_metrics.used += 1
+        warmup_metrics.waited_ms += (time.perf_counter() - started) * 1000
+        if warm.conversation is not None and warm.conversation["id"] == conversation_id:
+            warmup_metrics.conversation_hits += 1
+        return warm
+
+    def cancel(self) -> None:
+        if self.task is None:
+            return
+        if not self._taken:
+            self._taken = True
+            warmup_metrics.unused += 1
+        if not self.task.done():
+            self.task.cancel()
+
+    async def _run(self, load: Callable[[], Awaitable[WarmContext]], timeout: float) -> Optional[WarmContext]:
+        try:
+            return await asyncio.wait_for(load(), timeout)
+        except asyncio.TimeoutError:
+            warmup_metrics.timed_out += 1
+            return None
+        except Exception as e:
+            warmup_metrics.failed += 1
+            print(f"Context warm-up failed: {e}")
+            return None
+
+    @staticmethod
+    def _finished(task: asyncio.Task) -> None:
+        # A task cancelled before it started never runs _run, so count here
+        warmup_metrics.active -= 1
+        if task.cancelled():
+            warmup_metrics.cancelled += 1
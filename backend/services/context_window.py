@@ -0,0 +1,195 @@
+# services/context_window.py
+"""Token-budgeted prompt assembly with a rolling conversation summary.
+
+The most recent turns are sent verbatim, newest first, until the budget is
+spent. Turns older than that are folded into `conversations.summary`;
+`conversations.summary_message_count` records how many of the oldest
+messages the summary covers, so each fold only summarizes what's new.
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+
+from config import settings
+
+try:
+    import tiktoken
+except ImportError:  # Token counts fall back to a character estimate
+    tiktoken = None
+
+# Per-message framing tokens added by the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_encoding = None
+_encoding_failed = False
+
+
+def load_encoding() -> None:
+    """Load the tiktoken encoding (may download and parse its BPE file; blocking)"""
+    global _encoding, _encoding_failed
+    if tiktoken is None or _encoding is not None or _encoding_failed:
+        return
+    try:
+        _encoding = tiktoken.encoding_for_model(settings.OPENAI_MODEL)
+    except Exception:
+        try:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            # Encoding files couldn't be loaded (e.g. offline)
+            _encoding_failed = True
+
+
+async def preload_encoding() -> None:
+    """Load the encoding off the event loop (app startup), so no chat turn waits for it"""
+    await asyncio.to_thread(load_encoding)
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens locally (tiktoken when its encoding is available)"""
+    if _encoding is None:
+        # Already loaded at startup in the app; scripts load it here
+        load_encoding()
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def message_tokens(message: dict) -> int:
+    return MESSAGE_OVERHEAD_TOKENS + count_tokens(message.get("content") or "")
+
+
+def to_openai_message(message: dict) -> dict:
+    role = "assistant" if message["role"] == "ai" else "user"
+    return {"role": role, "content": message["content"]}
+
+
+@dataclass
+class ContextWindow:
+    messages: List[dict]
+    prompt_tokens: int
+    # Index into the history of the oldest message sent verbatim
+    first_kept: int
+
+
+def assemble_context(
+    system_prompt: str,
+    history: List[dict],
+    user_message: str,
+    summary: Optional[str] = None,
+    summary_message_count: int = 0,
+    budget: Optional[int] = None,
+) -> ContextWindow:
+    """Build the OpenAI message list within `budget` prompt tokens"""
+    budget = budget or settings.CONTEXT_TOKEN_BUDGET
+
+    head = [{"role": "system", "content": system_prompt}]
+    if summary:
+        head.append({
+            "role": "system",
+            "content": f"Summary of the earlier part of this conversation:\n{summary}"
+        })
+    current = {"role": "user", "content": user_message}
+
+    used = sum(message_tokens(m) for m in head) + message_tokens(current)
+
+    # Walk back from the newest turn; anything already summarized is skipped
+    first_kept = len(history)
+    for i in range(len(history) - 1, summary_message_count - 1, -1):
+        cost = message_tokens(history[i])
+        if used + cost > budget:
+            break
+        used += cost
+        first_kept = i
+
+    recent = [to_openai_message(m) for m in history[first_kept:]]
+    return ContextWindow(messages=head + recent + [current], prompt_tokens=used, first_kept=first_kept)
+
+
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a user and their AI check-in companion.
+Update the existing summary with the new messages. Keep facts about the user's feelings, events, goals,
+challenges and commitments; drop small talk. Write in the third person, at most {max_words} words."""
+
+
+async def default_summarizer(previous_summary: Optional[str], messages: List[dict]) -> str:
+    from services import llm
+
+    transcript = "\n".join(
+        f"{'AI' if m['role'] == 'ai' else 'User'}: {m['content']}" for m in messages
+    )
+    return await llm.complete_chat(
+        [
+            {"role": "system", "content": SUMMARY_PROMPT.format(max_words=settings.SUMMARY_MAX_WORDS)},
+            {"role": "user", "content": f"Existing summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}"},
+        ],
+        max_tokens=settings.SUMMARY_MAX_WORDS * 2,
+        temperature=0.2,
+        model=settings.SUMMARY_MODEL,
+    )
+
+
+async def fold_history(
+    history: List[dict],
+    summary: Optional[str],
+    summary_message_count: int,
+    budget: Optional[int] = None,
+    summarize: Callable[[Optional[str], List[dict]], Awaitable[str]] = default_summarizer,
+) -> Tuple[Optional[str], int]:
+    """Fold turns that no longer fit the budget into the summary.
+
+    Folds down to `SUMMARY_FOLD_RATIO` of the budget so a summary call isn't
+    needed on every turn. Returns the (possibly unchanged) summary state.
+    """
+    budget = budget or settings.CONTEXT_TOKEN_BUDGET
+    target = int(budget * settings.SUMMARY_FOLD_RATIO)
+
+    kept_tokens = 0
+    fold_until = len(history)
+    for i in range(len(history) - 1, summary_message_count - 1, -1):
+        kept_tokens += message_tokens(history[i])
+        if kept_tokens > target:
+            break
+        fold_until = i
+
+    if fold_until <= summary_message_count:
+        return summary, summary_message_count
+
+    new_summary = await summarize(summary, history[summary_message_count:fold_until])
+    return new_summary, fold_until
+
+
+# Conversations with a summary update in flight (per worker)
+_folding: Set[int] = set()
+_tasks: Set[asyncio.Task] = set()
+
+
+def schedule_summary_update(
+    db,
+    conversation_id: int,
+    history: List[dict],
+    window: ContextWindow,
+    summary: Optional[str],
+    summary_message_count: int,
+) -> None:
+    """Fold overflowing turns in the background once a reply has been sent"""
+    if window.first_kept <= summary_message_count or conversation_id in _folding:
+        return
+
+    # Claimed before the task starts, so a second call right after this one skips
+    _folding.add(conversation_id)
+
+    async def run():
+        try:
+            new_summary, new_count = await fold_history(history, summary, summary_message_count)
+            if new_count != summary_message_count:
+                await db.table("conversations").update({
+                    "summary": new_summary,
+                    "summary_message_count": new_count
+                }).eq("id", conversation_id).execute()
+        except Exception as e:
+            print(f"Error updating conversation summary: {e}")
+        finally:
+            _folding.discard(conversation_id)
+
+    task = asyncio.create_task(run())
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
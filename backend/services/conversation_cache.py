@@ -0,0 +1,108 @@
+# services/conversation_cache.py
+"""Write-through, memory-bounded LRU cache of conversation histories.
+
+Histories are loaded once per conversation (on a miss) and then kept
+current by appending every saved message. The cache is per worker process;
+the idle TTL bounds staleness if another worker writes to the same
+conversation.
+"""
+import sys
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from config import settings
+
+# Rough per-row overhead of a message dict (keys, ids, timestamps)
+MESSAGE_OVERHEAD_BYTES = 240
+
+
+def _message_size(message: dict) -> int:
+    return MESSAGE_OVERHEAD_BYTES + sys.getsizeof(message.get("content") or "")
+
+
+class _Entry:
+    __slots__ = ("messages", "size", "touched_at")
+
+    def __init__(self, messages: List[dict]):
+        self.messages = messages
+        self.size = sum(_message_size(m) for m in messages)
+        self.touched_at = time.monotonic()
+
+
+class ConversationCache:
+    def __init__(self, max_bytes: int, ttl: float = 600.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, conversation_id: int) -> Optional[List[dict]]:
+        entry = self._entries.get(conversation_id)
+        if entry is None or time.monotonic() - entry.touched_at > self.ttl:
+            if entry is not None:
+                self._remove(conversation_id)
+            self.misses += 1
+            return None
+        entry.touched_at = time.monotonic()
+        self._entries.move_to_end(conversation_id)
+        self.hits += 1
+        return list(entry.messages)
+
+    def put(self, conversation_id: int, messages: List[dict]) -> None:
+        self._remove(conversation_id)
+        entry = _Entry(list(messages))
+        if entry.size > self.max_bytes:
+            return
+        self._entries[conversation_id] = entry
+        self._bytes += entry.size
+        self._evict()
+
+    def append(self, conversation_id: int, messages: List[dict]) -> None:
+        """Extend a cached history; no-op if the conversation isn't cached"""
+        entry = self._entries.get(conversation_id)
+        if entry is None:
+            return
+        added = sum(_message_size(m) for m in messages)
+        entry.messages.extend(messages)
+        entry.size += added
+        entry.touched_at = time.monotonic()
+        self._bytes += added
+        self._entries.move_to_end(conversation_id)
+        if entry.size > self.max_bytes:
+            self._remove(conversation_id)
+        self._evict()
+
+    def invalidate(self, conversation_id: int) -> None:
+        self._remove(conversation_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "conversations": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _remove(self, conversation_id: int) -> None:
+        entry = self._entries.pop(conversation_id, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            self.evictions += 1
+
+
+conversation_cache = ConversationCache(
+    max_bytes=settings.CONVERSATION_CACHE_MAX_BYTES,
+    ttl=settings.CONVERSATION_CACHE_TTL,
+)
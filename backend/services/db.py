@@ -0,0 +1,268 @@
+# services/db.py
+"""Async Supabase data access over a shared HTTP/2 connection pool.
+
+Every `Database` carries its own credentials (the caller's access token),
+so concurrent requests never mutate shared client state. Query builders
+mirror the supabase-py fluent API: `await db.table("messages").select("*")
+.eq("conversation_id", 1).execute()`.
+"""
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import httpx
+from fastapi import Request
+
+from config import settings
+
+
+class APIError(Exception):
+    """Error returned by PostgREST or Supabase Auth"""
+
+    def __init__(self, status_code: int, message: str, details: Optional[Any] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.details = details
+
+
+@dataclass
+class QueryResult:
+    data: Any
+    count: Optional[int] = None
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """One keep-alive HTTP/2 pool per worker, shared by all requests"""
+    return httpx.AsyncClient(
+        base_url=settings.SUPABASE_URL or "",
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=settings.SUPABASE_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.SUPABASE_MAX_CONNECTIONS,
+            keepalive_expiry=60.0,
+        ),
+        timeout=httpx.Timeout(settings.SUPABASE_TIMEOUT, connect=5.0),
+    )
+
+
+http_client = create_http_client()
+
+
+def _format_value(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _raise_for_status(response: httpx.Response) -> None:
+    if response.status_code < 400:
+        return
+    try:
+        body = response.json()
+    except ValueError:
+        body = {"message": response.text}
+    if isinstance(body, dict):
+        message = body.get("message") or body.get("msg") or body.get("error_description") or body.get("error")
+    else:
+        message = str(body)
+    raise APIError(response.status_code, message or f"HTTP {response.status_code}", body)
+
+
+class QueryBuilder:
+    """Builds a single PostgREST request; call `execute()` to run it"""
+
+    def __init__(self, db: "Database", table: str):
+        self._db = db
+        self._table = table
+        self._method = "GET"
+        self._params: List[Tuple[str, str]] = []
+        self._body: Optional[Union[dict, list]] = None
+        self._prefer: List[str] = []
+
+    # Operations
+
+    def select(self, columns: str = "*", count: Optional[str] = None) -> "QueryBuilder":
+        self._params.append(("select", columns))
+        if count:
+            self._prefer.append(f"count={count}")
+        return self
+
+    def insert(
+        self,
+        rows: Union[dict, List[dict]],
+        returning: bool = True,
+        on_conflict: Optional[str] = None,
+        ignore_duplicates: bool = False,
+    ) -> "QueryBuilder":
+        """`ignore_duplicates` skips rows whose `on_conflict` column(s) already exist"""
+        self._method = "POST"
+        self._body = rows
+        self._prefer.append("return=representation" if returning else "return=minimal")
+        if on_conflict:
+            self._params.append(("on_conflict", on_conflict))
+        if ignore_duplicates:
+            self._prefer.append("resolution=ignore-duplicates")
+        return self
+
+    def update(self, values: dict) -> "QueryBuilder":
+        self._method = "PATCH"
+        self._body = values
+        self._prefer.append("return=representation")
+        return self
+
+    def delete(self) -> "QueryBuilder":
+        self._method = "DELETE"
+        self._prefer.append("return=representation")
+        return self
+
+    # Filters
+
+    def _filter(self, column: str, operator: str, value: Any) -> "QueryBuilder":
+        self._params.append((column, f"{operator}.{_format_value(value)}"))
+        return self
+
+    def eq(self, column: str, value: Any) -> "QueryBuilder":
+        return self._filter(column, "eq", value)
+
+    def neq(self, column: str, value: Any) -> "QueryBuilder":
+        return self._filter(column, "neq", value)
+
+    def gt(self, column: str, value: Any) -> "QueryBuilder":
+        return self._filter(column, "gt", value)
+
+    def gte(self, column: str, value: Any) -> "QueryBuilder":
+        return self._filter(column, "gte", value)
+
+    def lt(self, column: str, value: Any) -> "QueryBuilder":
+        return self._filter(column, "lt", value)
+
+    def lte(self, column: str, value: Any) -> "QueryBuilder":
+        return self._filter(column, "lte", value)
+
+    def is_(self, column: str, value: Any) -> "QueryBuilder":
+        return self._filter(column, "is", value)
+
+    def in_(self, column: str, values: List[Any]) -> "QueryBuilder":
+        joined = ",".join(_format_value(v) for v in values)
+        self._params.append((column, f"in.({joined})"))
+        return self
+
+    def or_(self, expression: str) -> "QueryBuilder":
+        """Raw PostgREST `or` filter, e.g. `created_at.lt.X,id.lt.5`"""
+        self._params.append(("or", f"({expression})"))
+        return self
+
+    # Modifiers
+
+    def order(self, column: str, desc: bool = False) -> "QueryBuilder":
+        direction = "desc" if desc else "asc"
+        for i, (key, value) in enumerate(self._params):
+            if key == "order":
+                self._params[i] = ("order", f"{value},{column}.{direction}")
+                return self
+        self._params.append(("order", f"{column}.{direction}"))
+        return self
+
+    def limit(self, count: int) -> "QueryBuilder":
+        self._params.append(("limit", str(count)))
+        return self
+
+    async def execute(self) -> QueryResult:
+        headers = self._db.headers()
+        if self._prefer:
+            headers["Prefer"] = ",".join(self._prefer)
+        response = await http_client.request(
+            self._method,
+            f"/rest/v1/{self._table}",
+            params=self._params,
+            content=json.dumps(self._body) if self._body is not None else None,
+            headers=headers,
+        )
+        _raise_for_status(response)
+        return QueryResult(
+            data=response.json() if response.content else [],
+            count=_parse_count(response.headers.get("content-range")),
+        )
+
+
+def _parse_count(content_range: Optional[str]) -> Optional[int]:
+    # Content-Range: 0-24/3573 (or */3573 when no rows were returned)
+    if not content_range or "/" not in content_range:
+        return None
+    total = content_range.rsplit("/", 1)[1]
+    return int(total) if total.isdigit() else None
+
+
+class AuthAPI:
+    """Thin async wrapper around the Supabase Auth (GoTrue) REST API"""
+
+    def __init__(self, db: "Database"):
+        self._db = db
+
+    async def _request(self, method: str, path: str, token: Optional[str] = None, **kwargs) -> dict:
+        headers = self._db.headers()
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        response = await http_client.request(method, f"/auth/v1/{path}", headers=headers, **kwargs)
+        _raise_for_status(response)
+        return response.json() if response.content else {}
+
+    async def sign_up(self, email: str, password: str) -> dict:
+        return await self._request("POST", "signup", json={"email": email, "password": password})
+
+    async def sign_in_with_password(self, email: str, password: str) -> dict:
+        return await self._request(
+            "POST", "token", params={"grant_type": "password"},
+            json={"email": email, "password": password},
+        )
+
+    async def refresh_session(self, refresh_token: str) -> dict:
+        return await self._request(
+            "POST", "token", params={"grant_type": "refresh_token"},
+            json={"refresh_token": refresh_token},
+        )
+
+    async def get_user(self, access_token: str) -> dict:
+        return await self._request("GET", "user", token=access_token)
+
+    async def sign_out(self, access_token: str) -> None:
+        await self._request("POST", "logout", token=access_token)
+
+
+class Database:
+    """Request-scoped handle: shared connection pool, private credentials"""
+
+    def __init__(self, access_token: Optional[str] = None):
+        self.access_token = access_token
+        self.auth = AuthAPI(self)
+
+    def headers(self) -> Dict[str, str]:
+        return {
+            "apikey": settings.SUPABASE_KEY or "",
+            "Authorization": f"Bearer {self.access_token or settings.SUPABASE_KEY}",
+            "Content-Type": "application/json",
+        }
+
+    def table(self, name: str) -> QueryBuilder:
+        return QueryBuilder(self, name)
+
+    async def rpc(self, function: str, params: Optional[dict] = None) -> QueryResult:
+        response = await http_client.post(
+            f"/rest/v1/rpc/{function}",
+            content=json.dumps(params or {}),
+            headers=self.headers(),
+        )
+        _raise_for_status(response)
+        return QueryResult(data=response.json() if response.content else None)
+
+
+def get_db(request: Request) -> Database:
+    """Dependency: database handle scoped to the caller's credentials"""
+    return Database(getattr(request.state, "access_token", None))
+
+
+async def close() -> None:
+    await http_client.aclose()
@@ -0,0 +1,168 @@
+# services/idempotency.py
+"""Idempotency keys for chat requests.
+
+Clients that time out resend a message with the same idempotency key. The
+first request with a key does the work. A duplicate that arrives while it
+is still running waits for the same result (for streamed replies, the same
+replay stream), and one that arrives after it finished gets the stored
+result, so a retry never starts a second generation or saves the messages
+twice. Keys are scoped to the user and the kind of request, and bound to
+the request they were first used with: reusing a key for a different
+message is rejected. A request that fails releases its key, so its retry
+runs again. Finished keys are kept for `ttl` seconds, and at most
+`max_keys` are held (oldest dropped first), so results should be small:
+streamed replies store only their stream id.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from config import settings
+
+T = TypeVar("T")
+
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyConflict(Exception):
+    """The key was already used for a different request"""
+
+
+class InvalidIdempotencyKey(ValueError):
+    pass
+
+
+def request_fingerprint(*parts: Any) -> str:
+    """Hash of the request fields a key is bound to"""
+    return hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "result", "finished_at")
+
+    def __init__(self, fingerprint: str, result: asyncio.Future):
+        self.fingerprint = fingerprint
+        self.result = result
+        self.finished_at: Optional[float] = None
+
+
+class IdempotencyStore:
+    def __init__(self, max_keys: int, ttl: float = 600.0):
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str, str], _Entry]" = OrderedDict()
+
+        self.started = 0
+        self.joined = 0
+        self.replayed = 0
+        self.conflicts = 0
+        self.expired = 0
+        self.evicted = 0
+
+    async def run(
+        self,
+        scope: str,
+        user_id: str,
+        key: str,
+        fingerprint: str,
+        start: Callable[[], Awaitable[T]],
+        reusable: Optional[Callable[[T], bool]] = None,
+    ) -> T:
+        """Return `start()`'s result, running it at most once per key.
+
+        `reusable(result)` can reject a stored result (e.g. a stream that
+        ended in an error), in which case `start()` runs again.
+        """
+        if len(key) > MAX_KEY_LENGTH:
+            raise InvalidIdempotencyKey(f"Idempotency key longer than {MAX_KEY_LENGTH} characters")
+        ident = (scope, user_id, key)
+
+        while True:
+            self._expire()
+            entry = self._entries.get(ident)
+            if entry is None:
+                break
+            if entry.fingerprint != fingerprint:
+                self.conflicts += 1
+                raise IdempotencyConflict("Idempotency key was already used for a different request")
+
+            if not entry.result.done():
+                self.joined += 1
+                try:
+                    return await asyncio.shield(entry.result)
+                except asyncio.CancelledError:
+                    if entry.result.cancelled():
+                        # The first request was abandoned; take over
+                        continue
+                    raise
+
+            result = entry.result.result()
+            if reusable is None or reusable(result):
+                self.replayed += 1
+                return result
+            del self._entries[ident]
+            break
+
+        entry = _Entry(fingerprint, asyncio.get_running_loop().create_future())
+        self._entries[ident] = entry
+        self.started += 1
+        self._evict()
+        try:
+            result = await start()
+        except BaseException as e:
+            # Release the key so the client's retry runs again
+            if self._entries.get(ident) is entry:
+                del self._entries[ident]
+            if isinstance(e, Exception):
+                entry.result.set_exception(e)
+                # Waiters re-raise it; don't log it as unretrieved
+                entry.result.exception()
+            else:
+                entry.result.cancel()
+            raise
+        entry.result.set_result(result)
+        entry.finished_at = time.monotonic()
+        if self._entries.get(ident) is entry:
+            # Finished keys stay in finishing order, so expiry stops at the first live one
+            self._entries.move_to_end(ident)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "keys": len(self._entries),
+            "in_flight": sum(1 for e in self._entries.values() if e.finished_at is None),
+            "max_keys": self.max_keys,
+            "started": self.started,
+            "joined": self.joined,
+            "replayed": self.replayed,
+            "conflicts": self.conflicts,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        expired = []
+        for ident, entry in self._entries.items():
+            if entry.finished_at is None:
+                continue
+            if now - entry.finished_at <= self.ttl:
+                break
+            expired.append(ident)
+        for ident in expired:
+            del self._entries[ident]
+        self.expired += len(expired)
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+            self.evicted += 1
+
+
+idempotency_store = IdempotencyStore(
+    max_keys=settings.IDEMPOTENCY_MAX_KEYS,
+    ttl=settings.IDEMPOTENCY_TTL,
+)
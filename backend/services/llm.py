@@ -0,0 +1,80 @@
+# services/llm.py
+from typing import AsyncIterator, List, Optional
+import httpx
+import openai
+from config import settings
+
+
+def create_client(
+    base_url: Optional[str] = None,
+    api_key: Optional[str] = None,
+    max_connections: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> openai.AsyncOpenAI:
+    """Create an async OpenAI client backed by a shared, bounded connection pool"""
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=max_connections or settings.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=30.0,
+        ),
+        timeout=httpx.Timeout(
+            timeout or settings.OPENAI_TIMEOUT,
+            connect=settings.OPENAI_CONNECT_TIMEOUT,
+        ),
+    )
+    return openai.AsyncOpenAI(
+        api_key=api_key or settings.OPENAI_API_KEY,
+        base_url=base_url or settings.OPENAI_BASE_URL,
+        http_client=http_client,
+    )
+
+
+# One client (and connection pool) per worker process
+client = create_client()
+
+
+async def complete_chat(
+    messages: List[dict],
+    max_tokens: int = 500,
+    temperature: float = 0.7,
+    llm_client: Optional[openai.AsyncOpenAI] = None,
+    model: Optional[str] = None,
+) -> str:
+    """Run a non-streaming chat completion and return the reply text"""
+    response = await (llm_client or client).chat.completions.create(
+        model=model or settings.OPENAI_MODEL,
+        messages=messages,
+        max_tokens=max_tokens,
+        temperature=temperature,
+    )
+    return response.choices[0].message.content or ""
+
+
+async def stream_chat(
+    messages: List[dict],
+    max_tokens: int = 500,
+    temperature: float = 0.7,
+    llm_client: Optional[openai.AsyncOpenAI] = None,
+) -> AsyncIterator[str]:
+    """Stream a chat completion, yielding text deltas as they arrive.
+
+    The upstream HTTP response is closed as soon as the caller stops iterating
+    (including on cancellation), so abandoned streams don't hold a connection.
+    """
+    stream = await (llm_client or client).chat.completions.create(
+        model=settings.OPENAI_MODEL,
+        messages=messages,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        stream=True,
+    )
+    async with stream:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+async def close() -> None:
+    """Close the shared client and its connection pool"""
+    await client.close()
@@ -0,0 +1,231 @@
+# services/message_writer.py
+"""Write-behind persistence for chat messages.
+
+`save_messages` enqueues rows and returns immediately; a single background
+consumer batches them (across conversations) into bulk inserts, flushing
+when a batch is full or the flush interval elapses. Because there is one
+consumer and failed batches are retried in place, rows for a conversation
+are written in the order they were enqueued.
+
+Each row carries a generated `client_id` (unique in the table), and
+inserts skip ids that already exist, so retrying a batch whose insert went
+through before the connection failed doesn't duplicate it. Callers that
+answer the client with the saved reply `wait_written` first, so a client
+that refetches the conversation right away sees it.
+"""
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from config import settings
+from services.db import APIError, Database
+from services.conversation_cache import conversation_cache
+
+
+@dataclass
+class _PendingWrite:
+    conversation_id: int
+    rows: List[dict]
+    access_token: Optional[str]
+    # True once written, False if dropped
+    written: asyncio.Future = field(default_factory=lambda: asyncio.get_running_loop().create_future())
+
+    def resolve(self, written: bool) -> None:
+        if not self.written.done():
+            self.written.set_result(written)
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, APIError):
+        return error.status_code >= 500 or error.status_code == 429
+    return isinstance(error, httpx.TransportError)
+
+
+class MessageWriter:
+    def __init__(
+        self,
+        batch_size: int = 200,
+        flush_interval: float = 0.05,
+        max_pending: int = 10000,
+        max_retries: int = 5,
+        retry_backoff: float = 0.2,
+        service_key: Optional[str] = None,
+        on_failure: Optional[Callable[[int], None]] = None,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        # With the service role key every batch is one insert across users;
+        # otherwise rows are inserted with the credentials they arrived with.
+        self.service_key = service_key
+        self.max_pending = max_pending
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Each conversation's most recently queued write; earlier ones finish before it
+        self._last_write: Dict[int, _PendingWrite] = {}
+        # Called with the conversation id of rows that could not be written
+        self.on_failure = on_failure
+
+        self.enqueued_rows = 0
+        self.written_rows = 0
+        self.failed_rows = 0
+        self.batches = 0
+        self.retries = 0
+        self.last_flush_ms = 0.0
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            if self._queue is None:
+                self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._task = asyncio.create_task(self._run())
+
+    async def enqueue(self, db: Database, conversation_id: int, messages: List[dict]) -> List[dict]:
+        """Queue messages for insertion; returns the rows as they will be written"""
+        self.start()
+        now = datetime.now(timezone.utc).isoformat()
+        rows = [{
+            "conversation_id": conversation_id,
+            "role": msg["role"],
+            "content": msg["content"],
+            "client_id": str(uuid.uuid4()),
+            # Stamped now so ordering reflects the conversation, not flush time
+            "created_at": now
+        } for msg in messages]
+        # Only waits if max_pending writes are already queued
+        pending = _PendingWrite(conversation_id, rows, db.access_token)
+        await self._queue.put(pending)
+        self._last_write[conversation_id] = pending
+        pending.written.add_done_callback(lambda _: self._written(pending))
+        self.enqueued_rows += len(rows)
+        return rows
+
+    async def wait_written(self, conversation_id: int, timeout: float = 10.0) -> bool:
+        """Wait until everything queued for the conversation is written; False if some was dropped or it timed out"""
+        pending = self._last_write.get(conversation_id)
+        if pending is None:
+            return True
+        try:
+            async with asyncio.timeout(timeout):
+                return await asyncio.shield(pending.written)
+        except TimeoutError:
+            print(f"Timed out waiting for conversation {conversation_id}'s messages to be written")
+            return False
+
+    def _written(self, pending: _PendingWrite) -> None:
+        if self._last_write.get(pending.conversation_id) is pending:
+            del self._last_write[pending.conversation_id]
+
+    async def drain(self, timeout: float = 10.0) -> None:
+        """Flush everything queued, then stop the consumer (app shutdown)"""
+        if self._queue is not None and self._task is not None and not self._task.done():
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                print(f"Message writer drain timed out with {self._queue.qsize()} writes pending")
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "enqueued_rows": self.enqueued_rows,
+            "written_rows": self.written_rows,
+            "failed_rows": self.failed_rows,
+            "pending_rows": self.enqueued_rows - self.written_rows - self.failed_rows,
+            "batches": self.batches,
+            "retries": self.retries,
+            "last_flush_ms": round(self.last_flush_ms, 1),
+        }
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            rows = len(batch[0].rows)
+            deadline = loop.time() + self.flush_interval
+            while rows < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                rows += len(item.rows)
+            try:
+                await self._flush(batch)
+            finally:
+                for item in batch:
+                    # Not written by now means not written at all
+                    item.resolve(False)
+                    self._queue.task_done()
+
+    async def _flush(self, batch: List[_PendingWrite]) -> None:
+        started = time.perf_counter()
+        # Consecutive writes with the same credentials become one insert
+        groups: List[List[_PendingWrite]] = []
+        for item in batch:
+            token = self.service_key or item.access_token
+            if groups and (self.service_key or groups[-1][0].access_token) == token:
+                groups[-1].append(item)
+            else:
+                groups.append([item])
+
+        for group in groups:
+            token = self.service_key or group[0].access_token
+            if not await self._insert(token, group) and len(group) > 1:
+                # A bad row fails the whole bulk insert; isolate it
+                for item in group:
+                    await self._insert(token, [item], retries=0)
+        self.batches += 1
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+
+    async def _insert(self, token: Optional[str], items: List[_PendingWrite], retries: Optional[int] = None) -> bool:
+        rows = [row for item in items for row in item.rows]
+        max_retries = self.max_retries if retries is None else retries
+        attempt = 0
+        while True:
+            try:
+                await Database(token).table("messages").insert(
+                    rows, returning=False, on_conflict="client_id", ignore_duplicates=True
+                ).execute()
+                self.written_rows += len(rows)
+                for item in items:
+                    item.resolve(True)
+                return True
+            except Exception as e:
+                if attempt >= max_retries or not _is_retryable(e):
+                    if len(items) == 1 or retries == 0:
+                        print(f"Dropping {len(rows)} messages after failed insert: {e}")
+                        self.failed_rows += len(rows)
+                        for item in items:
+                            item.resolve(False)
+                            if self.on_failure:
+                                self.on_failure(item.conversation_id)
+                    return False
+                attempt += 1
+                self.retries += 1
+                await asyncio.sleep(self.retry_backoff * 2 ** (attempt - 1))
+
+
+message_writer = MessageWriter(
+    batch_size=settings.MESSAGE_WRITE_BATCH_SIZE,
+    flush_interval=settings.MESSAGE_WRITE_FLUSH_MS / 1000,
+    max_pending=settings.MESSAGE_WRITE_MAX_PENDING,
+    service_key=settings.SUPABASE_SERVICE_ROLE_KEY,
+    # Cached histories must not keep rows the database never got
+    on_failure=conversation_cache.invalidate,
+)
@@ -0,0 +1,39 @@
+# services/pagination.py
+"""Opaque keyset cursors over (sort value, id) pairs."""
+import base64
+import json
+from typing import Any, Tuple
+
+
+def encode_cursor(sort_value: Any, row_id: int) -> str:
+    raw = json.dumps([sort_value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    """Inverse of encode_cursor; raises ValueError for malformed cursors"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return sort_value, int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def keyset_filter(column: str, sort_value: Any, row_id: int, operator: str) -> str:
+    """PostgREST `or` expression for rows strictly before/after a cursor.
+
+    `operator` is "lt" (older) or "gt" (newer); ties on `column` are broken by id.
+    """
+    value = json.dumps(sort_value)  # double-quoted, safe for reserved characters
+    return f"{column}.{operator}.{value},and({column}.eq.{value},id.{operator}.{row_id})"
+
+
+def apply_keyset(query, column: str, sort_value: Any, row_id: int, operator: str):
+    """Restrict a query to rows before/after a cursor.
+
+    The inclusive bound duplicates part of the `or` filter but gives Postgres
+    an index condition, so deep pages seek instead of scanning from the top.
+    """
+    bound = query.lte if operator == "lt" else query.gte
+    return bound(column, sort_value).or_(keyset_filter(column, sort_value, row_id, operator))
@@ -0,0 +1,255 @@
+# services/speech.py
+"""Pluggable speech-to-text and text-to-speech providers.
+
+`get_transcriber()` and `get_synthesizer()` return the providers selected
+by STT_PROVIDER and TTS_PROVIDER:
+
+- "openai": Whisper transcription and OpenAI speech over the pooled client
+  in services/llm.py.
+- "elevenlabs": streaming ElevenLabs synthesis, which can speak in the
+  user's cloned voice (TTS only).
+- "local": offline stand-ins with simulated latency, for development and
+  benchmarks. The local transcriber returns a fixed phrase; the local
+  synthesizer streams a tone whose length follows the text.
+
+Audio formats are named "mp3", "opus", "pcm_16000" and "pcm_24000" (raw
+signed 16-bit little-endian mono at that sample rate). Transcribers also
+take "wav", "webm", "ogg", "flac" and "m4a" input.
+"""
+import asyncio
+import math
+import struct
+from typing import AsyncIterator, Optional, Tuple
+
+import aiofiles
+import httpx
+
+from config import settings
+from services import llm
+
+MP3 = "mp3"
+OPUS = "opus"
+PCM_16000 = "pcm_16000"
+PCM_24000 = "pcm_24000"
+WAV = "wav"
+WEBM = "webm"
+OGG = "ogg"
+FLAC = "flac"
+M4A = "m4a"
+
+SAMPLE_RATES = {PCM_16000: 16000, PCM_24000: 24000}
+
+# Content types for formats served over HTTP
+CONTENT_TYPES = {
+    MP3: "audio/mpeg",
+    OPUS: "audio/ogg",
+    PCM_16000: "audio/L16;rate=16000;channels=1",
+    PCM_24000: "audio/L16;rate=24000;channels=1",
+}
+
+
+class SpeechError(Exception):
+    """A provider failed or doesn't support the request"""
+
+
+class Transcriber:
+    name = "base"
+
+    async def transcribe(self, audio: bytes, audio_format: str) -> str:
+        raise NotImplementedError
+
+    async def transcribe_file(self, path: str, audio_format: str) -> str:
+        async with aiofiles.open(path, "rb") as f:
+            audio = await f.read()
+        return await self.transcribe(audio, audio_format)
+
+
+class Synthesizer:
+    name = "base"
+    # Formats `synthesize` can produce, preferred first
+    formats: Tuple[str, ...] = ()
+    # Whether `voice_id` can be a cloned voice
+    supports_clones = False
+
+    def pick_format(self, preferred: Optional[str] = None) -> str:
+        return preferred if preferred in self.formats else self.formats[0]
+
+    def synthesize(self, text: str, voice_id: Optional[str] = None, audio_format: Optional[str] = None) -> AsyncIterator[bytes]:
+        """Stream the audio for `text` as it is produced"""
+        raise NotImplementedError
+
+
+class OpenAITranscriber(Transcriber):
+    name = "openai"
+
+    async def transcribe(self, audio: bytes, audio_format: str) -> str:
+        if audio_format in SAMPLE_RATES:
+            # Whisper doesn't take headerless PCM
+            audio, audio_format = wav(audio, SAMPLE_RATES[audio_format]), WAV
+        result = await llm.client.audio.transcriptions.create(
+            model=settings.STT_MODEL,
+            file=(f"audio.{audio_format}", audio),
+        )
+        return result.text.strip()
+
+
+class OpenAISynthesizer(Synthesizer):
+    name = "openai"
+    formats = (MP3, OPUS, PCM_24000)
+    _response_formats = {MP3: "mp3", OPUS: "opus", PCM_24000: "pcm"}
+
+    async def synthesize(self, text: str, voice_id: Optional[str] = None, audio_format: Optional[str] = None) -> AsyncIterator[bytes]:
+        audio_format = self.pick_format(audio_format)
+        async with llm.client.audio.speech.with_streaming_response.create(
+            model=settings.TTS_MODEL,
+            voice=voice_id or settings.TTS_VOICE,
+            input=text,
+            response_format=self._response_formats[audio_format],
+        ) as response:
+            async for chunk in response.iter_bytes():
+                yield chunk
+
+
+class ElevenLabsSynthesizer(Synthesizer):
+    name = "elevenlabs"
+    formats = (MP3, PCM_16000, PCM_24000)
+    supports_clones = True
+    _output_formats = {MP3: "mp3_44100_128", PCM_16000: "pcm_16000", PCM_24000: "pcm_24000"}
+
+    def __init__(self):
+        self.http = httpx.AsyncClient(
+            base_url=settings.ELEVENLABS_BASE_URL,
+            headers={"xi-api-key": settings.ELEVENLABS_API_KEY or ""},
+            timeout=httpx.Timeout(settings.OPENAI_TIMEOUT, connect=settings.OPENAI_CONNECT_TIMEOUT),
+        )
+
+    async def synthesize(self, text: str, voice_id: Optional[str] = None, audio_format: Optional[str] = None) -> AsyncIterator[bytes]:
+        voice_id = voice_id or settings.ELEVENLABS_DEFAULT_VOICE_ID
+        if not voice_id:
+            raise SpeechError("No ElevenLabs voice configured")
+        async with self.http.stream(
+            "POST",
+            f"/v1/text-to-speech/{voice_id}/stream",
+            params={"output_format": self._output_formats[self.pick_format(audio_format)]},
+            json={"text": text, "model_id": settings.ELEVENLABS_MODEL},
+        ) as response:
+            if response.status_code >= 400:
+                await response.aread()
+                raise SpeechError(f"ElevenLabs error {response.status_code}: {response.text}")
+            async for chunk in response.aiter_bytes():
+                yield chunk
+
+
+class LocalTranscriber(Transcriber):
+    """Takes `latency` plus `realtime_factor` of the audio's duration (counted as 16kHz PCM)"""
+
+    name = "local"
+
+    def __init__(self, text: str = "How was my day today?", latency: float = 0.3, realtime_factor: float = 0.1):
+        self.text = text
+        self.latency = latency
+        self.realtime_factor = realtime_factor
+
+    async def transcribe(self, audio: bytes, audio_format: str) -> str:
+        await asyncio.sleep(self.latency + len(audio) / 32000 * self.realtime_factor)
+        return self.text
+
+
+class LocalSynthesizer(Synthesizer):
+    """Streams a 16kHz tone, about `ms_per_char` of audio per character of text"""
+
+    name = "local"
+    formats = (PCM_16000,)
+    supports_clones = True
+
+    SAMPLE_RATE = 16000
+    CHUNK_MS = 100
+
+    def __init__(self, first_byte_latency: float = 0.15, ms_per_char: float = 60.0, realtime_factor: float = 0.1):
+        self.first_byte_latency = first_byte_latency
+        self.ms_per_char = ms_per_char
+        # Synthesis time as a fraction of the audio's duration
+        self.realtime_factor = realtime_factor
+
+    async def synthesize(self, text: str, voice_id: Optional[str] = None, audio_format: Optional[str] = None) -> AsyncIterator[bytes]:
+        await asyncio.sleep(self.first_byte_latency)
+        samples_per_chunk = self.SAMPLE_RATE * self.CHUNK_MS // 1000
+        total_chunks = max(1, math.ceil(len(text) * self.ms_per_char / self.CHUNK_MS))
+        chunk = tone(440.0, samples_per_chunk, self.SAMPLE_RATE)
+        for index in range(total_chunks):
+            if index:
+                await asyncio.sleep(self.CHUNK_MS / 1000 * self.realtime_factor)
+            yield chunk
+
+
+def tone(frequency: float, samples: int, sample_rate: int = 16000, amplitude: int = 8000) -> bytes:
+    """PCM16 sine wave"""
+    return struct.pack(
+        f"<{samples}h",
+        *(int(amplitude * math.sin(2 * math.pi * frequency * i / sample_rate)) for i in range(samples)),
+    )
+
+
+def sniff_format(head: bytes) -> Optional[str]:
+    """Audio container of a file from its first 12 bytes, if recognized"""
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return WAV
+    if head[:3] == b"ID3" or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return MP3
+    if head[:4] == b"OggS":
+        return OGG
+    if head[:4] == b"fLaC":
+        return FLAC
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return WEBM
+    if head[4:8] == b"ftyp":
+        return M4A
+    return None
+
+
+def wav(pcm: bytes, sample_rate: int = 16000) -> bytes:
+    """Wrap PCM16 mono audio in a WAV header"""
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + len(pcm), b"WAVE",
+        b"fmt ", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16,
+        b"data", len(pcm),
+    ) + pcm
+
+
+_transcriber: Optional[Transcriber] = None
+_synthesizer: Optional[Synthesizer] = None
+
+
+def get_transcriber() -> Transcriber:
+    global _transcriber
+    if _transcriber is None:
+        providers = {"openai": OpenAITranscriber, "local": LocalTranscriber}
+        if settings.STT_PROVIDER not in providers:
+            raise SpeechError(f"Unknown STT_PROVIDER: {settings.STT_PROVIDER}")
+        _transcriber = providers[settings.STT_PROVIDER]()
+    return _transcriber
+
+
+def get_synthesizer() -> Synthesizer:
+    global _synthesizer
+    if _synthesizer is None:
+        providers = {"openai": OpenAISynthesizer, "elevenlabs": ElevenLabsSynthesizer, "local": LocalSynthesizer}
+        if settings.TTS_PROVIDER not in providers:
+            raise SpeechError(f"Unknown TTS_PROVIDER: {settings.TTS_PROVIDER}")
+        _synthesizer = providers[settings.TTS_PROVIDER]()
+    return _synthesizer
+
+
+def set_providers(transcriber: Optional[Transcriber] = None, synthesizer: Optional[Synthesizer] = None) -> None:
+    """Swap in providers (benchmarks, local development)"""
+    global _transcriber, _synthesizer
+    if transcriber is not None:
+        _transcriber = transcriber
+    if synthesizer is not None:
+        _synthesizer = synthesizer
+
+
+async def close() -> None:
+    if isinstance(_synthesizer, ElevenLabsSynthesizer):
+        await _synthesizer.http.aclose()
@@ -0,0 +1,105 @@
+# services/stream_coalescer.py
+"""Coalesce LLM token deltas into fewer, larger socket frames.
+
+The first delta is forwarded immediately so time-to-first-token doesn't
+regress. After that, deltas are buffered until `max_bytes` of text is
+pending or `max_delay_ms` has passed since the oldest buffered delta,
+whichever comes first.
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+from config import settings
+
+MAX_COALESCE_BYTES = 4096
+MAX_COALESCE_MS = 500.0
+
+_DONE = object()
+
+
+@dataclass
+class CoalesceConfig:
+    max_bytes: int = 48
+    max_delay_ms: float = 30.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self.max_delay_ms > 0
+
+    @classmethod
+    def from_params(cls, max_bytes: Optional[int] = None, max_delay_ms: Optional[float] = None) -> "CoalesceConfig":
+        """Per-connection settings from client-supplied values, clamped to sane bounds"""
+        if max_bytes is None:
+            max_bytes = settings.STREAM_COALESCE_BYTES
+        if max_delay_ms is None:
+            max_delay_ms = settings.STREAM_COALESCE_MS
+        return cls(
+            max_bytes=min(max(int(max_bytes), 0), MAX_COALESCE_BYTES),
+            max_delay_ms=min(max(float(max_delay_ms), 0.0), MAX_COALESCE_MS),
+        )
+
+
+async def coalesce(deltas: AsyncIterator[str], config: CoalesceConfig) -> AsyncIterator[str]:
+    """Yield coalesced text from an async iterator of deltas"""
+    if not config.enabled:
+        async for delta in deltas:
+            yield delta
+        return
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump():
+        try:
+            async for delta in deltas:
+                queue.put_nowait(delta)
+            queue.put_nowait(_DONE)
+        except Exception as e:
+            queue.put_nowait(e)
+
+    # Reading upstream in its own task lets us flush on a deadline even when
+    # the model pauses between tokens
+    pump_task = asyncio.create_task(pump())
+    buffer = []
+    buffered_bytes = 0
+    deadline = 0.0
+    first = True
+
+    try:
+        while True:
+            if buffer:
+                # Not wait_for: on 3.11 it can swallow a cancel that lands as get() finishes
+                try:
+                    async with asyncio.timeout_at(deadline):
+                        item = await queue.get()
+                except TimeoutError:
+                    yield "".join(buffer)
+                    buffer, buffered_bytes = [], 0
+                    continue
+            else:
+                item = await queue.get()
+
+            if item is _DONE:
+                if buffer:
+                    yield "".join(buffer)
+                return
+            if isinstance(item, Exception):
+                raise item
+
+            if first:
+                first = False
+                yield item
+                continue
+
+            if not buffer:
+                deadline = loop.time() + config.max_delay_ms / 1000
+            buffer.append(item)
+            buffered_bytes += len(item.encode())
+            if buffered_bytes >= config.max_bytes:
+                yield "".join(buffer)
+                buffer, buffered_bytes = [], 0
+    finally:
+        # Stops (and closes) the upstream stream if the consumer goes away
+        pump_task.cancel()
+        await asyncio.gather(pump_task, return_exceptions=True)
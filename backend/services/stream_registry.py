@@ -0,0 +1,258 @@
+# services/stream_registry.py
+"""Replay buffers that let streamed replies survive dropped connections.
+
+A reply is generated in its own task, which publishes frames (chunks,
+then a completion or an error) to a `ReplayStream` instead of writing to a
+socket. Sockets follow the stream from a sequence number, so a client that
+reconnects with its stream_id and the last sequence it saw receives only
+the frames it missed while generation carried on. Finished streams are
+kept for `ttl` seconds. Buffered frames are capped at `max_bytes`: chunks of
+finished streams go first (their completion carries the full text), then
+whole finished streams, oldest first, then the oldest chunks of active
+streams.
+"""
+import asyncio
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Coroutine, Deque, Dict, List, Optional, Set
+
+from config import settings
+
+# Rough per-frame overhead (event object, deque slot)
+EVENT_OVERHEAD_BYTES = 120
+
+CHUNK = "chunk"
+COMPLETE = "complete"
+ERROR = "error"
+
+
+class ReplayGap(Exception):
+    """Frames after the requested sequence are no longer buffered"""
+
+
+class StreamEvent:
+    __slots__ = ("sequence", "kind", "text", "suggestions", "code")
+
+    def __init__(self, sequence: int, kind: str, text: str, suggestions: Optional[List[str]] = None, code: int = 0):
+        self.sequence = sequence
+        self.kind = kind
+        # Chunk text, full reply text, or error message
+        self.text = text
+        self.suggestions = suggestions
+        self.code = code
+
+    @property
+    def size(self) -> int:
+        return EVENT_OVERHEAD_BYTES + len(self.text) + sum(len(s) for s in self.suggestions or ())
+
+
+class ReplayStream:
+    def __init__(self, registry: "StreamRegistry", stream_id: str, user_id: str, conversation_id: int):
+        self.stream_id = stream_id
+        self.user_id = user_id
+        self.conversation_id = conversation_id
+        self.events: Deque[StreamEvent] = deque()
+        self.last_sequence = 0
+        self.size = 0
+        self.finished_at: Optional[float] = None
+        # The generation task, once started
+        self.task: Optional[asyncio.Task] = None
+        self._registry = registry
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    @property
+    def failed(self) -> bool:
+        return self.finished and self.events[-1].kind == ERROR
+
+    def publish(self, text: str) -> None:
+        self._append(CHUNK, text)
+
+    def complete(self, full_text: str, suggestions: Optional[List[str]] = None) -> None:
+        self._append(COMPLETE, full_text, suggestions=suggestions)
+
+    def fail(self, message: str, code: int = 500) -> None:
+        self._append(ERROR, message, code=code)
+
+    async def follow(self, after: int = 0) -> AsyncIterator[StreamEvent]:
+        """Yield frames with sequence > `after`, waiting for new ones until the stream ends"""
+        while True:
+            first = self.events[0].sequence if self.events else self.last_sequence + 1
+            if after + 1 < first:
+                # Trimmed chunks aren't needed once the completion (with the full text) exists
+                if self.finished:
+                    yield self.events[-1]
+                    return
+                raise ReplayGap(f"Frames after {after} are no longer available")
+
+            if after < self.last_sequence:
+                event = self.events[after + 1 - first]
+                after = event.sequence
+                yield event
+                if event.kind != CHUNK:
+                    return
+                continue
+
+            if self.finished:
+                return
+            await self._changed.wait()
+
+    def _append(self, kind: str, text: str, suggestions: Optional[List[str]] = None, code: int = 0) -> None:
+        if self.finished:
+            return
+        self.last_sequence += 1
+        event = StreamEvent(self.last_sequence, kind, text, suggestions, code)
+        self.events.append(event)
+        self.size += event.size
+        if kind != CHUNK:
+            self.finished_at = time.monotonic()
+            self._registry._finished[self.stream_id] = self
+        # Wake every follower; waiting on a fresh event afterwards can't miss frames
+        self._changed.set()
+        self._changed = asyncio.Event()
+        self._registry._grew(event.size)
+
+
+class StreamRegistry:
+    def __init__(self, max_bytes: int, ttl: float = 120.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._streams: "OrderedDict[str, ReplayStream]" = OrderedDict()
+        # Finished streams in finishing order, so expiry only looks at the oldest
+        self._finished: "OrderedDict[str, ReplayStream]" = OrderedDict()
+        self._tasks: Set[asyncio.Task] = set()
+        self._bytes = 0
+
+        self.created = 0
+        self.resumed = 0
+        self.cancelled = 0
+        self.expired = 0
+        self.evicted = 0
+        self.trimmed_frames = 0
+
+    def create(self, user_id: str, conversation_id: int) -> ReplayStream:
+        self._expire()
+        stream = ReplayStream(self, uuid.uuid4().hex, user_id, conversation_id)
+        self._streams[stream.stream_id] = stream
+        self.created += 1
+        return stream
+
+    def get(self, stream_id: str, user_id: str) -> Optional[ReplayStream]:
+        """Look up a stream for resuming; only its owner can see it"""
+        stream = self.find(stream_id, user_id)
+        if stream is not None:
+            self.resumed += 1
+        return stream
+
+    def find(self, stream_id: str, user_id: str) -> Optional[ReplayStream]:
+        """Like `get`, without counting a resume"""
+        self._expire()
+        stream = self._streams.get(stream_id)
+        if stream is None or stream.user_id != user_id:
+            return None
+        return stream
+
+    def run(self, stream: ReplayStream, generation: Coroutine) -> asyncio.Task:
+        """Run a stream's generation in a task that outlives the socket that started it"""
+        task = asyncio.create_task(generation)
+        stream.task = task
+        self._tasks.add(task)
+
+        def done(task: asyncio.Task) -> None:
+            self._tasks.discard(task)
+            if not stream.finished:
+                # Generation ended without a terminal frame (cancelled or crashed)
+                stream.fail("Stream ended unexpectedly", code=500)
+
+        task.add_done_callback(done)
+        return task
+
+    def cancel(self, stream_id: str, user_id: str) -> bool:
+        """Stop a generation and close its upstream request; False if it already ended"""
+        stream = self._streams.get(stream_id)
+        if stream is None or stream.user_id != user_id or stream.finished:
+            return False
+        # Terminal frame first, so followers see a cancel rather than a crash
+        stream.fail("Stream cancelled", code=499)
+        if stream.task is not None:
+            stream.task.cancel()
+        self.cancelled += 1
+        return True
+
+    async def drain(self, timeout: float = 10.0) -> None:
+        """Let in-flight generations finish (app shutdown)"""
+        if self._tasks:
+            _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+            if pending:
+                print(f"Stream registry drain timed out with {len(pending)} generations running")
+                for task in pending:
+                    task.cancel()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "streams": len(self._streams),
+            "active": len(self._tasks),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "created": self.created,
+            "resumed": self.resumed,
+            "cancelled": self.cancelled,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "trimmed_frames": self.trimmed_frames,
+        }
+
+    def _grew(self, size: int) -> None:
+        self._bytes += size
+        if self._bytes > self.max_bytes:
+            self._shrink()
+
+    def _remove(self, stream_id: str) -> None:
+        self._finished.pop(stream_id, None)
+        stream = self._streams.pop(stream_id, None)
+        if stream is not None:
+            self._bytes -= stream.size
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        while self._finished:
+            stream_id, stream = next(iter(self._finished.items()))
+            if now - stream.finished_at <= self.ttl:
+                break
+            self._remove(stream_id)
+            self.expired += 1
+
+    def _trim(self, stream: ReplayStream) -> None:
+        while self._bytes > self.max_bytes and stream.events and stream.events[0].kind == CHUNK:
+            event = stream.events.popleft()
+            stream.size -= event.size
+            self._bytes -= event.size
+            self.trimmed_frames += 1
+
+    def _shrink(self) -> None:
+        self._expire()
+        for stream in self._finished.values():
+            if self._bytes <= self.max_bytes:
+                return
+            self._trim(stream)
+
+        for stream_id in list(self._finished):
+            if self._bytes <= self.max_bytes:
+                return
+            self._remove(stream_id)
+            self.evicted += 1
+
+        for stream in self._streams.values():
+            if self._bytes <= self.max_bytes:
+                return
+            self._trim(stream)
+
+
+stream_registry = StreamRegistry(
+    max_bytes=settings.STREAM_REPLAY_MAX_BYTES,
+    ttl=settings.STREAM_REPLAY_TTL,
+)
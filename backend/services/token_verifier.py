@@ -0,0 +1,153 @@
+# services/token_verifier.py
+"""Local verification of Supabase access tokens.
+
+Tokens are checked against the project's signing keys (JWKS) or the shared
+JWT secret, and verified tokens are cached until they expire. Supabase Auth
+is only called when a token is signed with a key we don't know.
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import jwt
+
+from config import settings
+from services import db
+
+
+class InvalidToken(Exception):
+    pass
+
+
+class TokenVerifier:
+    def __init__(
+        self,
+        jwt_secret: Optional[str] = None,
+        cache_size: int = 10000,
+        cache_ttl: float = 300.0,
+        jwks_min_refresh_interval: float = 30.0,
+    ):
+        self.jwt_secret = jwt_secret
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.jwks_min_refresh_interval = jwks_min_refresh_interval
+
+        # sha256(token) -> (user_id, cache expiry)
+        self._cache: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()
+        self._keys: Dict[str, jwt.PyJWK] = {}
+        self._keys_fetched_at = 0.0
+        self._keys_lock = asyncio.Lock()
+
+        self.cache_hits = 0
+        self.local_verifications = 0
+        self.remote_verifications = 0
+
+    async def verify(self, token: str) -> str:
+        """Return the user id for a valid access token, else raise InvalidToken"""
+        cache_key = hashlib.sha256(token.encode()).digest()
+        now = time.time()
+
+        cached = self._cache.get(cache_key)
+        if cached and cached[1] > now:
+            self._cache.move_to_end(cache_key)
+            self.cache_hits += 1
+            return cached[0]
+
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.PyJWTError as e:
+            raise InvalidToken(str(e))
+
+        key = await self._signing_key(header)
+        if key is None:
+            user_id, expires_at = await self._verify_remote(token)
+        else:
+            user_id, expires_at = self._verify_local(token, key, header.get("alg"))
+
+        self._remember(cache_key, user_id, min(now + self.cache_ttl, expires_at))
+        return user_id
+
+    def forget(self, token: str) -> None:
+        """Drop a token from the cache (e.g. on logout)"""
+        self._cache.pop(hashlib.sha256(token.encode()).digest(), None)
+
+    def stats(self) -> dict:
+        return {
+            "cached_tokens": len(self._cache),
+            "cache_hits": self.cache_hits,
+            "local_verifications": self.local_verifications,
+            "remote_verifications": self.remote_verifications,
+            "signing_keys": len(self._keys),
+        }
+
+    def _verify_local(self, token: str, key, algorithm: Optional[str]) -> Tuple[str, float]:
+        try:
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=[algorithm] if algorithm else [],
+                audience="authenticated",
+                options={"require": ["exp", "sub"]},
+            )
+        except jwt.PyJWTError as e:
+            raise InvalidToken(str(e))
+        self.local_verifications += 1
+        return claims["sub"], float(claims["exp"])
+
+    async def _verify_remote(self, token: str) -> Tuple[str, float]:
+        try:
+            user = await db.Database().auth.get_user(token)
+        except db.APIError as e:
+            raise InvalidToken(e.message)
+        if not user.get("id"):
+            raise InvalidToken("Invalid token")
+        self.remote_verifications += 1
+        # The remote check already validated expiry; read it for cache lifetime
+        claims = jwt.decode(token, options={"verify_signature": False})
+        return user["id"], float(claims.get("exp", time.time()))
+
+    async def _signing_key(self, header: dict):
+        algorithm = header.get("alg")
+        kid = header.get("kid")
+
+        if algorithm == "HS256":
+            # Legacy projects sign with the shared secret
+            return self.jwt_secret
+
+        if kid in self._keys:
+            return self._keys[kid]
+
+        await self._refresh_keys()
+        return self._keys.get(kid)
+
+    async def _refresh_keys(self) -> None:
+        async with self._keys_lock:
+            if time.monotonic() - self._keys_fetched_at < self.jwks_min_refresh_interval:
+                return
+            self._keys_fetched_at = time.monotonic()
+            try:
+                response = await db.http_client.get(
+                    "/auth/v1/.well-known/jwks.json",
+                    headers={"apikey": settings.SUPABASE_KEY or ""},
+                )
+                response.raise_for_status()
+                jwks = jwt.PyJWKSet.from_dict(response.json())
+            except Exception as e:
+                print(f"Failed to refresh signing keys: {e}")
+                return
+            self._keys = {key.key_id: key for key in jwks.keys if key.key_id}
+
+    def _remember(self, cache_key: bytes, user_id: str, expires_at: float) -> None:
+        self._cache[cache_key] = (user_id, expires_at)
+        self._cache.move_to_end(cache_key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+
+verifier = TokenVerifier(
+    jwt_secret=settings.SUPABASE_JWT_SECRET,
+    cache_size=settings.AUTH_TOKEN_CACHE_SIZE,
+    cache_ttl=settings.AUTH_TOKEN_CACHE_TTL,
+)
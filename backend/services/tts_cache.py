@@ -0,0 +1,269 @@
+# services/tts_cache.py
+"""Cache of synthesized speech, in memory and on disk.
+
+Many phrases are spoken again and again (the follow-up suggestions,
+greetings, common check-in questions), and synthesizing one takes a
+provider round trip and costs money. Results are keyed by voice (the
+provider and its voice id, i.e. the user's voice clone), normalized text
+and audio format. Normalizing collapses whitespace and composes Unicode,
+so "Tell me more about that" and " Tell me more  about that" share an
+entry; case and punctuation are kept, since they change how a phrase is
+spoken.
+
+Two tiers:
+
+- memory: an LRU of audio bytes, bounded by `max_memory_bytes` (clips over
+  `max_item_bytes` are not kept in memory).
+- disk: the audio goes into the audio store (services/audio_store.py),
+  which bounds its size, and a small key file under `root` names the
+  audio's id. Key files survive restarts; one whose audio was evicted from
+  the store counts as a miss.
+
+Identical requests in flight share one synthesis. `schedule_warmup`
+synthesizes a phrase set in the background, e.g. the follow-up
+suggestions at startup.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Set
+
+import aiofiles
+
+from config import settings
+from services.audio_store import AUDIO_ID, AudioStore, audio_store
+from services.speech import SpeechError, Synthesizer
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(voice: str, text: str, audio_format: str) -> str:
+    return hashlib.sha256(json.dumps([voice, normalize_text(text), audio_format]).encode()).hexdigest()
+
+
+@dataclass
+class CachedSpeech:
+    audio: bytes
+    audio_id: str
+    audio_format: str
+    # Served from the cache (or a synthesis already in flight) rather than synthesized
+    cached: bool = False
+
+
+class TTSCache:
+    def __init__(self, store: AudioStore, root: str, max_memory_bytes: int, max_item_bytes: int):
+        self.store = store
+        self.root = root
+        self.max_memory_bytes = max_memory_bytes
+        self.max_item_bytes = max_item_bytes
+        self.memory_bytes = 0
+        self._memory: "OrderedDict[str, CachedSpeech]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.joined = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.bytes_synthesized = 0
+        self.warmed = 0
+        self.errors = 0
+
+    async def synthesize(
+        self,
+        text: str,
+        synthesizer: Synthesizer,
+        voice_id: Optional[str] = None,
+        audio_format: Optional[str] = None,
+        warming: bool = False,
+    ) -> CachedSpeech:
+        """The audio for `text`, synthesized only if no tier has it.
+
+        `warming` keeps the call out of the hit ratio.
+        """
+        text = normalize_text(text)
+        audio_format = synthesizer.pick_format(audio_format)
+        key = cache_key(f"{synthesizer.name}:{voice_id or ''}", text, audio_format)
+
+        while True:
+            cached = self._memory.get(key)
+            if cached is not None:
+                self._memory.move_to_end(key)
+                return self._hit(cached, "memory_hits", warming)
+
+            pending = self._in_flight.get(key)
+            if pending is None:
+                break
+            try:
+                return self._hit(await asyncio.shield(pending), "joined", warming)
+            except asyncio.CancelledError:
+                if pending.cancelled():
+                    # The first request was abandoned; take over
+                    continue
+                raise
+
+        pending = self._in_flight[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await self._load(key)
+            if result is not None:
+                result = self._hit(result, "disk_hits", warming)
+            else:
+                result = await self._synthesize(key, text, synthesizer, voice_id, audio_format)
+                if warming:
+                    self.warmed += 1
+                else:
+                    self.misses += 1
+        except BaseException as e:
+            if isinstance(e, Exception):
+                self.errors += 1
+                pending.set_exception(e)
+                # Waiters re-raise it; don't log it as unretrieved
+                pending.exception()
+            else:
+                pending.cancel()
+            raise
+        finally:
+            del self._in_flight[key]
+        pending.set_result(result)
+        return result
+
+    async def warm(
+        self,
+        phrases: Iterable[str],
+        synthesizer: Synthesizer,
+        voice_id: Optional[str] = None,
+        audio_format: Optional[str] = None,
+    ) -> None:
+        """Synthesize the phrases not cached yet, one at a time"""
+        for phrase in phrases:
+            await self.synthesize(phrase, synthesizer, voice_id, audio_format, warming=True)
+
+    def stats(self) -> Dict[str, float]:
+        hits = self.memory_hits + self.disk_hits + self.joined
+        lookups = hits + self.misses
+        return {
+            "entries": len(self._memory),
+            "memory_bytes": self.memory_bytes,
+            "max_memory_bytes": self.max_memory_bytes,
+            "in_flight": len(self._in_flight),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "joined": self.joined,
+            "misses": self.misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+            "bytes_synthesized": self.bytes_synthesized,
+            "warmed": self.warmed,
+            "errors": self.errors,
+        }
+
+    def _hit(self, cached: CachedSpeech, tier: str, warming: bool) -> CachedSpeech:
+        if not warming:
+            setattr(self, tier, getattr(self, tier) + 1)
+            self.bytes_saved += len(cached.audio)
+        return CachedSpeech(cached.audio, cached.audio_id, cached.audio_format, cached=True)
+
+    async def _load(self, key: str) -> Optional[CachedSpeech]:
+        """From the disk tier, into the memory tier"""
+        try:
+            async with aiofiles.open(self._key_path(key)) as f:
+                audio_id = (await f.read()).strip()
+        except FileNotFoundError:
+            return None
+        stored = await self.store.get(audio_id) if AUDIO_ID.fullmatch(audio_id) else None
+        if stored is None:
+            return None
+        try:
+            async with aiofiles.open(stored.path, "rb") as f:
+                audio = await f.read()
+        except FileNotFoundError:
+            return None
+        cached = CachedSpeech(audio, stored.audio_id, stored.audio_format)
+        self._remember(key, cached)
+        return cached
+
+    async def _synthesize(
+        self, key: str, text: str, synthesizer: Synthesizer, voice_id: Optional[str], audio_format: str
+    ) -> CachedSpeech:
+        writer = self.store.writer(audio_format)
+        audio = bytearray()
+        try:
+            async for chunk in synthesizer.synthesize(text, voice_id, audio_format):
+                audio += chunk
+                await writer.write(chunk)
+            stored = await writer.commit()
+        except BaseException:
+            await writer.discard()
+            raise
+        if stored is None:
+            raise SpeechError(f"{synthesizer.name} returned no audio")
+        self.bytes_synthesized += stored.size
+        await asyncio.to_thread(self._write_key, key, stored.audio_id)
+        cached = CachedSpeech(bytes(audio), stored.audio_id, audio_format)
+        self._remember(key, cached)
+        return cached
+
+    def _remember(self, key: str, cached: CachedSpeech) -> None:
+        size = len(cached.audio)
+        if size > self.max_item_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self.memory_bytes -= len(previous.audio)
+        self._memory[key] = cached
+        self.memory_bytes += size
+        while self.memory_bytes > self.max_memory_bytes and self._memory:
+            _, oldest = self._memory.popitem(last=False)
+            self.memory_bytes -= len(oldest.audio)
+
+    def _key_path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def _write_key(self, key: str, audio_id: str) -> None:
+        path = self._key_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix="key-", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(audio_id)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+
+tts_cache = TTSCache(
+    store=audio_store,
+    root=settings.TTS_CACHE_DIR,
+    max_memory_bytes=settings.TTS_CACHE_MAX_MEMORY_BYTES,
+    max_item_bytes=settings.TTS_CACHE_MAX_ITEM_BYTES,
+)
+
+_tasks: Set[asyncio.Task] = set()
+
+
+def schedule_warmup(
+    phrases: Iterable[str],
+    synthesizer: Synthesizer,
+    voice_id: Optional[str] = None,
+    audio_format: Optional[str] = None,
+) -> None:
+    """Warm the cache in the background"""
+    phrases = tuple(phrases)
+
+    async def run():
+        try:
+            await tts_cache.warm(phrases, synthesizer, voice_id, audio_format)
+        except Exception as e:
+            print(f"Error warming TTS cache: {e}")
+
+    task = asyncio.create_task(run())
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
@@ -0,0 +1,246 @@
+# services/uploads.py
+"""Multipart uploads streamed to temporary files as they arrive.
+
+Starlette's form parsing reads the whole body before the endpoint runs,
+keeps each file in memory up to 1MB and has no size limit. `spool_form`
+parses the request body chunk by chunk instead. File parts are written
+to temporary files through aiofiles in `chunk_size` writes, hashed and
+sniffed along the way. An upload of any size holds about one chunk in
+memory. A body over `max_bytes` is rejected as soon as the limit is
+crossed, or before reading at all if its Content-Length says so.
+"""
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import aiofiles
+import aiofiles.os
+from fastapi import Request
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from config import settings
+from services.speech import sniff_format
+
+# Non-file form fields are small; bound them so they can't be used to buffer a body
+MAX_FIELD_BYTES = 64 * 1024
+
+# Bytes of each file kept for format sniffing
+SNIFF_BYTES = 12
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class InvalidUpload(ValueError):
+    pass
+
+
+@dataclass
+class SpooledFile:
+    field: str
+    filename: Optional[str]
+    content_type: Optional[str]
+    path: str
+    size: int = 0
+    sha256: str = ""
+    # Container sniffed from the first bytes (services/speech.py names)
+    audio_format: Optional[str] = None
+
+
+@dataclass
+class SpooledForm:
+    fields: Dict[str, str] = field(default_factory=dict)
+    files: List[SpooledFile] = field(default_factory=list)
+
+    def file(self, name: str) -> Optional[SpooledFile]:
+        return next((f for f in self.files if f.field == name), None)
+
+    def files_for(self, name: str) -> List[SpooledFile]:
+        return [f for f in self.files if f.field == name]
+
+    async def aclose(self) -> None:
+        """Delete the temporary files"""
+        for spooled in self.files:
+            try:
+                await aiofiles.os.remove(spooled.path)
+            except FileNotFoundError:
+                pass
+
+    async def __aenter__(self) -> "SpooledForm":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+
+class _Part:
+    __slots__ = ("name", "filename", "content_type", "data", "spooled", "handle", "buffer", "digest", "head")
+
+    def __init__(self):
+        self.name = ""
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+        self.data = bytearray()
+        self.spooled: Optional[SpooledFile] = None
+        self.handle = None
+        self.buffer = bytearray()
+        self.digest = hashlib.sha256()
+        self.head = b""
+
+
+class _FormSpooler:
+    """python-multipart callbacks; file writes are queued for `spool_form` to await"""
+
+    def __init__(self, form: SpooledForm, max_files: int, directory: Optional[str]):
+        self.form = form
+        self.max_files = max_files
+        self.directory = directory
+        self.part = _Part()
+        self.header_name = b""
+        self.header_value = b""
+        self.disposition = b""
+        # (part, data) to write, data None closing the part's file; cleared by flush()
+        self.pending: List[tuple] = []
+
+    def on_part_begin(self) -> None:
+        self.part = _Part()
+        self.disposition = b""
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self.header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self.header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        name = self.header_name.lower()
+        if name == b"content-disposition":
+            self.disposition = self.header_value
+        elif name == b"content-type":
+            self.part.content_type = self.header_value.decode("latin-1")
+        self.header_name = b""
+        self.header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self.disposition)
+        if b"name" not in options:
+            raise InvalidUpload('Form part without a Content-Disposition "name"')
+        part = self.part
+        part.name = options[b"name"].decode("utf-8", "replace")
+        if b"filename" not in options:
+            return
+        if len(self.form.files) >= self.max_files:
+            raise InvalidUpload(f"Too many files (at most {self.max_files})")
+        part.filename = options[b"filename"].decode("utf-8", "replace")
+        fd, path = tempfile.mkstemp(prefix="upload-", dir=self.directory)
+        os.close(fd)
+        part.spooled = SpooledFile(part.name, part.filename, part.content_type, path)
+        self.form.files.append(part.spooled)
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        part = self.part
+        # A view, not a copy: the body chunk stays alive until it is flushed anyway
+        chunk = memoryview(data)[start:end]
+        if part.spooled is None:
+            if len(part.data) + len(chunk) > MAX_FIELD_BYTES:
+                raise InvalidUpload(f'Form field "{part.name}" is too large')
+            part.data += chunk
+            return
+        part.digest.update(chunk)
+        if len(part.head) < SNIFF_BYTES:
+            part.head += bytes(chunk[:SNIFF_BYTES - len(part.head)])
+        part.spooled.size += len(chunk)
+        self.pending.append((part, chunk))
+
+    def on_part_end(self) -> None:
+        part = self.part
+        if part.spooled is None:
+            self.form.fields[part.name] = part.data.decode("utf-8", "replace")
+            return
+        part.spooled.sha256 = part.digest.hexdigest()
+        part.spooled.audio_format = sniff_format(part.head)
+        self.pending.append((part, None))
+
+    async def flush(self, chunk_size: int) -> None:
+        for part, data in self.pending:
+            if part.handle is None:
+                part.handle = await aiofiles.open(part.spooled.path, "wb")
+            if data is not None and len(part.buffer) + len(data) < chunk_size:
+                # Small pieces are gathered into one write
+                part.buffer += data
+                continue
+            if part.buffer:
+                await part.handle.write(part.buffer)
+                part.buffer.clear()
+            if data is not None:
+                await part.handle.write(data)
+            else:
+                await part.handle.close()
+                part.handle = None
+        self.pending.clear()
+
+    async def abort(self) -> None:
+        for part, _ in self.pending:
+            if part.handle is not None:
+                await part.handle.close()
+                part.handle = None
+        if self.part.handle is not None:
+            await self.part.handle.close()
+        await self.form.aclose()
+
+
+async def spool_form(
+    request: Request,
+    max_bytes: int,
+    max_files: int = 1,
+    chunk_size: Optional[int] = None,
+    directory: Optional[str] = None,
+) -> SpooledForm:
+    """Parse a multipart/form-data body, writing file parts to temporary files.
+
+    The caller owns the returned form and must `aclose()` it (or use it as an
+    async context manager) to delete the files. Raises UploadTooLarge once
+    the body passes `max_bytes`, and InvalidUpload for malformed bodies.
+    """
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise InvalidUpload("Expected a multipart/form-data body")
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        raise UploadTooLarge(f"Upload is larger than {max_bytes} bytes")
+
+    form = SpooledForm()
+    spooler = _FormSpooler(form, max_files, directory or settings.UPLOAD_DIR)
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": spooler.on_part_begin,
+        "on_part_data": spooler.on_part_data,
+        "on_part_end": spooler.on_part_end,
+        "on_header_field": spooler.on_header_field,
+        "on_header_value": spooler.on_header_value,
+        "on_header_end": spooler.on_header_end,
+        "on_headers_finished": spooler.on_headers_finished,
+    })
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_bytes:
+                raise UploadTooLarge(f"Upload is larger than {max_bytes} bytes")
+            parser.write(chunk)
+            await spooler.flush(chunk_size)
+        parser.finalize()
+        await spooler.flush(chunk_size)
+    except BaseException as e:
+        await spooler.abort()
+        if isinstance(e, (UploadTooLarge, InvalidUpload)) or not isinstance(e, Exception):
+            raise
+        raise InvalidUpload(f"Malformed multipart body: {e}")
+    if any(not spooled.sha256 for spooled in form.files):
+        # Body ended inside a file part
+        await spooler.abort()
+        raise InvalidUpload("Incomplete multipart body")
+    return form
@@ -0,0 +1,81 @@
+# services/user_context_cache.py
+"""TTL cache of per-user prompt context (recent check-ins, voice clone).
+
+The data changes a few times a day at most, so chat turns read it from
+here instead of querying `user_check_in_stats` and `voice_clones` every time.
+Voice clone creation on this worker invalidates the user's entry. Check-ins
+are written by clients straight to `daily_check_ins`, so only the TTL
+bounds how long the streak and mood lag behind one; it is kept short
+because users see the streak right away. A load that started before an
+invalidation isn't stored, so it can't put the old data back. At most `max_entries` users are kept, least recently used
+dropped first.
+"""
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from config import settings
+
+
+class UserContextCache:
+    def __init__(self, max_entries: int, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        # Recent invalidations, oldest first
+        self._invalidated: "OrderedDict[str, float]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get(self, user_id: str) -> Optional[dict]:
+        entry = self._entries.get(user_id)
+        if entry is None or time.monotonic() - entry[1] > self.ttl:
+            if entry is not None:
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, user_id: str, context: dict, loaded_at: float) -> None:
+        """Store a context whose load started at `loaded_at` (time.monotonic())"""
+        invalidated_at = self._invalidated.get(user_id)
+        if invalidated_at is not None and invalidated_at >= loaded_at:
+            return
+        self._entries[user_id] = (context, loaded_at)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id: str) -> None:
+        now = time.monotonic()
+        self._entries.pop(user_id, None)
+        self._invalidated.pop(user_id, None)
+        self._invalidated[user_id] = now
+        self.invalidations += 1
+        # Loads don't outlive the TTL, so older invalidations can't matter
+        while self._invalidated and now - next(iter(self._invalidated.values())) > self.ttl:
+            self._invalidated.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "users": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+        }
+
+
+user_context_cache = UserContextCache(
+    max_entries=settings.USER_CONTEXT_CACHE_SIZE,
+    ttl=settings.USER_CONTEXT_CACHE_TTL,
+)
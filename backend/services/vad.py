@@ -0,0 +1,88 @@
+# services/vad.py
+"""Energy-based voice activity detection for 16-bit mono PCM.
+
+Audio is judged in FRAME_MS frames. A frame is voiced when its RMS energy
+is above `noise_ratio` times the background noise level (tracked while
+nobody is speaking), and at least `min_rms`. Speech starts after
+`start_ms` of voiced frames. Once speaking, `pause_ms` of silence is a
+pause between phrases and `end_ms` of silence ends the utterance.
+"""
+import math
+import operator
+from array import array
+from typing import Optional
+
+SPEECH_START = "speech_start"
+PAUSE = "pause"
+SPEECH_END = "speech_end"
+
+FRAME_MS = 20
+
+
+def rms(frame: bytes) -> float:
+    samples = array("h", frame)
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(map(operator.mul, samples, samples)) / len(samples))
+
+
+class EnergyVAD:
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        min_rms: float = 300.0,
+        noise_ratio: float = 3.0,
+        start_ms: int = 100,
+        pause_ms: int = 250,
+        end_ms: int = 700,
+    ):
+        self.frame_bytes = sample_rate * FRAME_MS // 1000 * 2
+        self.min_rms = min_rms
+        self.noise_ratio = noise_ratio
+        self.start_frames = max(1, start_ms // FRAME_MS)
+        self.pause_frames = max(1, pause_ms // FRAME_MS)
+        self.end_frames = max(self.pause_frames + 1, end_ms // FRAME_MS)
+
+        self.speaking = False
+        self.noise: Optional[float] = None
+        self.voiced_run = 0
+        # Silent frames since the last voiced one, while speaking
+        self.silent_run = 0
+
+    @property
+    def threshold(self) -> float:
+        return max(self.min_rms, (self.noise or 0.0) * self.noise_ratio)
+
+    def reset(self) -> None:
+        """Forget the current utterance; the noise level is kept"""
+        self.speaking = False
+        self.voiced_run = 0
+        self.silent_run = 0
+
+    def push(self, frame: bytes) -> Optional[str]:
+        """Judge one frame of `frame_bytes`; returns the event it completes, if any"""
+        energy = rms(frame)
+        voiced = energy >= self.threshold
+        if not self.speaking:
+            if voiced:
+                self.voiced_run += 1
+                if self.voiced_run >= self.start_frames:
+                    self.speaking = True
+                    self.silent_run = 0
+                    return SPEECH_START
+            else:
+                self.voiced_run = 0
+                self.noise = energy if self.noise is None else 0.95 * self.noise + 0.05 * energy
+            return None
+
+        if voiced:
+            self.silent_run = 0
+            return None
+        self.silent_run += 1
+        if self.silent_run == self.pause_frames:
+            return PAUSE
+        if self.silent_run >= self.end_frames:
+            self.speaking = False
+            self.voiced_run = 0
+            return SPEECH_END
+        return None
@@ -0,0 +1,341 @@
+# services/voice_pipeline.py
+"""Pipelined speech in and out of a voice turn.
+
+`VoiceListener` cuts a microphone stream into utterances and transcribes
+each one phrase by phrase while it is spoken, so the transcript is ready
+shortly after the user stops talking.
+
+In `speak_reply`, the reply's token stream is cut at sentence boundaries
+as it arrives, and each sentence is sent to the synthesizer immediately,
+so the first audio is ready while the model is still generating the rest.
+Up to `lookahead` sentences are synthesized at once. Audio is delivered in sentence order,
+chunk by chunk as the synthesizer produces it.
+"""
+import asyncio
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Deque, List, Optional, Tuple
+
+from services.speech import PCM_16000, SAMPLE_RATES, Synthesizer, Transcriber
+from services.vad import FRAME_MS, PAUSE, SPEECH_END, SPEECH_START, EnergyVAD
+
+TRANSCRIPT = "transcript"
+TEXT = "chunk"
+SEGMENT = "segment"
+AUDIO = "audio"
+COMPLETE = "complete"
+ERROR = "error"
+
+# Sentence end: terminal punctuation (plus closing quotes/brackets) and whitespace, or a newline
+SENTENCE_END = re.compile(r"[.!?…]+[\"')\]]*\s+|\n+")
+
+
+class UtteranceTooLong(Exception):
+    """Unsegmented (compressed) audio passed the listener's size limit"""
+
+
+@dataclass
+class VoiceEvent:
+    kind: str
+    # Transcript, text delta, segment sentence, full reply or error message
+    text: str = ""
+    audio: bytes = b""
+    segment: int = 0
+
+
+class Utterance:
+    """One utterance's audio, transcribed in segments while it is spoken.
+
+    Each committed segment goes to the transcriber right away, so when the
+    utterance ends only the audio since the last commit is left.
+    """
+
+    def __init__(self, transcriber: Transcriber, audio_format: str):
+        self.transcriber = transcriber
+        self.audio_format = audio_format
+        self.ended = False
+        self.cancelled = False
+        self._pending = bytearray()
+        self._segments: List[asyncio.Task] = []
+        self._done = asyncio.Event()
+
+    @property
+    def pending_bytes(self) -> int:
+        return len(self._pending)
+
+    def append(self, audio: bytes) -> None:
+        if not self.ended:
+            self._pending += audio
+
+    def commit(self) -> None:
+        """Start transcribing the audio appended since the last commit"""
+        if self._pending and not self.cancelled:
+            self._segments.append(asyncio.create_task(
+                self.transcriber.transcribe(bytes(self._pending), self.audio_format)
+            ))
+            self._pending.clear()
+
+    def end(self, trim_bytes: int = 0) -> None:
+        """Transcribe the rest, less `trim_bytes` of trailing silence"""
+        if self.ended:
+            return
+        if trim_bytes:
+            del self._pending[max(0, len(self._pending) - trim_bytes):]
+        self.commit()
+        self.ended = True
+        self._done.set()
+
+    def cancel(self) -> None:
+        for segment in self._segments:
+            segment.cancel()
+        self._pending.clear()
+        self.cancelled = True
+        self.ended = True
+        self._done.set()
+
+    async def transcript(self) -> str:
+        """The whole utterance's text, once it has ended; raises CancelledError if it was cancelled"""
+        await self._done.wait()
+        if self.cancelled:
+            raise asyncio.CancelledError()
+        texts = await asyncio.gather(*self._segments)
+        return " ".join(text for text in texts if text)
+
+
+class VoiceListener:
+    """Cut one socket's microphone stream into utterances.
+
+    PCM goes through energy VAD (services/vad.py). An utterance starts with
+    speech, keeping `preroll_ms` of audio from before the VAD fired, and is
+    committed for transcription at pauses once `min_segment_ms` of audio
+    has built up (or at `max_segment_ms` regardless). It ends after the
+    VAD's end silence, or when the client calls it done. Compressed input
+    can't be cut up, so it is transcribed in one piece when the client
+    ends it, and is limited to `max_utterance_bytes`.
+    """
+
+    # Silence kept at the end of an utterance
+    TAIL_PADDING_MS = 200
+
+    def __init__(
+        self,
+        transcriber: Transcriber,
+        audio_format: str = PCM_16000,
+        vad: Optional[EnergyVAD] = None,
+        preroll_ms: int = 300,
+        min_segment_ms: int = 2000,
+        max_segment_ms: int = 15000,
+        max_utterance_bytes: Optional[int] = None,
+    ):
+        self.transcriber = transcriber
+        self.audio_format = audio_format
+        self.utterance: Optional[Utterance] = None
+        sample_rate = SAMPLE_RATES.get(audio_format)
+        self.vad = (vad or EnergyVAD(sample_rate)) if sample_rate else None
+        bytes_per_ms = sample_rate * 2 // 1000 if sample_rate else 0
+        self.min_segment_bytes = min_segment_ms * bytes_per_ms
+        self.max_segment_bytes = max_segment_ms * bytes_per_ms
+        self._tail_padding_bytes = self.TAIL_PADDING_MS * bytes_per_ms
+        self.max_utterance_bytes = max_utterance_bytes
+        # Without VAD, the rest of a cancelled utterance is ignored until the client ends it
+        self._discarding = False
+        self._buffer = bytearray()
+        self._preroll: Deque[bytes] = deque(maxlen=max(1, preroll_ms // FRAME_MS))
+
+    def feed(self, audio: bytes) -> List[Tuple[str, Utterance]]:
+        """Add microphone audio; returns the SPEECH_START and SPEECH_END events it completes.
+
+        Raises UtteranceTooLong (having cancelled the utterance) when
+        compressed input passes `max_utterance_bytes`.
+        """
+        if self.vad is None:
+            if self._discarding:
+                return []
+            size = len(audio) + (self.utterance.pending_bytes if self.utterance is not None else 0)
+            if self.max_utterance_bytes is not None and size > self.max_utterance_bytes:
+                self.cancel_utterance(self.utterance)
+                raise UtteranceTooLong(f"Utterance is longer than {self.max_utterance_bytes} bytes")
+            if self.utterance is not None:
+                self.utterance.append(audio)
+                return []
+            self.utterance = Utterance(self.transcriber, self.audio_format)
+            self.utterance.append(audio)
+            return [(SPEECH_START, self.utterance)]
+
+        events = []
+        self._buffer += audio
+        size = self.vad.frame_bytes
+        offset = 0
+        while len(self._buffer) - offset >= size:
+            frame = bytes(self._buffer[offset:offset + size])
+            offset += size
+            event = self.vad.push(frame)
+            utterance = self.utterance
+            if utterance is None:
+                if event != SPEECH_START:
+                    self._preroll.append(frame)
+                    continue
+                utterance = self.utterance = Utterance(self.transcriber, self.audio_format)
+                for earlier in self._preroll:
+                    utterance.append(earlier)
+                self._preroll.clear()
+                utterance.append(frame)
+                events.append((SPEECH_START, utterance))
+                continue
+
+            utterance.append(frame)
+            if event == SPEECH_END:
+                self.utterance = None
+                utterance.end(max(0, self.vad.silent_run * size - self._tail_padding_bytes))
+                events.append((SPEECH_END, utterance))
+            elif utterance.pending_bytes >= (self.min_segment_bytes if event == PAUSE else self.max_segment_bytes):
+                utterance.commit()
+        del self._buffer[:offset]
+        return events
+
+    def end(self) -> List[Tuple[str, Utterance]]:
+        """The client ended the utterance (push-to-talk release, compressed input)"""
+        self._discarding = False
+        utterance, self.utterance = self.utterance, None
+        if utterance is None:
+            return []
+        if self.vad is not None:
+            self.vad.reset()
+        utterance.end()
+        return [(SPEECH_END, utterance)]
+
+    def cancel_utterance(self, utterance: Optional[Utterance]) -> None:
+        """Drop an utterance nobody will answer, so none of its audio is transcribed"""
+        if utterance is not None:
+            utterance.cancel()
+        if utterance is self.utterance:
+            self.utterance = None
+            self._discarding = self.vad is None
+
+    def close(self) -> None:
+        if self.utterance is not None:
+            self.utterance.cancel()
+            self.utterance = None
+
+
+class SentenceSplitter:
+    """Cut streamed text into sentences of at least `min_chars`.
+
+    The first sentence may be as short as `first_min_chars`, so a short
+    opener ("Hi!") is spoken without waiting for more text; later ones are
+    merged up to `min_chars` to keep the number of synthesis requests down.
+    """
+
+    def __init__(self, first_min_chars: int = 8, min_chars: int = 40):
+        self.first_min_chars = first_min_chars
+        self.min_chars = min_chars
+        self._buffer = ""
+        self._emitted = 0
+
+    def feed(self, text: str) -> List[str]:
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in SENTENCE_END.finditer(self._buffer):
+            sentence = self._buffer[start:match.end()].strip()
+            if len(sentence) >= (self.min_chars if self._emitted else self.first_min_chars):
+                sentences.append(sentence)
+                self._emitted += 1
+                start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> Optional[str]:
+        tail, self._buffer = self._buffer.strip(), ""
+        return tail or None
+
+
+async def speak_reply(
+    deltas: AsyncIterator[str],
+    synthesizer: Synthesizer,
+    voice_id: Optional[str] = None,
+    audio_format: Optional[str] = None,
+    lookahead: int = 2,
+    splitter: Optional[SentenceSplitter] = None,
+) -> AsyncIterator[VoiceEvent]:
+    """Yield a reply's text deltas and its audio, sentence by sentence.
+
+    Emits TEXT for every delta, SEGMENT (with the sentence) before each
+    sentence's AUDIO chunks, then COMPLETE with the full reply, or ERROR.
+    Closing the iterator cancels generation and synthesis.
+    """
+    splitter = splitter or SentenceSplitter()
+    events: "asyncio.Queue[VoiceEvent]" = asyncio.Queue()
+    # (sentence, its audio chunk queue), in order; None once the reply is done
+    segments: asyncio.Queue = asyncio.Queue()
+    synthesis_slots = asyncio.Semaphore(lookahead)
+    tasks: List[asyncio.Task] = []
+    parts: List[str] = []
+
+    async def synthesize(sentence: str, chunks: asyncio.Queue) -> None:
+        try:
+            async with synthesis_slots:
+                async for chunk in synthesizer.synthesize(sentence, voice_id, audio_format):
+                    chunks.put_nowait(chunk)
+            chunks.put_nowait(None)
+        except Exception as e:
+            chunks.put_nowait(e)
+
+    def start_segment(sentence: str) -> None:
+        chunks: asyncio.Queue = asyncio.Queue()
+        tasks.append(asyncio.create_task(synthesize(sentence, chunks)))
+        segments.put_nowait((sentence, chunks))
+
+    async def generate() -> None:
+        async for delta in deltas:
+            parts.append(delta)
+            events.put_nowait(VoiceEvent(TEXT, text=delta))
+            for sentence in splitter.feed(delta):
+                start_segment(sentence)
+        tail = splitter.flush()
+        if tail:
+            start_segment(tail)
+        segments.put_nowait(None)
+
+    async def deliver() -> None:
+        index = 0
+        while True:
+            item = await segments.get()
+            if item is None:
+                return
+            sentence, chunks = item
+            events.put_nowait(VoiceEvent(SEGMENT, text=sentence, segment=index))
+            while True:
+                chunk = await chunks.get()
+                if chunk is None:
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+                events.put_nowait(VoiceEvent(AUDIO, audio=chunk, segment=index))
+            index += 1
+
+    async def run() -> None:
+        workers = [asyncio.create_task(generate()), asyncio.create_task(deliver())]
+        try:
+            await asyncio.gather(*workers)
+            events.put_nowait(VoiceEvent(COMPLETE, text="".join(parts)))
+        except Exception as e:
+            events.put_nowait(VoiceEvent(ERROR, text=str(e)))
+        finally:
+            # Stops the upstream LLM stream too
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    runner = asyncio.create_task(run())
+    try:
+        while True:
+            event = await events.get()
+            yield event
+            if event.kind in (COMPLETE, ERROR):
+                return
+    finally:
+        for task in [runner, *tasks]:
+            task.cancel()
+        await asyncio.gather(runner, *tasks, return_exceptions=True)
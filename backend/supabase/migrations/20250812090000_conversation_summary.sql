@@ -0,0 +1,6 @@
+-- Rolling summary of conversation turns that no longer fit the prompt budget.
+-- summary_message_count is the number of oldest messages the summary covers.
+
+alter table "public"."conversations" add column "summary" text;
+
+alter table "public"."conversations" add column "summary_message_count" integer not null default 0;
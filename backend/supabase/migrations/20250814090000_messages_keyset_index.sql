@@ -0,0 +1,8 @@
+-- Keyset pagination and ordered history reads scan (conversation_id, created_at, id)
+-- directly instead of sorting every message in the conversation.
+
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_created_at_id
+    ON public.messages USING btree (conversation_id, created_at, id);
+
+-- Redundant: conversation_id is the leading column of the index above
+DROP INDEX IF EXISTS public.idx_messages_conversation_id;
@@ -0,0 +1,70 @@
+-- Denormalized list columns on conversations, kept current by a trigger on
+-- messages so listing a user's conversations never aggregates over messages.
+
+alter table "public"."conversations" add column "last_message_preview" text;
+
+alter table "public"."conversations" add column "message_count" integer not null default 0;
+
+alter table "public"."conversations" add column "last_activity" timestamp with time zone not null default now();
+
+-- Backfill from existing messages
+update public.conversations c
+set message_count = s.message_count,
+    last_activity = s.last_activity,
+    last_message_preview = left(s.last_content, 160)
+from (
+    select conversation_id,
+           count(*) as message_count,
+           max(created_at) as last_activity,
+           (array_agg(content order by created_at desc, id desc))[1] as last_content
+    from public.messages
+    group by conversation_id
+) s
+where s.conversation_id = c.id;
+
+update public.conversations
+set last_activity = created_at
+where message_count = 0;
+
+CREATE INDEX idx_conversations_user_last_activity ON public.conversations USING btree (user_id, last_activity DESC, id DESC);
+
+set check_function_bodies = off;
+
+-- Statement-level so a bulk insert updates each conversation once
+CREATE OR REPLACE FUNCTION public.bump_conversation_activity()
+ RETURNS trigger
+ LANGUAGE plpgsql
+ SECURITY DEFINER
+ SET search_path TO 'public'
+AS $function$
+BEGIN
+    UPDATE public.conversations c
+    SET message_count = c.message_count + n.message_count,
+        last_activity = greatest(c.last_activity, n.last_activity),
+        last_message_preview = CASE
+            WHEN n.last_activity >= c.last_activity OR c.last_message_preview IS NULL
+            THEN left(n.last_content, 160)
+            ELSE c.last_message_preview
+        END,
+        title = coalesce(c.title, left(n.first_user_content, 80))
+    FROM (
+        SELECT conversation_id,
+               count(*) AS message_count,
+               max(created_at) AS last_activity,
+               (array_agg(content ORDER BY created_at DESC, id DESC))[1] AS last_content,
+               (array_agg(content ORDER BY created_at, id) FILTER (WHERE role = 'user'))[1] AS first_user_content
+        FROM new_messages
+        GROUP BY conversation_id
+    ) n
+    WHERE c.id = n.conversation_id;
+
+    RETURN NULL;
+END;
+$function$
+;
+
+CREATE TRIGGER bump_conversation_activity_trigger
+    AFTER INSERT ON public.messages
+    REFERENCING NEW TABLE AS new_messages
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION public.bump_conversation_activity();
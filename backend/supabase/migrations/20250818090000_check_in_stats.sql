@@ -0,0 +1,156 @@
+-- Daily check-ins, and per-user check-in aggregates kept current by a
+-- trigger so prompt personalization reads one row instead of raw check-ins.
+
+create table if not exists "public"."daily_check_ins" (
+    "id" bigint generated by default as identity not null,
+    "created_at" timestamp with time zone not null default now(),
+    "user_id" uuid not null default auth.uid(),
+    "date" date not null default current_date,
+    "mood_score" smallint,
+    "notes" text,
+    constraint "daily_check_ins_pkey" primary key ("id"),
+    constraint "daily_check_ins_user_id_fkey" foreign key ("user_id") references auth.users(id) on update cascade on delete cascade
+);
+
+alter table "public"."daily_check_ins" enable row level security;
+
+CREATE INDEX IF NOT EXISTS idx_daily_check_ins_user_date ON public.daily_check_ins USING btree (user_id, date DESC);
+
+create policy "Users manage their own check-ins"
+on "public"."daily_check_ins"
+as permissive
+for all
+to public
+using ((auth.uid() = user_id))
+with check ((auth.uid() = user_id));
+
+grant delete, insert, select, update on table "public"."daily_check_ins" to "authenticated";
+
+grant all on table "public"."daily_check_ins" to "service_role";
+
+-- Windows end at last_check_in_date, so a user who stops checking in keeps
+-- the averages of their last active week/month (readers compare the two
+-- for the trend). current_streak counts consecutive days up to
+-- last_check_in_date; readers treat it as broken once that date is older
+-- than yesterday.
+create table "public"."user_check_in_stats" (
+    "user_id" uuid not null,
+    "last_check_in_date" date not null,
+    "current_streak" integer not null default 0,
+    "mood_7d_mean" numeric,
+    "mood_30d_mean" numeric,
+    "updated_at" timestamp with time zone not null default now(),
+    constraint "user_check_in_stats_pkey" primary key ("user_id"),
+    constraint "user_check_in_stats_user_id_fkey" foreign key ("user_id") references auth.users(id) on update cascade on delete cascade
+);
+
+alter table "public"."user_check_in_stats" enable row level security;
+
+create policy "Users can view their own check-in stats"
+on "public"."user_check_in_stats"
+as permissive
+for select
+to public
+using ((auth.uid() = user_id));
+
+grant select on table "public"."user_check_in_stats" to "authenticated";
+
+grant all on table "public"."user_check_in_stats" to "service_role";
+
+set check_function_bodies = off;
+
+-- Recompute a user's stats after a check-in write. The mood windows read at
+-- most 30 days of rows through idx_daily_check_ins_user_date. The streak is
+-- updated incrementally when `p_inserted` (the date of a newly inserted
+-- check-in) allows it, and recounted over the user's dates otherwise.
+CREATE OR REPLACE FUNCTION public.refresh_check_in_stats(p_user_id uuid, p_inserted date DEFAULT NULL)
+ RETURNS void
+ LANGUAGE plpgsql
+ SECURITY DEFINER
+ SET search_path TO 'public'
+AS $function$
+DECLARE
+    v_prev_last date;
+    v_prev_streak integer;
+    v_last date;
+    v_streak integer;
+BEGIN
+    SELECT last_check_in_date, current_streak INTO v_prev_last, v_prev_streak
+    FROM public.user_check_in_stats
+    WHERE user_id = p_user_id
+    FOR UPDATE;
+
+    SELECT max(date) INTO v_last FROM public.daily_check_ins WHERE user_id = p_user_id;
+    IF v_last IS NULL THEN
+        DELETE FROM public.user_check_in_stats WHERE user_id = p_user_id;
+        RETURN;
+    END IF;
+
+    IF p_inserted IS NOT NULL AND v_prev_last IS NOT NULL THEN
+        v_streak := CASE
+            WHEN p_inserted > v_prev_last + 1 THEN 1
+            WHEN p_inserted = v_prev_last + 1 THEN v_prev_streak + 1
+            -- The day before the streak began may join it to an earlier run
+            WHEN p_inserted <> v_prev_last - v_prev_streak THEN v_prev_streak
+        END;
+    END IF;
+
+    IF v_streak IS NULL THEN
+        -- Dates in a run ending at v_last satisfy date + (rank - 1) = v_last
+        SELECT count(*) INTO v_streak
+        FROM (
+            SELECT date, row_number() OVER (ORDER BY date DESC) AS rn
+            FROM (SELECT DISTINCT date FROM public.daily_check_ins WHERE user_id = p_user_id) d
+        ) r
+        WHERE r.date + (r.rn - 1)::integer = v_last;
+    END IF;
+
+    INSERT INTO public.user_check_in_stats AS s
+        (user_id, last_check_in_date, current_streak, mood_7d_mean, mood_30d_mean, updated_at)
+    SELECT p_user_id, v_last, v_streak, m.mood_7d, m.mood_30d, now()
+    FROM (
+        SELECT round(avg(mood_score) FILTER (WHERE date > v_last - 7), 2) AS mood_7d,
+               round(avg(mood_score), 2) AS mood_30d
+        FROM public.daily_check_ins
+        WHERE user_id = p_user_id AND date > v_last - 30
+    ) m
+    ON CONFLICT (user_id) DO UPDATE
+    SET last_check_in_date = excluded.last_check_in_date,
+        current_streak = excluded.current_streak,
+        mood_7d_mean = excluded.mood_7d_mean,
+        mood_30d_mean = excluded.mood_30d_mean,
+        updated_at = excluded.updated_at;
+END;
+$function$
+;
+
+CREATE OR REPLACE FUNCTION public.update_check_in_stats()
+ RETURNS trigger
+ LANGUAGE plpgsql
+ SECURITY DEFINER
+ SET search_path TO 'public'
+AS $function$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM public.refresh_check_in_stats(NEW.user_id, NEW.date);
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM public.refresh_check_in_stats(NEW.user_id);
+        IF OLD.user_id IS DISTINCT FROM NEW.user_id THEN
+            PERFORM public.refresh_check_in_stats(OLD.user_id);
+        END IF;
+    ELSE
+        PERFORM public.refresh_check_in_stats(OLD.user_id);
+    END IF;
+    RETURN NULL;
+END;
+$function$
+;
+
+CREATE TRIGGER update_check_in_stats_trigger
+    AFTER INSERT OR UPDATE OR DELETE ON public.daily_check_ins
+    FOR EACH ROW
+    EXECUTE FUNCTION public.update_check_in_stats();
+
+-- Backfill from existing check-ins
+select public.refresh_check_in_stats(user_id)
+from (select distinct user_id from public.daily_check_ins) u;
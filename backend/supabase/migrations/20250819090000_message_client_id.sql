@@ -0,0 +1,8 @@
+-- Id generated by the API for each message before it is queued for insertion.
+-- Inserts skip client_ids that already exist (on_conflict=client_id with
+-- resolution=ignore-duplicates), so retrying a batch whose first attempt
+-- went through doesn't write its messages twice.
+
+alter table "public"."messages" add column "client_id" uuid;
+
+CREATE UNIQUE INDEX messages_client_id_key ON public.messages USING btree (client_id);
@@ -0,0 +1,77 @@
+# tests/test_stream_cancellation.py
+"""Cancelling a coalesced reply stops its generation and its upstream.
+
+Run from backend/: python -m unittest discover tests
+"""
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from services.stream_coalescer import CoalesceConfig, coalesce  # noqa: E402
+from services.stream_registry import StreamRegistry  # noqa: E402
+
+TRIALS = 200
+TOKENS = 400
+
+
+class FakeUpstream:
+    """Token stream that counts what it sends and whether it was closed"""
+
+    def __init__(self, tokens: int):
+        self.tokens = tokens
+        self.sent = 0
+        self.closed = False
+
+    async def stream(self):
+        try:
+            for _ in range(self.tokens):
+                # Tokens arrive back to back, so cancels land as queue.get() finishes
+                await asyncio.sleep(0)
+                self.sent += 1
+                yield "tok "
+        finally:
+            self.closed = True
+
+
+class StreamCancellationTest(unittest.IsolatedAsyncioTestCase):
+    async def test_cancel_mid_stream_stops_generation_and_upstream(self):
+        registry = StreamRegistry(max_bytes=64 * 1024 * 1024)
+        config = CoalesceConfig(max_bytes=48, max_delay_ms=30.0)
+        for trial in range(TRIALS):
+            upstream = FakeUpstream(TOKENS)
+            stream = registry.create("test-user", 1)
+            completed = False
+
+            async def generate():
+                nonlocal completed
+                async for part in coalesce(upstream.stream(), config):
+                    stream.publish(part)
+                completed = True
+                stream.complete("")
+
+            task = registry.run(stream, generate())
+            cancel_after = 5 + trial % 20
+            async for event in stream.follow():
+                if event.sequence >= cancel_after:
+                    break
+
+            sent_at_cancel = upstream.sent
+            self.assertTrue(registry.cancel(stream.stream_id, "test-user"))
+            await asyncio.gather(task, return_exceptions=True)
+
+            self.assertTrue(task.cancelled(), f"trial {trial}: generation ran on after cancel")
+            self.assertFalse(completed, f"trial {trial}: generation ran to completion")
+            self.assertTrue(upstream.closed, f"trial {trial}: upstream left open")
+            # The pump may take one more token before it sees the cancel
+            self.assertLessEqual(upstream.sent - sent_at_cancel, 1, f"trial {trial}")
+            self.assertEqual(stream.events[-1].code, 499)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -14,7 +14,11 @@ else
 fi
 
 echo "Generating Swift..."
-protoc -I "$PROTO_DIR" --swift_out="$SWIFT_OUT" "$PROTO_DIR/chat_stream.proto"
+if command -v protoc-gen-swift >/dev/null 2>&1; then
+  protoc -I "$PROTO_DIR" --swift_out="$SWIFT_OUT" "$PROTO_DIR/chat_stream.proto"
+else
+  echo "protoc-gen-swift not found; skipping Swift (brew install swift-protobuf)"
+fi
 
 echo "Done."
 